@@ -1,16 +1,73 @@
-'''Entrypoint to program'''
+'''Entrypoint to program: segment a directory of images'''
 
-# use relative imports here
-import os
-from pathlib import Path
+import argparse
+import sys
+from typing import List, Optional
 
-from .img_processing import ImageProcessor
+from .batch import segment_directory
+from .masks import MASK_SUFFIXES
+from .segmentation import SOLVERS
 
-path = os.path.abspath(__file__)
-pathlib_path = Path(path).parent.joinpath('banana1-gr.jpg')
 
-imgp = ImageProcessor(pathlib_path, [], [])
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m simgppa',
+        description='Segment every image of a directory in parallel.')
 
-res = imgp.get_graph_edges()
+    parser.add_argument('images', help='directory of images to segment')
+    parser.add_argument('--obj', required=True,
+                        help='object seeds: a text file of "x y" lines, a '
+                             'mask image or a directory of per-image seeds')
+    parser.add_argument('--bg', required=True,
+                        help='background seeds, same forms as --obj')
+    parser.add_argument('-o', '--output', required=True,
+                        help='directory for masks and manifest.json')
+    parser.add_argument('--reference',
+                        help='directory of reference masks to score against')
+    parser.add_argument('-j', '--workers', type=int,
+                        help='worker processes, all CPUs by default')
+    parser.add_argument('--lmbd', type=float, default=100.0,
+                        help='weight of the t-links')
+    parser.add_argument('--sgm', type=float, default=1.0,
+                        help='intensity noise of the n-links')
+    parser.add_argument('--color', dest='bw', action='store_false',
+                        help='images are RGB, not grayscale')
+    parser.add_argument('--solver', choices=sorted(SOLVERS), default='ppa')
+    parser.add_argument('--cache',
+                        help='directory keeping n-links for later runs')
+    parser.add_argument('--mask-format', choices=list(MASK_SUFFIXES),
+                        default='png',
+                        help='PNG images, packed bits or run lengths')
+    parser.add_argument('--profile', action='store_true', default=None,
+                        help='time the stages of every image into the '
+                             'manifest')
 
-print(len(res))
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    failed = 0
+
+    for entry in segment_directory(args.images, args.obj, args.bg,
+                                   args.output,
+                                   reference=args.reference,
+                                   workers=args.workers,
+                                   lmbd=args.lmbd,
+                                   sgm=args.sgm,
+                                   bw=args.bw,
+                                   solver=args.solver,
+                                   cache=args.cache,
+                                   mask_format=args.mask_format,
+                                   profile=args.profile):
+        if entry['error'] is not None:
+            failed += 1
+            print(f'{entry["image"]}: {entry["error"]}', file=sys.stderr)
+        else:
+            print(f'{entry["image"]}: {entry["seconds"]:.2f}s')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from .cache import ArrayCache
+from .img_processing import Seeds, load_pixels
+from .masks import MASK_SUFFIXES, load_mask
+from .metrics import compare
+from .segmentation import Segmentation
+
+# .npy arrays of pixels are memory-mapped
+IMAGE_SUFFIXES = ('.bmp', '.gif', '.jpeg', '.jpg', '.npy', '.png', '.tif',
+                  '.tiff')
+
+
+def find_companion(directory: Path, image: Path) -> Optional[Path]:
+    '''File of `directory` named after the image: the same stem or the stem
+    without the `-gr` grayscale marker, seeds and references are named so
+    '''
+
+    stems = [image.stem, image.stem.replace('-gr', '')]
+
+    for stem in stems:
+        for file in sorted(directory.glob(f'{stem}.*')):
+            return file
+
+    return None
+
+
+def load_seeds(path: Path) -> Seeds:
+    '''Seeds from a text file of `x y` pairs or a mask or scribble image'''
+
+    if path.suffix == '.txt':
+        return load_pixels(path)
+
+    with Image.open(path) as image:
+        return np.asarray(image)
+
+
+def seeds_for(seeds: Path, image: Path) -> Path:
+    '''Seed file shared by all images or the image's own one in a directory'''
+
+    if not seeds.is_dir():
+        return seeds
+
+    found = find_companion(seeds, image)
+    if found is None:
+        raise ValueError(f'No seeds for {image.name} in {seeds}')
+
+    return found
+
+
+def segment_image(job: Dict) -> Dict:
+    '''Segment one image of a batch, returns its manifest entry'''
+
+    image = Path(job['image'])
+    mask = Path(job['output']).joinpath(
+        image.stem + MASK_SUFFIXES[job['mask_format']])
+    entry = {'image': str(image), 'mask': None, 'seconds': None,
+             'accuracy': None, 'error': None, 'profile': None}
+
+    try:
+        start = time.perf_counter()
+
+        segmentation = Segmentation(
+            image,
+            bg_pixels=load_seeds(seeds_for(Path(job['bg']), image)),
+            obj_pixels=load_seeds(seeds_for(Path(job['obj']), image)),
+            lmbd=job['lmbd'],
+            sgm=job['sgm'],
+            bw=job['bw'],
+            solver=job['solver'],
+            nlink_cache=None if job['cache'] is None
+            else ArrayCache(job['cache']),
+            profile=job['profile'])
+        segmentation.save_mask(mask, job['mask_format'])
+
+        entry['seconds'] = time.perf_counter() - start
+        entry['mask'] = str(mask)
+
+        if segmentation.profile is not None:
+            entry['profile'] = segmentation.profile.as_dict()
+
+        if job['reference'] is not None:
+            reference = find_companion(Path(job['reference']), image)
+
+            if reference is not None:
+                with Image.open(reference) as expected:
+                    correct_obj, correct_bg, correct_total, \
+                        correct_relative = compare(
+                            expected, Image.fromarray(load_mask(mask)))
+
+                entry['accuracy'] = {'obj': correct_obj,
+                                     'bg': correct_bg,
+                                     'total': correct_total,
+                                     'relative': correct_relative}
+    except Exception as error:
+        entry['error'] = f'{type(error).__name__}: {error}'
+
+    return entry
+
+
+def segment_directory(images: str,
+                      obj: str,
+                      bg: str,
+                      output: str,
+                      reference: Optional[str] = None,
+                      workers: Optional[int] = None,
+                      lmbd: float = 100.0,
+                      sgm: float = 1.0,
+                      bw: bool = True,
+                      solver: str = 'ppa',
+                      cache: Optional[str] = None,
+                      mask_format: str = 'png',
+                      profile: Optional[bool] = None) -> Iterator[Dict]:
+    '''Segment every image of a directory across a process pool
+
+    Masks are written to `output` as soon as an image is done and its
+    manifest entry is yielded; the whole manifest ends up in
+    `output/manifest.json`. `obj` and `bg` are seed files shared by all
+    images or directories with the seeds of every image. With a `cache`
+    directory the n-links of every image are kept there for later runs.
+    Masks are written as `mask_format`, one of `masks.MASK_SUFFIXES`.
+    With `profile`, or `SIMGPPA_PROFILE` set, every entry gets the stage
+    profile of its image.
+    '''
+
+    if mask_format not in MASK_SUFFIXES:
+        raise ValueError(f'Unknown mask format {mask_format!r}, expected '
+                         f'one of {", ".join(MASK_SUFFIXES)}')
+
+    output_dir = Path(output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = sorted(path for path in Path(images).iterdir()
+                   if path.suffix.lower() in IMAGE_SUFFIXES)
+
+    jobs = [{'image': str(path), 'obj': obj, 'bg': bg,
+             'output': str(output_dir), 'reference': reference,
+             'lmbd': lmbd, 'sgm': sgm, 'bw': bw, 'solver': solver,
+             'cache': cache, 'mask_format': mask_format, 'profile': profile}
+            for path in paths]
+
+    manifest: List[Dict] = []
+
+    if workers == 1:
+        for job in jobs:
+            manifest.append(segment_image(job))
+            yield manifest[-1]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(segment_image, job) for job in jobs]
+
+            for future in as_completed(futures):
+                manifest.append(future.result())
+                yield manifest[-1]
+
+    manifest.sort(key=lambda entry: entry['image'])
+
+    with open(output_dir.joinpath('manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
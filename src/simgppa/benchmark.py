@@ -0,0 +1,336 @@
+'''Max-flow benchmark over the graphs of `tests/data/ppa`
+
+    python -m simgppa.benchmark -o results.json
+    python -m simgppa.benchmark --baseline results.json
+    python -m simgppa.benchmark --tiles 1 2 4
+    python -m simgppa.benchmark --levels 1 2 3
+
+`--tiles` also times `TiledGridPPA` over strips against `GridPPA`, by wall
+time and by CPU time with a core per strip, and `--levels` the
+coarse-to-fine cut of `pyramid` over every number of levels, both on the
+grid graph of a bundled image.
+'''
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .bk import BK
+from .graph_io import read_graph
+from .grid import GridPPA
+from .img_processing import ImageProcessor, load_pixels
+from .ppa import PPA
+from .pyramid import grid_band_solver, pyramid_labels
+from .tiled import TiledGridPPA
+
+DATA_PATH = Path(__file__).parent.joinpath('tests/data/ppa')
+TESTS_PATH = Path(__file__).parent.joinpath('tests')
+
+# seconds below which timings are too noisy to flag a regression
+NOISE_FLOOR = 5e-3
+
+# solver configurations by name, each builds a solver from flat edge arrays
+CONFIGS: Dict[str, Callable] = {
+    'ppa-fifo': partial(PPA.from_arrays, scheduler='fifo'),
+    'ppa-highest': partial(PPA.from_arrays, scheduler='highest'),
+    'ppa-min-cut': partial(PPA.from_arrays, min_cut_only=True),
+    'bk': BK.from_arrays,
+}
+
+
+def graph_files(patterns: Optional[List[str]] = None) -> List[Path]:
+    '''Test graphs matching any of the glob patterns, all of them by default'''
+
+    patterns = patterns or ['test_*.txt']
+    files = {file for pattern in patterns
+             for file in DATA_PATH.glob(pattern)}
+
+    return sorted(files)
+
+
+def measure(config: str, graph, repeat: int = 3, memory: bool = True) -> Dict:
+    '''Best build and solve times of a configuration and its peak memory
+
+    Memory is traced in one more run, tracing slows the pure Python solver
+    loops down about tenfold.
+    '''
+
+    factory = CONFIGS[config]
+    build_times, solve_times = [], []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        solver = factory(*graph)
+        built = time.perf_counter()
+        max_flow = solver.max_flow()
+        solved = time.perf_counter()
+
+        build_times.append(built - start)
+        solve_times.append(solved - built)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            factory(*graph).max_flow()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {'build': min(build_times),
+            'solve': min(solve_times),
+            'peak_memory': peak,
+            'max_flow': max_flow}
+
+
+def run(patterns: Optional[List[str]] = None,
+        configs: Optional[List[str]] = None,
+        repeat: int = 3,
+        memory: bool = True,
+        log: Optional[Callable[[str], None]] = None,
+        cache_dir: Optional[str] = None) -> Dict:
+    '''Benchmark every configuration on every matching graph
+
+    With `cache_dir` the parsed graphs are kept there as .npz files.
+    '''
+
+    configs = configs or list(CONFIGS)
+    unknown = [config for config in configs if config not in CONFIGS]
+    if unknown:
+        raise ValueError(f'Unknown configurations {", ".join(unknown)}, '
+                         f'expected some of {", ".join(CONFIGS)}')
+
+    results = []
+
+    for file in graph_files(patterns):
+        graph = read_graph(file, cache_dir)
+
+        for config in configs:
+            result = {'graph': file.stem,
+                      'vertices': graph[0],
+                      'edges': len(graph[1]),
+                      'config': config}
+            result.update(measure(config, graph, repeat, memory))
+            results.append(result)
+
+            if log is not None:
+                peak = result['peak_memory']
+                log(f'{file.stem:>12} {config:>12} '
+                    f'build {result["build"]:.4f}s '
+                    f'solve {result["solve"]:.4f}s' +
+                    (f' peak {peak / 2 ** 20:.2f}MiB' if peak else ''))
+
+    return {'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'repeat': repeat,
+            'results': results}
+
+
+def image_capacities(image: Optional[str] = None):
+    '''Grid graph of an image with the seeds of the segmentation tests'''
+
+    if image is None:
+        image = TESTS_PATH.joinpath(
+            'data/segmentation/images-320/banana1-gr-320.jpg')
+
+    return ImageProcessor(image,
+                          load_pixels(TESTS_PATH.joinpath('obj_pixels.txt')),
+                          load_pixels(TESTS_PATH.joinpath('bg_pixels.txt')),
+                          1, 60.0, True).get_grid_capacities()
+
+
+def tile_scaling(capacities, tiles: List[int], repeat: int = 3,
+                 log: Optional[Callable[[str], None]] = None) -> Dict:
+    '''Best solve times of `TiledGridPPA` over every count of `tiles`
+
+    Speedups are relative to the single process `GridPPA`, a speedup below
+    one means the strips cost more than they save. `solve` is the wall
+    time on the host, `span` the CPU time with a core per strip, see
+    `tiled`; with fewer cores than strips only the latter drops.
+    '''
+
+    def best(factory) -> Dict:
+        runs = []
+
+        for _ in range(repeat):
+            solver = factory(*capacities)
+            start = time.perf_counter()
+            solver.max_flow()
+            runs.append((time.perf_counter() - start,
+                         getattr(solver, 'span', None)))
+
+        solve, span = min(runs)
+
+        return {'solve': solve, 'span': span}
+
+    grid = best(GridPPA)['solve']
+    results = []
+
+    for count in tiles:
+        timing = best(partial(TiledGridPPA, tiles=count))
+        solve, span = timing['solve'], timing['span']
+        results.append({'tiles': count, 'solve': solve, 'span': span,
+                        'speedup': grid / solve,
+                        'span_speedup': grid / span})
+
+        if log is not None:
+            log(f'{count:>3} tiles solve {solve:.4f}s '
+                f'speedup {grid / solve:.2f} span {span:.4f}s '
+                f'speedup {grid / span:.2f}')
+
+    return {'pixels': int(capacities[1].size),
+            'cpus': os.cpu_count(),
+            'grid': grid,
+            'results': results}
+
+
+def level_timing(capacities, levels: List[int], repeat: int = 3,
+                 log: Optional[Callable[[str], None]] = None) -> Dict:
+    '''Best times of `pyramid_labels` with the grid solver over `levels`
+
+    Speedups are relative to a single level, the whole grid cut at once;
+    `changed` counts the pixels labeled otherwise than by that cut.
+    '''
+
+    def best(count: int):
+        times = []
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            labels = pyramid_labels(*capacities, grid_band_solver, count)
+            times.append(time.perf_counter() - start)
+
+        return min(times), labels
+
+    whole, expected = best(1)
+    results = []
+
+    for count in levels:
+        solve, labels = best(count)
+        results.append({'levels': count, 'solve': solve,
+                        'speedup': whole / solve,
+                        'changed': int((labels != expected).sum())})
+
+        if log is not None:
+            log(f'{count:>3} levels solve {solve:.4f}s '
+                f'speedup {whole / solve:.2f}')
+
+    return {'pixels': int(capacities[1].size),
+            'whole': whole,
+            'results': results}
+
+
+def compare(baseline: Dict, current: Dict,
+            threshold: float = 0.2) -> List[str]:
+    '''Regressions of `current` against `baseline`
+
+    A configuration regresses when its build plus solve time or its peak
+    memory grows by more than `threshold` of the baseline or when it finds
+    another max flow. Timings below `NOISE_FLOOR` are not compared.
+    '''
+
+    before = {(r['graph'], r['config']): r for r in baseline['results']}
+    regressions = []
+
+    for result in current['results']:
+        key = (result['graph'], result['config'])
+        if key not in before:
+            continue
+
+        old = before[key]
+        name = '{} {}'.format(*key)
+
+        if result['max_flow'] != old['max_flow']:
+            regressions.append(f'{name}: max flow {result["max_flow"]} '
+                               f'instead of {old["max_flow"]}')
+
+        old_time = old['build'] + old['solve']
+        new_time = result['build'] + result['solve']
+        if new_time > NOISE_FLOOR and new_time > old_time * (1 + threshold):
+            regressions.append(f'{name}: {new_time:.4f}s instead of '
+                               f'{old_time:.4f}s')
+
+        if result['peak_memory'] is not None and \
+                old['peak_memory'] is not None and \
+                result['peak_memory'] > old['peak_memory'] * (1 + threshold):
+            regressions.append(f'{name}: peak memory '
+                               f'{result["peak_memory"]} instead of '
+                               f'{old["peak_memory"]} bytes')
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m simgppa.benchmark',
+        description='Time and measure max-flow solvers on the test graphs.')
+
+    parser.add_argument('-g', '--graphs', nargs='+',
+                        help='glob patterns of graph files, e.g. "test_rd*"')
+    parser.add_argument('-c', '--configs', nargs='+', choices=list(CONFIGS),
+                        help='solver configurations, all by default')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='runs per measurement, the best one is kept')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='skip the slow traced run for peak memory')
+    parser.add_argument('--cache',
+                        help='directory to keep parsed graphs in as .npz')
+    parser.add_argument('-o', '--output', help='file for the JSON results')
+    parser.add_argument('-b', '--baseline',
+                        help='JSON results to check for regressions against')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                        help='allowed relative growth of time and memory')
+    parser.add_argument('--tiles', type=int, nargs='+',
+                        help='tile counts to time the tiled grid solver with')
+    parser.add_argument('--levels', type=int, nargs='+',
+                        help='pyramid levels to time the grid solver with')
+    parser.add_argument('--image',
+                        help='image of the grid graph of --tiles and '
+                             '--levels, banana1 by default')
+
+    args = parser.parse_args(argv)
+
+    current = run(args.graphs, args.configs, args.repeat, args.memory,
+                  log=partial(print, file=sys.stderr), cache_dir=args.cache)
+
+    if args.tiles:
+        current['tile_scaling'] = tile_scaling(
+            image_capacities(args.image), args.tiles, args.repeat,
+            log=partial(print, file=sys.stderr))
+
+    if args.levels:
+        current['level_timing'] = level_timing(
+            image_capacities(args.image), args.levels, args.repeat,
+            log=partial(print, file=sys.stderr))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(current, file, indent=2)
+    else:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(json.load(file), current, args.threshold)
+
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
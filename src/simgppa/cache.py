@@ -0,0 +1,130 @@
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+class ArrayCache:
+    '''Arrays by key, least recently used ones are dropped past a size limit
+
+    Arrays are kept in memory and, with a `directory`, as .npy files there
+    that outlive the process. Both stores are limited in bytes separately,
+    on disk the file modification time tracks the last use. Cached arrays
+    are read-only.
+    '''
+
+    def __init__(self,
+                 directory: Optional[str] = None,
+                 memory_limit: int = 256 * 2 ** 20,
+                 disk_limit: int = 2 ** 30) -> None:
+
+        self.directory = None if directory is None else Path(directory)
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+
+        self.hits = 0
+        self.misses = 0
+
+        self.__arrays: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self.__memory = 0
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __file(self, key: str) -> Path:
+        return self.directory.joinpath(f'{key}.npy')
+
+    def __touch(self, key: str) -> None:
+        '''Mark the file of the key as just used'''
+
+        if self.directory is not None:
+            try:
+                os.utime(self.__file(key))
+            except FileNotFoundError:
+                pass
+
+    def __remember(self, key: str, array: np.ndarray) -> None:
+        if array.nbytes > self.memory_limit:
+            return
+
+        self.__arrays[key] = array
+        self.__memory += array.nbytes
+
+        while self.__memory > self.memory_limit:
+            _, dropped = self.__arrays.popitem(last=False)
+            self.__memory -= dropped.nbytes
+
+    def __store(self, key: str, array: np.ndarray) -> None:
+        if array.nbytes > self.disk_limit:
+            return
+
+        # written aside and moved in place, a reader never sees half a file
+        partial = self.directory.joinpath(f'{key}.{os.getpid()}.tmp')
+        with open(partial, 'wb') as file:
+            np.save(file, array)
+        os.replace(partial, self.__file(key))
+
+        # other processes may share the directory and drop files meanwhile
+        entries = []
+        for file in self.directory.glob('*.npy'):
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, file))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, file in entries:
+            if total <= self.disk_limit:
+                break
+
+            total -= size
+            file.unlink(missing_ok=True)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        '''Cached array, None when it is in neither store'''
+
+        if key in self.__arrays:
+            self.__arrays.move_to_end(key)
+            self.__touch(key)
+            self.hits += 1
+            return self.__arrays[key]
+
+        if self.directory is not None:
+            try:
+                array = np.load(self.__file(key), mmap_mode='r')
+                self.__touch(key)
+            except FileNotFoundError:
+                array = None
+
+            if array is not None:
+                self.__remember(key, array)
+                self.hits += 1
+                return array
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, array: np.ndarray) -> None:
+
+        array = np.array(array)
+        array.setflags(write=False)
+
+        if key in self.__arrays:
+            self.__memory -= self.__arrays.pop(key).nbytes
+
+        self.__remember(key, array)
+
+        if self.directory is not None:
+            self.__store(key, array)
+
+    def clear(self) -> None:
+        '''Forget the arrays in memory, the files on disk stay'''
+
+        self.__arrays.clear()
+        self.__memory = 0
@@ -0,0 +1,219 @@
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .ppa import Edge
+
+
+def index_dtype(size: int) -> np.dtype:
+    '''Smallest integer dtype able to index `size` elements'''
+
+    return np.dtype(np.int32) if size < 2 ** 31 else np.dtype(np.int64)
+
+
+def capacity_dtype(capacities: np.ndarray) -> np.dtype:
+    '''Integer capacities keep exact integer arithmetic, others become float'''
+
+    if np.issubdtype(capacities.dtype, np.integer) or \
+            np.issubdtype(capacities.dtype, np.bool_):
+        return np.dtype(np.int64)
+
+    return np.dtype(np.float64)
+
+
+class ResidualGraph:
+    '''Residual network in compressed sparse row form
+
+    Arcs leaving vertex `v` occupy `offsets[v]:offsets[v + 1]` of `heads`,
+    `residual` and `capacity`; `reverse[a]` is the arc paired with arc `a`.
+    An edge and its antiparallel edge share one pair of arcs, as do
+    repeated edges, for which the last capacity wins.
+    '''
+
+    def __init__(self,
+                 vertex_num: int,
+                 offsets: np.ndarray,
+                 heads: np.ndarray,
+                 capacity: np.ndarray,
+                 reverse: np.ndarray,
+                 residual: Optional[np.ndarray] = None,
+                 edge_arcs: Optional[np.ndarray] = None) -> None:
+
+        self.vertex_num = vertex_num
+        self.offsets = offsets
+        self.heads = heads
+        self.capacity = capacity
+        self.reverse = reverse
+        self.residual = capacity.copy() if residual is None else residual
+        # arc of every edge the graph was built from, in input order
+        self.edge_arcs = edge_arcs
+
+    @classmethod
+    def from_arrays(cls,
+                    vertex_num: int,
+                    starts: Sequence[int],
+                    ends: Sequence[int],
+                    capacities: Sequence[float]) -> 'ResidualGraph':
+
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        capacities = np.asarray(capacities)
+        capacities = capacities.astype(capacity_dtype(capacities), copy=False)
+
+        if len(starts) != len(ends) or len(starts) != len(capacities):
+            raise ValueError('Edge arrays must have the same length')
+
+        if len(starts) and (min(starts.min(), ends.min()) < 0 or
+                            max(starts.max(), ends.max()) >= vertex_num):
+            raise ValueError('Edge refers to non-existent vertex')
+
+        # self-loops never carry flow
+        loops = starts == ends
+        starts, ends = np.where(loops, -1, starts), np.where(loops, -1, ends)
+
+        # one arc pair per unordered couple of vertices, lower vertex first
+        low, high = np.minimum(starts, ends), np.maximum(starts, ends)
+        pairs, edge_pairs = np.unique(
+            low * vertex_num + high, return_inverse=True)
+        edge_pairs = edge_pairs.reshape(-1)
+
+        skip = int(len(pairs) > 0 and pairs[0] < 0)
+        pair_num = len(pairs) - skip
+        pair_low = pairs[skip:] // vertex_num
+        pair_high = pairs[skip:] % vertex_num
+
+        # forward arcs go low -> high, backward arcs high -> low; assigning in
+        # input order lets the last repeated edge win
+        forward = starts < ends
+        arc_ids = edge_pairs - skip + np.where(forward, 0, pair_num)
+        arc_ids[loops] = -1
+
+        ids, values = arc_ids[~loops], capacities[~loops]
+        _, last = np.unique(ids[::-1], return_index=True)
+        last = len(ids) - 1 - last
+
+        arc_capacity = np.zeros(2 * pair_num, dtype=capacities.dtype)
+        arc_capacity[ids[last]] = values[last]
+
+        tails = np.concatenate((pair_low, pair_high))
+        arc_heads = np.concatenate((pair_high, pair_low))
+
+        idx_dtype = index_dtype(max(2 * pair_num, vertex_num + 1))
+        order = np.argsort(tails, kind='stable')
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+
+        offsets = np.zeros(vertex_num + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tails, minlength=vertex_num),
+                  out=offsets[1:])
+
+        paired = np.concatenate((np.arange(pair_num, 2 * pair_num),
+                                 np.arange(pair_num)))
+
+        edge_arcs = np.full(len(starts), -1, dtype=np.int64)
+        edge_arcs[~loops] = position[arc_ids[~loops]]
+
+        return cls(vertex_num,
+                   offsets,
+                   arc_heads[order].astype(idx_dtype),
+                   arc_capacity[order],
+                   position[paired[order]].astype(idx_dtype),
+                   edge_arcs=edge_arcs.astype(idx_dtype))
+
+    @classmethod
+    def from_edges(cls, vertex_num: int,
+                   edges: List['Edge']) -> 'ResidualGraph':
+
+        return cls.from_arrays(vertex_num,
+                               [edge.start for edge in edges],
+                               [edge.end for edge in edges],
+                               [edge.capacity for edge in edges])
+
+    @property
+    def arc_num(self) -> int:
+        return len(self.heads)
+
+    @property
+    def nbytes(self) -> int:
+        '''Memory held by the graph arrays'''
+
+        arrays = (self.offsets, self.heads, self.capacity, self.reverse,
+                  self.residual, self.edge_arcs)
+
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def tails(self) -> np.ndarray:
+        '''Start vertex of every arc'''
+
+        return np.repeat(np.arange(self.vertex_num, dtype=self.heads.dtype),
+                         np.diff(self.offsets))
+
+    def arcs_of(self, vertices: np.ndarray) -> np.ndarray:
+        '''Arcs leaving any of the vertices, vertex by vertex'''
+
+        firsts = self.offsets[vertices]
+        counts = self.offsets[vertices + 1] - firsts
+        ends = np.cumsum(counts)
+
+        return np.arange(ends[-1] if len(ends) else 0) + \
+            np.repeat(firsts - ends + counts, counts)
+
+    def reachable(self, vertices: Union[int, np.ndarray],
+                  backward: bool = False) -> np.ndarray:
+        '''Vertices joined to any of `vertices` by a path of residual arcs
+
+        Forward paths leave `vertices`, backward ones end at them. The search
+        expands a whole frontier of vertices at once.
+        '''
+
+        frontier = np.unique(np.asarray(vertices, dtype=np.int64))
+        seen = np.zeros(self.vertex_num, dtype=bool)
+        seen[frontier] = True
+
+        while len(frontier):
+            arcs = self.arcs_of(frontier)
+            # arc `u -> v` lets `v` reach `u` if its reverse has capacity
+            opened = self.residual[
+                self.reverse[arcs] if backward else arcs] > 0
+
+            heads = self.heads[arcs[opened]]
+            frontier = np.unique(heads[~seen[heads]]).astype(np.int64)
+            seen[frontier] = True
+
+        return seen
+
+    def find_arc(self, start: int, end: int) -> int:
+        '''Index of the arc `start -> end` or -1 if there is none'''
+
+        first, last = self.offsets[start], self.offsets[start + 1]
+        found = np.flatnonzero(self.heads[first:last] == end)
+
+        return int(first + found[0]) if len(found) else -1
+
+    def terminal_arcs(self, source: int,
+                      runoff: int) -> Tuple[np.ndarray, np.ndarray]:
+        '''Arcs `source -> v` and `v -> runoff` of every vertex, -1 if missing
+
+        The terminals themselves get -1 in both arrays.
+        '''
+
+        reverse, heads = self.reverse, self.heads
+
+        source_arcs = np.arange(*self.offsets[source:source + 2])
+        runoff_arcs = reverse[np.arange(*self.offsets[runoff:runoff + 2])]
+
+        from_source = np.full(self.vertex_num, -1, dtype=np.int64)
+        to_runoff = np.full(self.vertex_num, -1, dtype=np.int64)
+        from_source[heads[source_arcs]] = source_arcs
+        to_runoff[heads[reverse[runoff_arcs]]] = runoff_arcs
+
+        from_source[[source, runoff]] = -1
+        to_runoff[[source, runoff]] = -1
+
+        return from_source, to_runoff
+
+    def flow(self) -> np.ndarray:
+        '''Flow carried by every arc'''
+
+        return np.maximum(self.capacity - self.residual, 0)
@@ -0,0 +1,210 @@
+'''Graph files as flat edge arrays
+
+Every reader returns `(vertex_num, starts, ends, capacities)` with 0-based
+vertices, vertex 0 the source and the last vertex the runoff, ready for
+`PPA.from_arrays` and friends.
+'''
+
+import os
+import zipfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+GraphArrays = Tuple[int, np.ndarray, np.ndarray, np.ndarray]
+
+DIMACS_SUFFIXES = ('.max', '.dimacs', '.dim')
+
+
+def parse_columns(lines, columns: Tuple[int, ...]) -> np.ndarray:
+    '''Integer columns of whitespace separated lines, float if any is not'''
+
+    try:
+        return np.loadtxt(lines, dtype=np.int64, usecols=columns, ndmin=2)
+    except ValueError:
+        return np.loadtxt(lines, dtype=np.float64, usecols=columns, ndmin=2)
+
+
+def split_columns(vertex_num: int, edges: np.ndarray) -> GraphArrays:
+    edges = edges.reshape(-1, 3)
+    vertices = edges[:, :2].astype(np.int64) - 1
+
+    if len(vertices) and (vertices.min() < 0 or vertices.max() >= vertex_num):
+        raise ValueError('Edge refers to non-existent vertex')
+
+    capacities = edges[:, 2]
+    if capacities.dtype == np.float64 and \
+            np.array_equal(capacities, np.round(capacities)):
+        capacities = capacities.astype(np.int64)
+
+    return vertex_num, vertices[:, 0].copy(), vertices[:, 1].copy(), \
+        capacities
+
+
+def read_text(path) -> GraphArrays:
+    '''Graph of a text file of 1-based `start end capacity` lines
+
+    The first line holds the counts of vertices and edges.
+    '''
+
+    with open(path) as file:
+        header = file.readline().split()
+        if len(header) != 2:
+            raise ValueError(f'{path}: expected "vertices edges" header')
+
+        vertex_num, edge_num = int(header[0]), int(header[1])
+        lines = [line for line in file if line.strip()]
+
+    # loadtxt warns about input without data
+    edges = parse_columns(lines, (0, 1, 2)) if lines \
+        else np.zeros((0, 3), dtype=np.int64)
+
+    if len(edges) != edge_num:
+        raise ValueError(f'{path}: {edge_num} edges declared, '
+                         f'{len(edges)} found')
+
+    return split_columns(vertex_num, edges)
+
+
+def read_dimacs(path) -> GraphArrays:
+    '''Graph of a DIMACS max-flow file
+
+    Vertices are renumbered so that the `n ... s` vertex becomes 0 and the
+    `n ... t` vertex the last one, the others keep their order.
+    '''
+
+    problem, terminals, arcs = None, {}, []
+
+    with open(path) as file:
+        for line in file:
+            kind = line[:1]
+
+            if kind == 'a':
+                arcs.append(line)
+            elif kind == 'p':
+                problem = line.split()
+            elif kind == 'n':
+                _, vertex, terminal = line.split()
+                terminals[terminal] = int(vertex)
+
+    if problem is None or problem[1] != 'max':
+        raise ValueError(f'{path}: not a DIMACS max-flow problem')
+
+    if set(terminals) != {'s', 't'}:
+        raise ValueError(f'{path}: source or sink is missing')
+
+    vertex_num = int(problem[2])
+    edges = parse_columns(arcs, (1, 2, 3)) if arcs \
+        else np.zeros((0, 3), dtype=np.int64)
+
+    if len(edges) != int(problem[3]):
+        raise ValueError(f'{path}: {problem[3]} arcs declared, '
+                         f'{len(edges)} found')
+
+    vertex_num, starts, ends, capacities = split_columns(vertex_num, edges)
+
+    source, sink = terminals['s'] - 1, terminals['t'] - 1
+    others = np.setdiff1d(np.arange(vertex_num), [source, sink])
+
+    renumber = np.empty(vertex_num, dtype=np.int64)
+    renumber[source] = 0
+    renumber[others] = np.arange(1, len(others) + 1)
+    renumber[sink] = vertex_num - 1
+
+    return vertex_num, renumber[starts], renumber[ends], capacities
+
+
+def save_npz(path, graph: GraphArrays) -> None:
+    '''Store the graph uncompressed, so `load_npz` can memory-map it'''
+
+    vertex_num, starts, ends, capacities = graph
+
+    np.savez(path,
+             vertex_num=np.array(vertex_num, dtype=np.int64),
+             starts=np.asarray(starts),
+             ends=np.asarray(ends),
+             capacities=np.asarray(capacities))
+
+
+def npz_member(path, archive: zipfile.ZipFile, name: str,
+               mmap_mode: str) -> np.ndarray:
+    '''Member of an uncompressed .npz mapped in place'''
+
+    info = archive.getinfo(f'{name}.npy')
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f'{path}: {name} is compressed, cannot be mapped')
+
+    with archive.open(info) as member:
+        version = np.lib.format.read_magic(member)
+        read_header = np.lib.format.read_array_header_1_0 \
+            if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran, dtype = read_header(member)
+        header_size = member.tell()
+
+    # local file header: 30 fixed bytes, the name and the extra field
+    with open(path, 'rb') as file:
+        file.seek(info.header_offset + 26)
+        name_size, extra_size = np.frombuffer(file.read(4), dtype='<u2')
+
+    offset = info.header_offset + 30 + int(name_size) + int(extra_size) + \
+        header_size
+
+    if 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+
+    return np.memmap(path, dtype=dtype, mode=mmap_mode, offset=offset,
+                     shape=shape, order='F' if fortran else 'C')
+
+
+def load_npz(path, mmap_mode: Optional[str] = 'r') -> GraphArrays:
+    '''Graph saved by `save_npz`, memory-mapped unless `mmap_mode` is None'''
+
+    if mmap_mode is None:
+        with np.load(path) as data:
+            return int(data['vertex_num']), data['starts'], data['ends'], \
+                data['capacities']
+
+    with zipfile.ZipFile(path) as archive:
+        with archive.open('vertex_num.npy') as member:
+            vertex_num = int(np.lib.format.read_array(member))
+
+        starts, ends, capacities = (
+            npz_member(path, archive, name, mmap_mode)
+            for name in ('starts', 'ends', 'capacities'))
+
+    return vertex_num, starts, ends, capacities
+
+
+def read_graph(path, cache_dir: Optional[str] = None) -> GraphArrays:
+    '''Graph of a .npz, DIMACS (.max, .dimacs, .dim) or text file
+
+    With `cache_dir` a parsed file is saved there as .npz and later calls
+    map the cached arrays instead of parsing the file again.
+    '''
+
+    path = Path(path)
+
+    if path.suffix == '.npz':
+        return load_npz(path)
+
+    cache = None
+    if cache_dir is not None:
+        cache = Path(cache_dir).joinpath(f'{path.name}.npz')
+
+        if cache.exists() and cache.stat().st_mtime >= path.stat().st_mtime:
+            return load_npz(cache)
+
+    if path.suffix in DIMACS_SUFFIXES:
+        graph = read_dimacs(path)
+    else:
+        graph = read_text(path)
+
+    if cache is not None:
+        # replaced at once, arrays mapped from the old cache stay valid
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        partial = cache.with_name(f'{path.name}.{os.getpid()}.npz')
+        save_npz(partial, graph)
+        os.replace(partial, cache)
+
+    return graph
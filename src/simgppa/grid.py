@@ -0,0 +1,272 @@
+from typing import List
+
+import numpy as np
+
+from .graph import capacity_dtype
+from .img_processing import NEIGHBOURS, neighbour_slices
+from .ppa import Vertex
+
+# direction of the arc paired with every direction of `NEIGHBOURS`
+OPPOSITE = (1, 0, 3, 2)
+
+
+def global_relabel(height: np.ndarray,
+                   residual: np.ndarray,
+                   runoff_residual: np.ndarray,
+                   shifts: List[int]) -> None:
+    '''Heights as distances to the runoff, found one wavefront at a time'''
+
+    size = len(height)
+    relabel_within(height, residual, runoff_residual, shifts,
+                   slice(0, size), size + 2)
+
+
+def relabel_within(height: np.ndarray,
+                   residual: np.ndarray,
+                   runoff_residual: np.ndarray,
+                   shifts: List[int],
+                   own: slice,
+                   top: int) -> None:
+    '''Heights of the `own` pixels as distances to the runoff
+
+    Paths may end at a pixel outside of `own` as well, which is `height` of
+    that pixel away from the runoff; those heights are left as they are.
+    '''
+
+    size = len(height)
+    height[own] = top
+
+    # own pixels not reached yet and their open arcs, padded so that
+    # shifted pixels never leave the arrays
+    pad = max(abs(shift) for shift in shifts)
+    free = np.zeros(size + 2 * pad, dtype=bool)
+    free[pad + own.start:pad + own.stop] = True
+    open_arcs = []
+    for d in range(len(shifts)):
+        arcs = np.zeros_like(free)
+        arcs[pad + own.start:pad + own.stop] = residual[own, d] > 0
+        open_arcs.append(arcs)
+
+    fixed = np.concatenate((np.arange(own.start),
+                            np.arange(own.stop, size)))
+    fixed = fixed[height[fixed] < top]
+    fixed = fixed[np.argsort(height[fixed], kind='stable')]
+    levels = height[fixed]
+    joined = 0
+
+    front = own.start + np.flatnonzero(runoff_residual[own] > 0)
+    height[front] = 1
+    free[pad + front] = False
+    level = 1
+
+    while level < top:
+        # fixed pixels join the wavefront of their height
+        start, joined = joined, int(np.searchsorted(levels, level, 'right'))
+        if joined > start:
+            front = np.concatenate((front, fixed[start:joined]))
+
+        if not len(front):
+            if joined == len(fixed):
+                break
+
+            level = int(levels[joined])
+            continue
+
+        level += 1
+        reached = []
+
+        for d, shift in enumerate(shifts):
+            pixels = pad + front - shift
+            pixels = pixels[free[pixels] & open_arcs[d][pixels]]
+
+            # a pixel reached from one direction is not taken again
+            free[pixels] = False
+            reached.append(pixels)
+
+        front = np.concatenate(reached) - pad
+        height[front] = level
+
+
+def sweep(active: np.ndarray,
+          height: np.ndarray,
+          excess: np.ndarray,
+          residual: np.ndarray,
+          runoff_residual: np.ndarray,
+          shifts: List[int],
+          top: int) -> None:
+    '''Push from every active pixel in every direction, then relabel'''
+
+    pixels = active[(height[active] == 1) & (runoff_residual[active] > 0)]
+    delta = np.minimum(excess[pixels], runoff_residual[pixels])
+    excess[pixels] -= delta
+    runoff_residual[pixels] -= delta
+
+    for d, shift in enumerate(shifts):
+        active = active[excess[active] > 0]
+
+        pixels = active[residual[active, d] > 0]
+        neighbours = pixels + shift
+        admissible = height[pixels] == height[neighbours] + 1
+        pixels, neighbours = pixels[admissible], neighbours[admissible]
+
+        # every pixel has one neighbour in the direction, so no
+        # neighbour gets two pushes at once
+        delta = np.minimum(excess[pixels], residual[pixels, d])
+        excess[pixels] -= delta
+        residual[pixels, d] -= delta
+        excess[neighbours] += delta
+        residual[neighbours, OPPOSITE[d]] += delta
+
+    # pixels left with excess have no admissible arc
+    active = active[excess[active] > 0]
+    lowest = np.where(runoff_residual[active] > 0, 1, top)
+
+    for d, shift in enumerate(shifts):
+        open_arcs = residual[active, d] > 0
+        neighbours = np.where(open_arcs, active + shift, active)
+        lowest = np.where(open_arcs,
+                          np.minimum(lowest, height[neighbours] + 1),
+                          lowest)
+
+    height[active] = np.minimum(lowest, top)
+
+
+def reachable(residual: np.ndarray,
+              starts: np.ndarray,
+              shifts: List[int]) -> np.ndarray:
+    '''Pixels joined to any of `starts` by a path of residual n-links'''
+
+    size = len(residual)
+    seen = np.zeros(size, dtype=bool)
+    seen[starts] = True
+    front = starts
+
+    while len(front):
+        reached = []
+
+        for d, shift in enumerate(shifts):
+            pixels = front[residual[front, d] > 0] + shift
+            pixels = pixels[~seen[pixels]]
+            seen[pixels] = True
+            reached.append(pixels)
+
+        front = np.concatenate(reached)
+
+    return seen
+
+
+class GridPPA:
+    '''Push-relabel over a 4-connected pixel lattice
+
+    Capacities live in an (H, W, 4) array of n-links ordered as `NEIGHBOURS`
+    and two (H, W) arrays of t-links, neighbours are found by shifting the
+    arrays, so no adjacency is stored. Every sweep pushes from all active
+    pixels at once and relabels them together, which keeps the labeling
+    valid. Like `PPA(min_cut_only=True)` it stops once no excess can reach
+    the runoff and puts on the source side the pixels the excess left
+    reaches, the smallest of the minimum cuts.
+    '''
+
+    def __init__(self,
+                 nlinks: np.ndarray,
+                 source_caps: np.ndarray,
+                 runoff_caps: np.ndarray,
+                 relabel_interval: int = 32) -> None:
+
+        nlinks = np.asarray(nlinks)
+        source_caps = np.asarray(source_caps)
+        runoff_caps = np.asarray(runoff_caps)
+
+        height, width = source_caps.shape
+
+        if nlinks.shape != (height, width, len(NEIGHBOURS)) or \
+                runoff_caps.shape != (height, width):
+            raise ValueError('Capacities do not match the grid shape')
+
+        dtype = np.result_type(capacity_dtype(nlinks),
+                               capacity_dtype(source_caps),
+                               capacity_dtype(runoff_caps))
+
+        self.shape = (height, width)
+        self.vertex_num = height * width + 2
+        self.relabel_interval = relabel_interval
+
+        # pixel p and its neighbour in direction d are p and p + shifts[d] of
+        # the flattened grid; arcs leaving the image are dropped, so arcs
+        # wrapping around a row never have residual capacity
+        self.shifts = [dy * width + dx for dy, dx in NEIGHBOURS]
+
+        residual = np.zeros((height, width, len(NEIGHBOURS)), dtype=dtype)
+        for d, (dy, dx) in enumerate(NEIGHBOURS):
+            src, _ = neighbour_slices(dy, dx, height, width)
+            residual[src + (d,)] = nlinks[src + (d,)]
+
+        self.residual = residual.reshape(-1, len(NEIGHBOURS))
+        self.runoff_caps = runoff_caps.astype(dtype).ravel()
+        self.runoff_residual = self.runoff_caps.copy()
+
+        # saturate all arcs leaving the source
+        self.excess = source_caps.astype(dtype).ravel()
+        self.height = np.zeros(height * width, dtype=np.int64)
+
+        self.__max_flow = None
+        self.__min_cut = None
+        self.__min_cut_labels = None
+
+    def __active(self) -> np.ndarray:
+        return np.flatnonzero((self.excess > 0) &
+                              (self.height < self.vertex_num))
+
+    def __global_relabel(self) -> None:
+        global_relabel(self.height, self.residual, self.runoff_residual,
+                       self.shifts)
+
+    def max_flow(self):
+
+        if self.__max_flow is not None:
+            return self.__max_flow
+
+        sweeps = 0
+        self.__global_relabel()
+        active = self.__active()
+
+        while len(active):
+            sweep(active, self.height, self.excess, self.residual,
+                  self.runoff_residual, self.shifts, self.vertex_num)
+            sweeps += 1
+
+            if sweeps % self.relabel_interval == 0:
+                self.__global_relabel()
+
+            active = self.__active()
+
+        total = (self.runoff_caps - self.runoff_residual).sum()
+        self.__max_flow = total.item()
+
+        return self.__max_flow
+
+    def min_cut_labels(self) -> np.ndarray:
+        '''Read-only boolean array of the vertices, true on the source side'''
+
+        if self.__min_cut_labels is not None:
+            return self.__min_cut_labels
+
+        if self.__max_flow is None:
+            self.max_flow()
+
+        # the excess left would flow back to the source
+        source_side = reachable(self.residual,
+                                np.flatnonzero(self.excess > 0), self.shifts)
+        labels = np.concatenate(([True], source_side, [False]))
+        labels.setflags(write=False)
+        self.__min_cut_labels = labels
+
+        return labels
+
+    def min_cut(self) -> List[Vertex]:
+        '''Source and the pixels of its side, as `PPA`'''
+
+        if self.__min_cut is None:
+            self.__min_cut = np.flatnonzero(self.min_cut_labels()).tolist()
+
+        return self.__min_cut
@@ -1,215 +1,438 @@
-import math
+import hashlib
 from collections import namedtuple
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 from PIL import Image
 
+from .cache import ArrayCache
 from .ppa import Edge
 
 Pixel = namedtuple('Pixel', 'x y')
 
+# seeds as (x, y) pixels, a boolean mask or a scribble image whose painted
+# (non-zero or opaque) pixels are the seeds
+Seeds = Union[Iterable[Pixel], np.ndarray, Image.Image]
 
-class ImageProcessor():
+# image as a file, .npy ones are memory-mapped, or as decoded pixels: an
+# 8-bit (H, W) gray or (H, W, 3|4) colour array or a PIL image
+ImageSource = Union[str, Path, np.ndarray, Image.Image]
 
-    def __init__(self,
-                 path: str,
-                 obj: List[Pixel],
-                 bg: List[Pixel],
-                 lmbd: float = 100.0,
-                 sgm: float = 1.0,
-                 bw: bool = True) -> None:
+# (dy, dx) offsets of the 4-neighbourhood in the order the graph lists
+# n-links for a pixel: right, left, bottom, top
+NEIGHBOURS: Tuple[Tuple[int, int], ...] = ((0, 1), (0, -1), (1, 0), (-1, 0))
+
+# bins of the seed intensity histograms: of the gray level and of every
+# channel of a colour, which makes COLOUR_BINS ** 3 colour bins
+GRAY_BINS = 51
+COLOUR_BINS = 16
+
+# n-link capacities are at most 100, a byte holds them
+NLINK_DTYPE = np.dtype(np.uint8)
+
+# image rows read at once, bounds the temporaries of a memory-mapped image
+CHUNK_ROWS = 256
+
+
+def row_chunks(height: int) -> Iterator[slice]:
+    '''Slices of at most `CHUNK_ROWS` rows covering the image'''
+
+    for top in range(0, height, CHUNK_ROWS):
+        yield slice(top, min(top + CHUNK_ROWS, height))
+
+
+def neighbour_slices(dy: int, dx: int, height: int, width: int):
+    '''Slices of pixels with a neighbour at (dy, dx) and of those neighbours'''
+
+    src = (slice(max(-dy, 0), height - max(dy, 0)),
+           slice(max(-dx, 0), width - max(dx, 0)))
+    dst = (slice(max(dy, 0), height - max(-dy, 0)),
+           slice(max(dx, 0), width - max(-dx, 0)))
+
+    return src, dst
+
+
+def nlink_table(sgm: float, bw: bool = True) -> np.ndarray:
+    '''N-link capacity of every squared distance two intensities can have'''
+
+    k = 100
+    channels = 1 if bw else 3
+    dt = np.arange(channels * 255 ** 2 + 1)
+
+    return (k * np.exp(-dt / (2 * sgm ** 2))).astype(NLINK_DTYPE)
+
+
+def nlink_weights(pixels: np.ndarray, sgm: float,
+                  bw: bool = True) -> np.ndarray:
+    '''Capacities of the arcs from every pixel to its 4 neighbours
+
+    Returns an (H, W, 4) `NLINK_DTYPE` array ordered as `NEIGHBOURS`, arcs
+    leaving the image have zero capacity. The pixels are read a chunk of
+    rows at a time.
+    '''
+
+    height, width = pixels.shape[:2]
+    table = nlink_table(sgm, bw)
+
+    weights = np.zeros((height, width, len(NEIGHBOURS)), dtype=NLINK_DTYPE)
+
+    for rows in row_chunks(height):
+        # a row more on both sides for the vertical neighbours
+        first = max(rows.start - 1, 0)
+        img = pixels[first:rows.stop + 1].astype(np.int32)
+
+        for d, (dy, dx) in enumerate(NEIGHBOURS):
+            src, dst = neighbour_slices(dy, dx, len(img), width)
+
+            diff = img[src] - img[dst]
+            dt = diff ** 2 if bw else (diff ** 2).sum(axis=-1)
+
+            # rows of the chunk among those the slice covers
+            top = max(rows.start, first + src[0].start)
+            bottom = min(rows.stop, first + src[0].stop)
+            weights[top:bottom, src[1], d] = \
+                table[dt[top - first - src[0].start:
+                         bottom - first - src[0].start]]
+
+    return weights
+
+
+def nlink_key(pixels: np.ndarray, sgm: float, bw: bool = True) -> str:
+    '''Cache key of the n-link weights: the image content and parameters'''
+
+    digest = hashlib.blake2b(digest_size=20)
+    for rows in row_chunks(len(pixels)):
+        digest.update(np.ascontiguousarray(pixels[rows]))
+    digest.update(repr((pixels.shape, pixels.dtype.str,
+                        float(sgm), bool(bw))).encode())
+
+    return f'nlinks-{digest.hexdigest()}'
+
+
+def intensity_bins(pixels: np.ndarray,
+                   bw: bool = True) -> Tuple[np.ndarray, int]:
+    '''Histogram bin of every pixel and the number of bins
+
+    Gray levels fall into `GRAY_BINS` bins, colours into the cells of a
+    `COLOUR_BINS` per channel RGB grid. Bins are 16-bit and looked up a
+    chunk of rows at a time.
+    '''
+
+    bins = GRAY_BINS if bw else COLOUR_BINS
+    table = (np.arange(256) * bins // 256).astype(np.uint16)
+    result = np.empty(pixels.shape[:2], dtype=np.uint16)
+
+    for rows in row_chunks(len(pixels)):
+        if bw:
+            result[rows] = table[pixels[rows]]
+        else:
+            red, green, blue = (table[pixels[rows, :, c]] for c in range(3))
+            result[rows] = (red * bins + green) * bins + blue
+
+    return result, (bins if bw else bins ** 3)
+
+
+def load_pixels(path) -> List[Pixel]:
+    '''Seed pixels from a text file with an `x y` pair on every line'''
+
+    with open(path) as file:
+        return [Pixel(int(x), int(y))
+                for x, y in (line.split() for line in file if line.strip())]
+
+
+def image_pixels(image: ImageSource, bw: bool = True) -> np.ndarray:
+    '''8-bit (H, W) gray or (H, W, 3) colour pixels of the image
+
+    Arrays in the wanted form are used as they are, without a copy, so a
+    memory-mapped image is only read where it is used; colours are turned
+    gray a chunk of rows at a time. Only the decoded input is spared: the
+    bins, n-links, t-links and graph built from it hold a few values per
+    pixel in memory.
+    '''
 
-        img_path = Path(path)
+    if isinstance(image, (str, Path)):
+        path = Path(image)
 
-        if not img_path.exists():
+        if not path.exists():
             raise Exception('Invalid path to image file')
 
-        with Image.open(img_path) as file:
+        if path.suffix == '.npy':
+            return image_pixels(np.load(path, mmap_mode='r'), bw)
 
-            self.__img = file.load()
-            self.img_height = file.height
-            self.img_width = file.width
+        with Image.open(path) as file:
+            return image_pixels(file, bw)
+
+    if isinstance(image, Image.Image):
+        mode = 'L' if bw else 'RGB'
+        return np.asarray(image if image.mode == mode else image.convert(mode))
+
+    pixels = np.asanyarray(image)
+
+    if pixels.dtype != np.uint8:
+        raise ValueError(f'Expected 8-bit pixels, got {pixels.dtype}')
+
+    if pixels.ndim not in (2, 3) or \
+            pixels.ndim == 3 and pixels.shape[2] not in (3, 4):
+        raise ValueError(f'Expected an (H, W), (H, W, 3) or (H, W, 4) '
+                         f'array, got {pixels.shape}')
+
+    if bw:
+        if pixels.ndim == 2:
+            return pixels
+
+        # converted the way PIL converts colour images
+        gray = np.empty(pixels.shape[:2], dtype=np.uint8)
+        for rows in row_chunks(len(pixels)):
+            gray[rows] = Image.fromarray(
+                np.ascontiguousarray(pixels[rows, :, :3])).convert('L')
+
+        return gray
+
+    if pixels.ndim == 2:
+        return np.broadcast_to(pixels[..., np.newaxis], pixels.shape + (3,))
+
+    return pixels[..., :3]
+
+
+def seed_coordinates(seeds: Seeds, height: int,
+                     width: int) -> Tuple[np.ndarray, np.ndarray]:
+    '''Rows and columns of the seed pixels, repeats in a list are kept'''
+
+    if isinstance(seeds, Image.Image):
+        seeds = np.asarray(seeds)
+
+    if isinstance(seeds, np.ndarray) and seeds.ndim >= 2:
+        if seeds.shape[:2] != (height, width):
+            raise ValueError('Seed mask does not match the image size')
+
+        if seeds.ndim == 3:
+            # alpha marks painted pixels of LA and RGBA scribbles
+            seeds = seeds[..., -1] if seeds.shape[2] in (2, 4) \
+                else seeds.any(axis=2)
+
+        return np.nonzero(seeds)
+
+    pixels = np.array([(pixel[1], pixel[0]) for pixel in seeds],
+                      dtype=np.intp).reshape(-1, 2)
+    ys, xs = pixels[:, 0], pixels[:, 1]
+
+    if len(pixels) and (ys.min() < 0 or xs.min() < 0 or
+                        ys.max() >= height or xs.max() >= width):
+        raise ValueError('Seed pixel is outside of the image')
+
+    return ys, xs
+
+
+class ImageProcessor():
+
+    def __init__(self,
+                 image: ImageSource,
+                 obj: Seeds,
+                 bg: Seeds,
+                 lmbd: float = 100.0,
+                 sgm: float = 1.0,
+                 bw: bool = True,
+                 nlink_cache: Optional[ArrayCache] = None) -> None:
+
+        self.__img = image_pixels(image, bw)
+        self.img_height, self.img_width = self.__img.shape[:2]
 
         self.__lambda = lmbd
         self.__sigma = sgm
         self.__bw = bw
+        self.__nlink_cache = nlink_cache
+
+        self.__bins, self.__bin_count = intensity_bins(self.__img, bw)
+
+        self.__object_bins = None
+        self.__background_bins = None
+        self.set_seeds(obj, bg)
 
-        self.__raw_obj_pixels = obj
-        self.__raw_bg_pixels = bg
-        self.__object_pixels = [self.__img[pixel.x, pixel.y] for pixel in obj]
-        self.__background_pixels = [
-            self.__img[pixel.x, pixel.y] for pixel in bg]
+        self.__weights = None
+        self.__arrays = None
         self.__edges: List[Edge] = []
         self.__runoff = self.img_height * self.img_width + 1
         self.__max_out_flow = None
 
-    def __get_pixel_index(self, pixel: Pixel) -> int:
-        return self.img_width * pixel.y + pixel.x
+    def __seed_mask(self, ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+        mask = np.zeros((self.img_height, self.img_width), dtype=bool)
+        mask[ys, xs] = True
 
-    def __edge_weight(self, pixel1: Pixel, pixel2: Pixel) -> int:
-        k = 100
-        px1 = self.__img[pixel1.x, pixel1.y]
-        px2 = self.__img[pixel2.x, pixel2.y]
+        return mask
 
-        dt = (abs(px1 - px2) ** 2) if self.__bw else \
-            abs(px1[0] - px2[0]) ** 2 + \
-            abs(px1[1] - px2[1]) ** 2 + \
-            abs(px1[2] - px2[2]) ** 2
+    def __get_distr(self, seed_bins: np.ndarray,
+                    max_flow: float) -> np.ndarray:
+        '''Per-pixel cost of assigning pixels to a seed intensity histogram'''
 
-        return int(k * math.exp(-dt / (2 * self.__sigma ** 2)))
+        counts = np.bincount(seed_bins, minlength=self.__bin_count)
 
-    def __get_obj_distr(self, max_flow: float):
+        # cost of every bin, looked up for all pixels at once
+        groups = np.full(self.__bin_count, max_flow, dtype=np.float64)
+        seen = counts > 0
+        groups[seen] = -self.__lambda * np.log(counts[seen] / len(seed_bins))
 
-        pixels_number: int = len(self.__object_pixels)
-        groups_number: int = 51
+        return groups[self.__bins]
 
-        groups: List[int] = [0 for i in range(groups_number)]
-        k: float = groups_number / 256
+    def __get_weights(self) -> np.ndarray:
+        if self.__weights is not None:
+            return self.__weights
 
-        for intensity in self.__object_pixels:
-            groups[math.floor(intensity * k)] += 1
+        if self.__nlink_cache is None:
+            self.__weights = nlink_weights(
+                self.__img, self.__sigma, self.__bw)
+            return self.__weights
 
-        for i in range(groups_number):
-            if groups[i] != 0:
-                groups[i] = - \
-                    self.__lambda * math.log(groups[i] / pixels_number)
-            else:
-                groups[i] = max_flow
+        # n-links only depend on the image, so other seeds can reuse them
+        key = nlink_key(self.__img, self.__sigma, self.__bw)
+        self.__weights = self.__nlink_cache.get(key)
 
-        def distribution(intensity: int, groups: List[int], k: int) -> int:
+        if self.__weights is None:
+            self.__weights = nlink_weights(
+                self.__img, self.__sigma, self.__bw)
+            self.__nlink_cache.put(key, self.__weights)
 
-            scaled_intensity: int = math.floor(intensity * k)
-            return groups[scaled_intensity]
+        return self.__weights
 
-        return lambda x: distribution(x, groups, k)
+    def get_max_out_flow(self) -> float:
+        if self.__max_out_flow:
+            return self.__max_out_flow
 
-    def __get_bg_distr(self, max_flow: float):
+        self.__max_out_flow = \
+            float(self.__get_weights().sum(axis=2).max()) + 1.0
 
-        pixels_number: int = len(self.__background_pixels)
-        groups_number: int = 51
+        return self.__max_out_flow
 
-        groups: List[int] = [0 for i in range(groups_number)]
-        k: float = groups_number / 256
+    def get_terminal_capacities(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''Capacities of source -> pixel and pixel -> runoff arcs by vertex'''
 
-        for intensity in self.__background_pixels:
-            groups[math.floor(intensity * k)] += 1
+        max_out_flow = self.get_max_out_flow()
 
-        for i in range(groups_number):
-            if groups[i] != 0:
-                groups[i] = - \
-                    self.__lambda * math.log(groups[i] / pixels_number)
-            else:
-                groups[i] = max_flow
+        obj_mask = self.__obj_mask
+        bg_mask = self.__bg_mask & ~obj_mask
 
-        def distribution(intensity: int, groups: List[int], k: int) -> int:
+        # fill in capacities for edges from source
+        source_caps = self.__get_distr(
+            self.__background_bins, max_out_flow)
+        source_caps[obj_mask] = max_out_flow
+        source_caps[bg_mask] = 0
 
-            scaled_intensity: int = math.floor(intensity * k)
-            return groups[scaled_intensity]
+        # fill in capacities for edges to runoff
+        runoff_caps = self.__get_distr(
+            self.__object_bins, max_out_flow)
+        runoff_caps[obj_mask] = 0
+        runoff_caps[bg_mask] = max_out_flow
 
-        return lambda x: distribution(x, groups, k)
+        return source_caps.ravel(), runoff_caps.ravel()
 
-    def __get_edges_for_pixel(self, pixel: Pixel) -> List[Edge]:
+    def set_seeds(self,
+                  obj: Seeds,
+                  bg: Seeds,
+                  refit: bool = True) -> None:
+        '''Replace the seeds, `refit=False` keeps the intensity histograms'''
 
-        idx = self.__get_pixel_index(pixel)
-        on_right, on_left, on_top, on_bottom = pixel.x == \
-            self.img_width - 1, \
-            pixel.x == 0, \
-            pixel.y == 0, \
-            pixel.y == self.img_height - 1
+        obj_ys, obj_xs = seed_coordinates(obj, self.img_height, self.img_width)
+        bg_ys, bg_xs = seed_coordinates(bg, self.img_height, self.img_width)
 
-        edges = []
+        self.__obj_mask = self.__seed_mask(obj_ys, obj_xs)
+        self.__bg_mask = self.__seed_mask(bg_ys, bg_xs)
 
-        rpixel = Pixel(x=pixel.x + 1, y=pixel.y)
-        bpixel = Pixel(x=pixel.x, y=pixel.y + 1)
-        lpixel = Pixel(x=pixel.x - 1, y=pixel.y)
-        tpixel = Pixel(x=pixel.x, y=pixel.y - 1)
+        if refit or self.__object_bins is None:
+            self.__object_bins = self.__bins[obj_ys, obj_xs]
+            self.__background_bins = self.__bins[bg_ys, bg_xs]
 
-        ridx = self.__get_pixel_index(rpixel)
-        bidx = self.__get_pixel_index(bpixel)
-        lidx = self.__get_pixel_index(lpixel)
-        tidx = self.__get_pixel_index(tpixel)
+        self.__arrays = None
+        self.__edges = []
 
-        if not on_right:
-            edges.append(
-                Edge(idx + 1, ridx + 1, self.__edge_weight(pixel, rpixel)))
+    @property
+    def nbytes(self) -> int:
+        '''Memory held by the pixels, seeds, n-links and cached graph arrays
 
-        if not on_left:
-            edges.append(
-                Edge(idx + 1, lidx + 1, self.__edge_weight(pixel, lpixel)))
+        A memory-mapped image is left out, the OS pages it in and out.
+        '''
 
-        if not on_bottom:
-            edges.append(
-                Edge(idx + 1, bidx + 1, self.__edge_weight(pixel, bpixel)))
+        arrays = [self.__bins, self.__obj_mask, self.__bg_mask,
+                  self.__object_bins, self.__background_bins,
+                  self.__weights, *(self.__arrays or ())]
+        if not isinstance(self.__img, np.memmap):
+            arrays.append(self.__img)
 
-        if not on_top:
-            edges.append(
-                Edge(idx + 1, tidx + 1, self.__edge_weight(pixel, tpixel)))
+        return sum(array.nbytes for array in arrays if array is not None)
 
-        edges.append(Edge(0, idx + 1, 0))
-        edges.append(Edge(idx + 1, self.__runoff, 0))
+    def get_pixels(self) -> np.ndarray:
+        '''8-bit gray or RGB pixels the graph is built from'''
 
-        return edges
+        return self.__img
 
-    def get_max_out_flow(self) -> float:
-        if self.__max_out_flow:
-            return self.__max_out_flow
+    def get_grid_capacities(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''Capacities of the image graph laid out on the pixel grid
 
-        flow = [0] * (self.img_width * self.img_height + 1)
+        Returns (H, W, 4) n-links ordered as `NEIGHBOURS` followed by (H, W)
+        source and runoff t-links, the input of `GridPPA`.
+        '''
 
-        for edge in self.__edges:
-            flow[edge.start - 1] += edge.capacity
-        return max(flow) + 1.0
+        shape = (self.img_height, self.img_width)
+        source_caps, runoff_caps = self.get_terminal_capacities()
 
-    def __get_index_pixel(self, idx: int):
-        y = int(idx / self.img_width)
-        x = idx - self.img_width * y
+        return self.__get_weights(), \
+            source_caps.reshape(shape), \
+            runoff_caps.reshape(shape)
 
-        return Pixel(x, y)
+    def get_graph_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''Graph of the image as flat arrays of arc starts, ends and capacities
 
-    def get_graph_edges(self):
+        Vertex 0 is the source, pixel (x, y) is vertex `y * width + x + 1`
+        and the last vertex is the runoff. Arcs come in blocks: the n-links
+        of every direction of `NEIGHBOURS` in turn, each over the pixels
+        having that neighbour in row-major order, then the source -> pixel
+        and the pixel -> runoff arcs in vertex order. The original edge
+        list held the same arcs pixel by pixel; `band_graph` and the
+        superpixel graph lay their arrays out in these blocks as well.
+        '''
 
-        if len(self.__edges) > 0:
-            return self.__edges
+        if self.__arrays is not None:
+            return self.__arrays
 
-        # add edges between pixels
-        for h in range(self.img_height):
-            for w in range(self.img_width):
+        height, width = self.img_height, self.img_width
+        idx = np.arange(1, height * width + 1,
+                        dtype=np.int64).reshape(height, width)
 
-                pixel: Pixel = Pixel(x=w, y=h)
+        weights = self.__get_weights()
 
-                self.__edges += self.__get_edges_for_pixel(pixel)
+        starts, ends, capacities = [], [], []
 
-        self.__max_out_flow = self.get_max_out_flow()
+        # add edges between pixels
+        for d, (dy, dx) in enumerate(NEIGHBOURS):
+            src, dst = neighbour_slices(dy, dx, height, width)
 
-        obj_hist_distr = self.__get_obj_distr(self.__max_out_flow)
-        bg_hist_distr = self.__get_bg_distr(self.__max_out_flow)
+            starts.append(idx[src].ravel())
+            ends.append(idx[dst].ravel())
+            capacities.append(weights[src + (d,)].ravel().astype(np.float64))
 
-        # fill in capacities for edges from source
-        for edge in [e for e in self.__edges if e.start == 0]:
-            pixel = self.__get_index_pixel(edge.end - 1)
+        source_caps, runoff_caps = self.get_terminal_capacities()
 
-            if pixel in self.__raw_obj_pixels:
-                edge.capacity = self.__max_out_flow
+        pixels = idx.ravel()
 
-            elif pixel in self.__raw_bg_pixels:
-                edge.capacity = 0
+        starts += [np.zeros_like(pixels), pixels]
+        ends += [pixels, np.full_like(pixels, self.__runoff)]
+        capacities += [source_caps, runoff_caps]
 
-            else:
-                edge.capacity = bg_hist_distr(self.__img[pixel.x, pixel.y])
+        self.__arrays = np.concatenate(starts), \
+            np.concatenate(ends), \
+            np.concatenate(capacities)
 
-        # fill in capacities for edges from source
-        for edge in [e for e in self.__edges if e.end == self.__runoff]:
-            pixel = self.__get_index_pixel(edge.start - 1)
+        return self.__arrays
+
+    def get_graph_edges(self) -> List[Edge]:
+        '''`Edge` list view of `get_graph_arrays`'''
 
-            if pixel in self.__raw_obj_pixels:
-                edge.capacity = 0
+        if len(self.__edges) > 0:
+            return self.__edges
 
-            elif pixel in self.__raw_bg_pixels:
-                edge.capacity = self.__max_out_flow
+        starts, ends, capacities = self.get_graph_arrays()
 
-            else:
-                edge.capacity = obj_hist_distr(self.__img[pixel.x, pixel.y])
+        self.__edges = [Edge(s, e, c) for s, e, c in zip(
+            starts.tolist(), ends.tolist(), capacities.tolist())]
 
         return self.__edges
 
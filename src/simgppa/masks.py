@@ -0,0 +1,84 @@
+'''Object masks: boolean (height, width) arrays and the files they are kept in
+
+    png     1-bit PNG image
+    packed  .npz of the mask bits packed eight to a byte, row by row
+    rle     .npz of the lengths of the alternating runs of background and
+            object pixels in row-major order, starting with background
+'''
+
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+MASK_SUFFIXES = {'png': '.png', 'packed': '.packed.npz', 'rle': '.rle.npz'}
+
+
+def cut_labels(labels: np.ndarray, height: int, width: int) -> np.ndarray:
+    '''Mask of the pixels on the source side of a cut of the image graph,
+    `labels` are the `min_cut_labels` of its vertices
+    '''
+
+    # drop the source and the runoff
+    return labels[1:-1].reshape(height, width)
+
+
+def pack_mask(mask: np.ndarray) -> np.ndarray:
+    return np.packbits(mask, axis=None)
+
+
+def unpack_mask(bits: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    size = shape[0] * shape[1]
+
+    return np.unpackbits(bits, count=size).astype(bool).reshape(shape)
+
+
+def encode_rle(mask: np.ndarray) -> np.ndarray:
+    '''Run lengths of the mask, the first run is background and may be empty'''
+
+    flat = mask.ravel()
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    bounds = np.concatenate(([0], changes, [flat.size]))
+    runs = np.diff(bounds)
+
+    if flat.size and flat[0]:
+        runs = np.concatenate(([0], runs))
+
+    return runs.astype(np.int64)
+
+
+def decode_rle(runs: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    values = np.arange(len(runs)) % 2 == 1
+
+    return np.repeat(values, runs).reshape(shape)
+
+
+def save_mask(mask: np.ndarray, output, fmt: str = 'png') -> None:
+    '''Write the mask to a path or a binary file object'''
+
+    if fmt == 'png':
+        Image.fromarray(mask).save(output, format='PNG')
+    elif fmt == 'packed':
+        np.savez(output, bits=pack_mask(mask), shape=mask.shape)
+    elif fmt == 'rle':
+        np.savez(output, runs=encode_rle(mask), shape=mask.shape)
+    else:
+        raise ValueError(f'Unknown mask format {fmt!r}, expected '
+                         f'one of {", ".join(MASK_SUFFIXES)}')
+
+
+def load_mask(path) -> np.ndarray:
+    '''Mask of a file written by `save_mask` or of any bilevel image'''
+
+    if Path(path).suffix != '.npz':
+        with Image.open(path) as image:
+            return np.asarray(image.convert('L')) > 127
+
+    with np.load(path) as archive:
+        shape = tuple(archive['shape'])
+
+        if 'bits' in archive:
+            return unpack_mask(archive['bits'], shape)
+
+        return decode_rle(archive['runs'], shape)
@@ -1,45 +1,76 @@
+from collections import namedtuple
+from typing import Optional, Tuple
+
+import numpy as np
 from PIL import Image
 
+# ratios of `compare` plus the confusion matrix [[tn, fp], [fn, tp]] with
+# reference labels in rows and output labels in columns
+Evaluation = namedtuple('Evaluation',
+                        'correct_obj correct_bg correct_total '
+                        'correct_relative confusion iou dice')
+
+
+def intensities(image: Image.Image) -> np.ndarray:
+    '''Pixel intensities as `Image.load` gives them, colors summed over RGB'''
+
+    values = np.asarray(image)
+
+    if image.mode == '1':
+        return values.astype(np.int64) * 255
+
+    if values.ndim == 3:
+        return values[..., :3].astype(np.int64).sum(axis=2)
+
+    return values.astype(np.int64)
+
+
+def dump(path, reference: np.ndarray, output: np.ndarray) -> None:
+    '''Stream a `x y : reference : output` line per pixel, column by column'''
+
+    with open(path, 'w') as out:
+        for i in range(reference.shape[1]):
+            out.writelines(f'{i} {j} : {r} : {o}\n' for j, (r, o) in
+                           enumerate(zip(reference[:, i].tolist(),
+                                         output[:, i].tolist())))
 
-def compare(reference: Image.Image, output: Image.Image) -> None:
-    h1, w2, img1 = reference.height, reference.width, reference.load()
-    h2, w2, img2 = output.height, output.width, output.load()
 
-    if (h1 != h2 or w2 != w2):
+def evaluate(reference: Image.Image,
+             output: Image.Image,
+             dump_path: Optional[str] = None) -> Evaluation:
+    '''Agreement of an output mask with the reference, non-zero is object'''
+
+    if reference.size != output.size:
         raise Exception('Cannot compare following images')
 
-    obj_correct_pixels = 0
-    bck_correct_pixels = 0
-    obj_union_count = 0
-
-    with open('output.txt', 'w+') as out:
-        for i in range(w2):
-            for j in range(h1):
-                pixel1 = img1[i, j]
-                pixel2 = img2[i, j]
-
-                if (isinstance(pixel1, int) == True):
-                    intensity1 = pixel1
-                else:
-                    intensity1 = pixel1[0] + pixel1[1] + pixel1[2]
-                if (isinstance(pixel2, int) == True):
-                    intensity2 = pixel2
-                else:
-                    intensity2 = pixel2[0] + pixel2[1] + pixel2[2]
-
-                out.write(f'{i} {j} : {intensity1} : {intensity2}\n')
-
-                if (intensity1 > 0 and intensity2 > 0):
-                    obj_correct_pixels += 1
-
-                if (intensity1 > 0 or intensity2 > 0):
-                    obj_union_count += 1
-
-                if (intensity1 == 0 and intensity2 == 0):
-                    bck_correct_pixels += 1
-
-    return \
-        obj_correct_pixels / (w2 * h1), \
-        bck_correct_pixels / (w2 * h1), \
-        (obj_correct_pixels + bck_correct_pixels) / (w2 * h1), \
-        obj_correct_pixels / obj_union_count
+    expected, got = intensities(reference), intensities(output)
+
+    if dump_path is not None:
+        dump(dump_path, expected, got)
+
+    expected, got = expected > 0, got > 0
+
+    tp = int(np.count_nonzero(expected & got))
+    tn = int(np.count_nonzero(~expected & ~got))
+    fp = int(np.count_nonzero(~expected & got))
+    fn = int(np.count_nonzero(expected & ~got))
+
+    pixels = expected.size
+    union = tp + fp + fn
+    # two empty masks agree completely
+    iou = tp / union if union else 1.0
+    dice = 2 * tp / (2 * tp + fp + fn) if union else 1.0
+
+    return Evaluation(tp / pixels, tn / pixels, (tp + tn) / pixels, iou,
+                      np.array([[tn, fp], [fn, tp]]), iou, dice)
+
+
+def compare(reference: Image.Image,
+            output: Image.Image,
+            dump_path: Optional[str] = None) -> Tuple[float, float,
+                                                      float, float]:
+    '''Shares of correct object and background pixels, of all correct pixels
+    and of correct object pixels in the union of both objects
+    '''
+
+    return evaluate(reference, output, dump_path)[:4]
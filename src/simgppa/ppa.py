@@ -1,7 +1,11 @@
-from queue import Queue, PriorityQueue
-from typing import Optional, Union, List, Tuple, Dict, Set, NewType
+import time
+from collections import deque
+from typing import Callable, Dict, Optional, Union, List, NewType
+
 import numpy as np
-from collections import namedtuple
+
+from .graph import ResidualGraph
+from .scheduler import SCHEDULERS
 
 Vertex = NewType('Vertex', int)
 
@@ -15,233 +19,636 @@ class Edge:
         self.capacity = capacity
 
 
-class EdgeCapacity:
-
-    def __init__(self, capacity: Union[int, float]) -> None:
-        self.capacity = capacity
-        self.pair = None
-
-
-class VertexEdges:
+class PPAStats:
+    '''Work done by `PPA.max_flow`, collected with `PPA(stats=True)`'''
 
     def __init__(self) -> None:
-        self.edges: Dict[int, EdgeCapacity] = dict()
-
-    def __getitem__(self, vertex: Vertex) -> Optional[int]:
-        arc = self.edges.get(vertex)
-
-        if arc is not None:
-            return arc.capacity
-
-        return None
+        self.saturating_pushes = 0
+        self.nonsaturating_pushes = 0
+        self.relabels = 0
+        self.global_relabels = 0
+        self.arcs_scanned = 0
+        # most vertices waiting in the active queue at once
+        self.max_active = 0
+        # seconds spent in the global relabel BFS
+        self.global_relabel_time = 0.0
 
-    def __setitem__(self, vertex: Vertex, capacity: int) -> None:
-        arc = self.edges.get(vertex)
-        if arc is not None:
-            arc.capacity = capacity
-            return
+    @property
+    def operations(self) -> int:
+        '''Pushes and relabels, the work the callback interval counts'''
 
-        raise ValueError("Atempt to set capacity of non-existent arc")
+        return self.saturating_pushes + self.nonsaturating_pushes + \
+            self.relabels
 
-    def get_edge_capacity(self, vertex: Vertex) -> Optional[EdgeCapacity]:
-        return self.edges.get(vertex)
-
-    def set_edge_capacity(self, vertex: Vertex, capacity: int) -> None:
-        self.edges[vertex] = EdgeCapacity(capacity)
+    def as_dict(self) -> Dict:
+        return dict(vars(self), operations=self.operations)
 
 
 class PPA:
     def __init__(self,
                  vertex_num: int,
-                 edges: List[Edge],
-                 flow: Optional[List[Edge]] = None) -> None:
-        self.edges = edges
+                 edges: Union[List[Edge], ResidualGraph],
+                 flow: Optional[List[Edge]] = None,
+                 scheduler: Optional[str] = None,
+                 min_cut_only: bool = False,
+                 stats: bool = False,
+                 callback: Optional[Callable[[PPAStats], None]] = None,
+                 callback_interval: int = 100000,
+                 _init_preflow: bool = True) -> None:
+
+        if isinstance(edges, ResidualGraph):
+            self.edges = None
+            self.graph = edges
+        else:
+            self.edges = edges
+            self.graph = ResidualGraph.from_edges(vertex_num, edges)
+
+        if self.graph.vertex_num != vertex_num:
+            raise ValueError('Graph has different number of vertices')
+
         self.vertex_num = vertex_num
+        # phase one only: stop once no active vertex can reach the runoff
+        self.min_cut_only = min_cut_only
+
+        # work counters, also kept for the progress callback
+        self.stats = PPAStats() if stats or callback is not None else None
+        self.callback = callback
+        self.callback_interval = callback_interval
 
         self.__max_flow = None
         self.__min_cut = None
+        self.__min_cut_labels = None
 
-        self._M: int = len(edges) + vertex_num
-        self.relabeling_counter: int = self._M - 1
-        self.capacity: List[VertexEdges] = [VertexEdges()
-                                            for _ in range(self.vertex_num)]
-
-        self.v_queue: PriorityQueue[Vertex] = PriorityQueue()
-        self.in_queue: List[bool] = [False for _ in range(
-            self.vertex_num)]
+        edges_num = len(self.graph.edge_arcs) \
+            if self.graph.edge_arcs is not None else self.graph.arc_num // 2
 
-        self.height: List[int] = \
-            [self.vertex_num] + \
-            [2 * self.vertex_num for _ in range(self.vertex_num - 2)] + \
-            [0]
+        self._M: int = edges_num + vertex_num
+        self.relabeling_counter: int = self._M - 1
 
-        self.excess: List[int] = [0 for _ in range(self.vertex_num)]
+        if scheduler is None:
+            # highest-label only pays off when nothing climbs above
+            # vertex_num, i.e. without the phase returning excess to source
+            scheduler = 'highest' if min_cut_only else 'fifo'
+
+        if scheduler not in SCHEDULERS:
+            raise ValueError(f'Unknown scheduler {scheduler!r}, expected '
+                             f'one of {", ".join(SCHEDULERS)}')
+
+        self.scheduler = scheduler
+        self.v_queue = SCHEDULERS[scheduler]()
+        self.in_queue = bytearray(self.vertex_num)
+
+        self.height = np.full(self.vertex_num, 2 * self.vertex_num,
+                              dtype=np.int64)
+        self.height[0] = self.vertex_num
+        self.height[-1] = 0
+        # number of vertices on every height below vertex_num, the gap
+        # heuristic lifts everything above an emptied height
+        self.height_count = np.zeros(self.vertex_num + 1, dtype=np.int64)
+        # height vertices above a gap are lifted to
+        self.gap_height = self.vertex_num if min_cut_only \
+            else self.vertex_num + 1
+
+        self.excess = np.zeros(self.vertex_num,
+                               dtype=self.graph.residual.dtype)
 
         self.runoff = self.vertex_num - 1
         self.source = 0
         self.__flow = None
-        self.__read_edges()
+        # lifted on both terminal arcs of a vertex by
+        # `update_terminal_capacities`, it adds to every cut
+        self.flow_offset = 0
+        self.__terminal_arcs = None
+        self.__terminal_shift = None
 
-        if flow:
-            self.__apply_flow()
+        # a checkpoint brings its own preflow, see `load_checkpoint`
+        if _init_preflow:
+            self.__init_preflow(flow)
 
-        for vertex, ec in self.capacity[self.source].edges.items():
-            self.excess[vertex] = ec.capacity
-            self.capacity[vertex][self.source] = ec.capacity
-            ec.capacity = 0.0
+    def __init_preflow(self, flow: Optional[List[Edge]]) -> None:
+        '''Saturate the source arcs over the given flow and queue the ends'''
 
-            # fisrt nodes to queue
-            self.v_queue.put((0, vertex))
-            self.in_queue[vertex] = True
+        if flow:
+            self.__apply_flow(flow)
 
-        self.__relabel()
+        residual, reverse = self.graph.residual, self.graph.reverse
+        arcs = np.arange(*self.graph.offsets[self.source:self.source + 2])
+        vertices = self.graph.heads[arcs]
 
-    def __read_edges(self) -> None:
+        # saturate all arcs leaving the source
+        self.excess[vertices] += residual[arcs]
+        residual[reverse[arcs]] += residual[arcs]
+        residual[arcs] = 0
 
-        for edge in self.edges:
-            fedge: Optional[EdgeCapacity] = self.capacity[edge.start].get_edge_capacity(
-                edge.end)
+        # fisrt nodes to queue
+        for vertex in vertices.tolist():
+            self.v_queue.push(vertex, 0)
+            self.in_queue[vertex] = True
 
-            if fedge is None:
-                self.capacity[edge.start].set_edge_capacity(
-                    edge.end, edge.capacity)
-                fedge = self.capacity[edge.start].get_edge_capacity(edge.end)
+        self.__relabel()
+        self.__global_relabel_if_due()
 
-                self.capacity[edge.end].set_edge_capacity(edge.start, 0)
-                paired_arc = self.capacity[edge.end].get_edge_capacity(
-                    edge.start)
+    @classmethod
+    def from_arrays(cls, vertex_num: int, starts, ends, capacities,
+                    **kwargs) -> 'PPA':
+        '''Solver over edges in flat arrays of starts, ends and capacities'''
 
-                fedge.pair = paired_arc
-                paired_arc.pair = fedge
-            else:
-                fedge.capacity = edge.capacity
+        return cls(vertex_num,
+                   ResidualGraph.from_arrays(
+                       vertex_num, starts, ends, capacities),
+                   **kwargs)
 
     def __apply_flow(self, flow) -> None:
 
+        residual, reverse = self.graph.residual, self.graph.reverse
+
         for edge in flow:
-            fedge: EdgeCapacity = self.capacity[edge.start].get_edge_capacity(
-                edge.end)
-            fedge.capacity -= edge.capacity
-            fedge.pair.capacity += edge.capacity
+            arc = self.graph.find_arc(edge.start, edge.end)
+            if arc < 0:
+                raise ValueError(
+                    f'Flow on non-existent edge {edge.start} -> {edge.end}')
 
-            if edge.end == self.runoff:
-                self.excess[self.runoff] += edge.capacity
+            residual[arc] -= edge.capacity
+            residual[reverse[arc]] += edge.capacity
 
-    def __push(self, vertex: Vertex, edge_vertex: Vertex, ec: EdgeCapacity) -> None:
+            self.excess[edge.start] -= edge.capacity
+            self.excess[edge.end] += edge.capacity
 
-        delta = min(self.excess[vertex], ec.capacity)
-        self.excess[vertex] -= delta
-        self.excess[edge_vertex] += delta
-        ec.capacity -= delta
-        ec.pair.capacity += delta
+        self.excess[self.source] = 0
 
     def __relabel(self):
+        self.relabeling_counter += 1
+
+    def __global_relabel_if_due(self) -> None:
+        # only between discharges: new heights in the middle of a scan
+        # would mix with the old ones and break the labeling
+        if self.relabeling_counter >= self._M:
+            self.relabeling_counter = 0
+
+            if self.stats is None:
+                self.__global_relabel()
+            else:
+                start = time.perf_counter()
+                self.__global_relabel()
+                self.stats.global_relabel_time += time.perf_counter() - start
+                self.stats.global_relabels += 1
+
+    def __global_relabel(self) -> None:
+        offsets = memoryview(self.graph.offsets)
+        heads = memoryview(self.graph.heads)
+        residual = memoryview(self.graph.residual)
+        reverse = memoryview(self.graph.reverse)
+        height = memoryview(self.height)
+
+        # vertices reaching neither terminal stay on the initial height
+        self.height[1:-1] = 2 * self.vertex_num
+
+        nodes_checked = bytearray(self.vertex_num)
+        nodes_checked[self.source] = nodes_checked[self.runoff] = True
+
         def height_as_distance(vertex: Vertex):
-            to_check: 'Queue[Vertex]' = Queue()
-            to_check.put(vertex)
+            to_check = deque([vertex])
 
-            while not to_check.empty():
-                edge = to_check.get()
+            while to_check:
+                node = to_check.popleft()
+                node_height = height[node] + 1
 
-                for v, ce in self.capacity[edge].edges.items():
-                    if ce.pair.capacity > 0 and not nodes_checked[v]:
-                        self.height[v] = self.height[edge] + 1
+                for arc in range(offsets[node], offsets[node + 1]):
+                    v = heads[arc]
+                    if residual[reverse[arc]] > 0 and not nodes_checked[v]:
+                        height[v] = node_height
                         nodes_checked[v] = True
-                        to_check.put(v)
+                        to_check.append(v)
 
-        self.relabeling_counter += 1
-        if self.relabeling_counter == self._M:
-            self.relabeling_counter = 0
-
-            nodes_checked: List[bool] = \
-                [True] + \
-                [False for _ in range(self.vertex_num - 2)] + \
-                [True]
-            height_as_distance(self.runoff)
+        height_as_distance(self.runoff)
+        if not self.min_cut_only:
             height_as_distance(self.source)
 
+        low = self.height[self.height < self.vertex_num]
+        self.height_count[:] = np.bincount(
+            low, minlength=self.vertex_num + 1)
+
+    def __lift(self, vertex: Vertex, new_height: int) -> None:
+        height, count = self.height, self.height_count
+        old_height = int(height[vertex])
+
+        if old_height < self.vertex_num:
+            count[old_height] -= 1
+
+            if count[old_height] == 0:
+                # gap: nothing above old_height can reach the runoff anymore
+                lifted = (height > old_height) & (height < self.vertex_num)
+                height[lifted] = self.gap_height
+                count[old_height + 1:self.vertex_num] = 0
+                new_height = max(new_height, self.gap_height)
+
+        height[vertex] = new_height
+
+        if new_height < self.vertex_num:
+            count[new_height] += 1
+
+    def __lower(self, vertices: np.ndarray,
+                bounds: np.ndarray) -> List[Vertex]:
+        '''Cap heights of vertices by bounds and repair the labeling upstream
+
+        Only vertices with a residual arc into a lowered vertex are visited,
+        returns every vertex lowered.
+        '''
+
+        offsets = memoryview(self.graph.offsets)
+        heads = memoryview(self.graph.heads)
+        residual = memoryview(self.graph.residual)
+        reverse = memoryview(self.graph.reverse)
+        excess = memoryview(self.excess)
+        height, count = self.height, self.height_count
+
+        def set_height(vertex: Vertex, new_height: int) -> None:
+            if height[vertex] < self.vertex_num:
+                count[height[vertex]] -= 1
+            if new_height < self.vertex_num:
+                count[new_height] += 1
+            height[vertex] = new_height
+
+        lowered: List[Vertex] = []
+        to_check: 'deque[Vertex]' = deque()
+
+        for vertex, bound in zip(vertices.tolist(), bounds.tolist()):
+            if height[vertex] > bound:
+                set_height(vertex, bound)
+                lowered.append(vertex)
+                to_check.append(vertex)
+
+        while to_check:
+            node = to_check.popleft()
+            node_height = int(height[node]) + 1
+
+            for arc in range(offsets[node], offsets[node + 1]):
+                v = heads[arc]
+                paired = reverse[arc]
+                capacity = residual[paired]
+
+                if capacity == 0 or height[v] <= node_height or \
+                        v == self.runoff:
+                    continue
+
+                if v == self.source:
+                    # the source keeps its height, saturate its arc instead
+                    excess[node] += capacity
+                    residual[arc] += capacity
+                    residual[paired] = 0
+                else:
+                    set_height(v, node_height)
+                    lowered.append(v)
+                    to_check.append(v)
+
+        return lowered
+
+    def update_terminal_capacities(self, vertices, source_caps,
+                                   runoff_caps) -> None:
+        '''Set capacities of `source -> v` and `v -> runoff`, keep the preflow
+
+        Terminal arcs that would fall below their flow are both raised by the
+        difference, which shifts every cut by the same value kept in
+        `flow_offset`. The next `max_flow` or `min_cut` call resumes from the
+        repaired preflow instead of solving from scratch.
+        '''
+
+        graph = self.graph
+        capacity, residual, reverse = \
+            graph.capacity, graph.residual, graph.reverse
+
+        if self.__terminal_arcs is None:
+            self.__terminal_arcs = graph.terminal_arcs(self.source,
+                                                       self.runoff)
+            self.__terminal_shift = np.zeros(self.vertex_num,
+                                             dtype=residual.dtype)
+
+        vertices = np.asarray(vertices, dtype=np.int64)
+        source_caps = np.asarray(source_caps, dtype=residual.dtype)
+        runoff_caps = np.asarray(runoff_caps, dtype=residual.dtype)
+
+        from_source, to_runoff = self.__terminal_arcs
+        source_arcs, runoff_arcs = from_source[vertices], to_runoff[vertices]
+
+        if (source_arcs < 0).any() or (runoff_arcs < 0).any():
+            raise ValueError('Vertex has no arc from source or to runoff')
+
+        # arcs back to the terminals have no capacity of their own, so their
+        # residual is the flow already sent
+        source_flow = residual[reverse[source_arcs]]
+        runoff_flow = residual[reverse[runoff_arcs]]
+
+        shift = np.maximum(np.maximum(source_flow - source_caps,
+                                      runoff_flow - runoff_caps), 0)
+        source_caps = source_caps + shift
+        runoff_caps = runoff_caps + shift
+
+        # the new capacities replace the earlier shift of the vertices
+        self.flow_offset += (shift.sum() -
+                             self.__terminal_shift[vertices].sum()).item()
+        self.__terminal_shift[vertices] = shift
+
+        # arcs leaving the source stay saturated
+        self.excess[vertices] += source_caps - source_flow
+        capacity[source_arcs] = source_caps
+        residual[source_arcs] = 0
+        residual[reverse[source_arcs]] = source_caps
+
+        capacity[runoff_arcs] = runoff_caps
+        residual[runoff_arcs] = runoff_caps - runoff_flow
+
+        # a vertex with an arc to the runoff is at most right above it
+        reaching = vertices[residual[runoff_arcs] > 0]
+        lowered = self.__lower(reaching, np.ones_like(reaching))
+
+        active_height = self.vertex_num if self.min_cut_only \
+            else 4 * self.vertex_num
+
+        for vertex in vertices.tolist() + lowered:
+            if self.excess[vertex] > 0 and self.height[vertex] < active_height:
+                self.__push_vertex(vertex)
+
+        self.__max_flow = None
+        self.__min_cut = None
+        self.__min_cut_labels = None
+        self.__flow = None
+
     def __push_vertex(self, vertex: Vertex) -> None:
         if not self.in_queue[vertex]:
-            self.v_queue.put((self.height[vertex], vertex))
+            self.v_queue.push(vertex, int(self.height[vertex]))
             self.in_queue[vertex] = True
 
     def __pop_vertex(self) -> Vertex:
-        node = self.v_queue.get()[1]
+        node = self.v_queue.pop()
         self.in_queue[node] = False
         return node
 
-    def min_cut(self) -> List[Vertex]:
+    def min_cut_labels(self) -> np.ndarray:
+        '''Read-only boolean array, true for the vertices of `min_cut`'''
 
-        if self.__min_cut:
-            return self.min_cut
+        if self.__min_cut_labels is not None:
+            return self.__min_cut_labels
 
-        if not self.__max_flow:
+        if self.__max_flow is None:
             self.max_flow()
 
-        mincut_nodes: Set[Vertex] = set([self.source])
-        to_check: 'Queue[Vertex]' = Queue()
-        to_check.put(self.source)
+        # the source side reachable in the residual graph, the smallest of
+        # the minimum cuts; the excess a preflow keeps would flow back to
+        # the source, so everything the excess can reach is on that side
+        starts = [self.source]
+        if self.min_cut_only:
+            excess = self.excess[:-1] > 0
+            excess[self.source] = False
+            starts += np.flatnonzero(excess).tolist()
 
-        while not to_check.empty():
-            node = to_check.get()
+        labels = self.graph.reachable(starts)
 
-            for vertex, ec in self.capacity[node].edges.items():
-                if ec.capacity > 0 and vertex not in mincut_nodes:
-                    mincut_nodes.add(vertex)
-                    to_check.put(vertex)
+        labels.setflags(write=False)
+        self.__min_cut_labels = labels
 
-        return list(mincut_nodes)
+        return labels
+
+    def min_cut(self) -> List[Vertex]:
+
+        if self.__min_cut is None:
+            self.__min_cut = np.flatnonzero(self.min_cut_labels()).tolist()
+
+        return self.__min_cut
 
     def flow(self):
 
         if self.__flow:
             return self.__flow
 
-        if not self.__max_flow:
-            self.__max_flow()
+        if self.min_cut_only:
+            raise ValueError('Flow is not available in min-cut-only mode')
 
-        f = [[0, 0, 0] for i in range(len(self.edges))]
-        for i in range(len(f)):
-            f[i][0] = self.edges[i].start
-            f[i][1] = self.edges[i].end
-            f[i][2] = self.edges[i].capacity - \
-                self.capacity[self.edges[i].start][self.edges[i].end]
-            if f[i][2] < 0:
-                f[i][2] = 0
+        if self.__max_flow is None:
+            self.max_flow()
 
-        self.__flow = f
+        arcs = self.graph.edge_arcs
+        if arcs is None:
+            arcs = np.flatnonzero(self.graph.capacity)
 
-        return f
+        f = np.zeros(len(arcs), dtype=self.graph.residual.dtype)
+        f[arcs >= 0] = self.graph.flow()[arcs[arcs >= 0]]
 
-    def max_flow(self):
+        if self.edges is not None:
+            starts = [edge.start for edge in self.edges]
+            ends = [edge.end for edge in self.edges]
+        else:
+            starts = self.graph.tails()[arcs].tolist()
+            ends = self.graph.heads[arcs].tolist()
 
-        if self.__max_flow:
-            return self.__max_flow
+        self.__flow = [list(e) for e in zip(starts, ends, f.tolist())]
+
+        return self.__flow
+
+    def __discharge(self, active_height: int,
+                    deadline: Optional[float] = None) -> bool:
+        '''Discharge active vertices, False if stopped by the `deadline`
+
+        With `stats` the work is counted and the progress callback called.
+        '''
+
+        offsets = memoryview(self.graph.offsets)
+        heads = memoryview(self.graph.heads)
+        residual = memoryview(self.graph.residual)
+        reverse = memoryview(self.graph.reverse)
+        height = memoryview(self.height)
+        excess = memoryview(self.excess)
+        max_height = 2 * self.vertex_num
+
+        stats, callback = self.stats, self.callback
+        counting = stats is not None
+        v_queue = self.v_queue
+        if counting:
+            next_call = stats.operations + self.callback_interval
+            stats.max_active = max(stats.max_active, len(v_queue))
+
+        while v_queue:  # while there are some active nodes
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+
+            self.__global_relabel_if_due()
 
-        while not self.v_queue.empty():  # while there are some active nodes
             vertex = self.__pop_vertex()
-            if vertex in (self.source, self.runoff):
+            if vertex in (self.source, self.runoff) or \
+                    height[vertex] >= active_height:
                 continue
 
-            while self.excess[vertex] != 0.0:
-                height = 2 * self.vertex_num
+            while excess[vertex] != 0:
+                min_height = max_height
 
-                for v, ec in self.capacity[vertex].edges.items():
-                    if ec.capacity != 0:  # if the arc is admissible
+                for arc in range(offsets[vertex], offsets[vertex + 1]):
+                    if counting:
+                        stats.arcs_scanned += 1
+                    capacity = residual[arc]
+                    if capacity != 0:  # if the arc is admissible
+                        v = heads[arc]
                         # pushing
-                        if self.height[vertex] == self.height[v] + 1:
-                            self.__push(vertex, v, ec)
+                        if height[vertex] == height[v] + 1:
+                            delta = min(excess[vertex], capacity)
+                            excess[vertex] -= delta
+                            excess[v] += delta
+                            residual[arc] = capacity - delta
+                            residual[reverse[arc]] += delta
+
                             self.__push_vertex(v)
                             self.__relabel()
-                            if self.excess[vertex] == 0:
+                            if counting:
+                                if delta == capacity:
+                                    stats.saturating_pushes += 1
+                                else:
+                                    stats.nonsaturating_pushes += 1
+                                if len(v_queue) > stats.max_active:
+                                    stats.max_active = len(v_queue)
+                            if excess[vertex] == 0:
                                 break
                         else:
-                            height = min(height, self.height[v])
+                            min_height = min(min_height, height[v])
 
-                if self.excess[vertex] != 0:
-                    self.height[vertex] = height + 1
+                if excess[vertex] != 0:
+                    self.__lift(vertex, min_height + 1)
                     self.__relabel()
+                    if counting:
+                        stats.relabels += 1
+
+                if callback is not None and stats.operations >= next_call:
+                    next_call = stats.operations + self.callback_interval
+                    callback(stats)
+
+                if height[vertex] >= active_height:
+                    break
+
+        # the last call sees the final counters
+        if callback is not None:
+            callback(stats)
+
+        return True
 
-        self.__max_flow = self.excess[self.runoff]
+    @property
+    def nbytes(self) -> int:
+        '''Memory held by the graph and the preflow arrays'''
+
+        arrays = (self.height, self.excess, self.height_count,
+                  self.__terminal_shift)
+
+        return self.graph.nbytes + len(self.in_queue) + \
+            sum(array.nbytes for array in arrays if array is not None)
+
+    @property
+    def finished(self) -> bool:
+        '''Whether the last `max_flow` ran to the end'''
+
+        return self.__max_flow is not None
+
+    def max_flow(self, time_budget: Optional[float] = None):
+        '''Value of the maximum flow
+
+        With a `time_budget` in seconds the solve may stop early and return
+        the flow that has reached the runoff so far, a lower bound. `finished`
+        tells the two apart; the next call goes on from the current preflow.
+        '''
+
+        if self.__max_flow is not None:
+            return self.__max_flow
 
-        return self.__max_flow
+        # vertices on this height or above are not discharged
+        active_height = self.vertex_num if self.min_cut_only \
+            else 4 * self.vertex_num
+
+        deadline = None if time_budget is None \
+            else time.perf_counter() + time_budget
+
+        done = self.__discharge(active_height, deadline)
+
+        flow = self.excess[self.runoff].item() - self.flow_offset
+
+        if done:
+            self.__max_flow = flow
+
+        return flow
+
+    def cut_estimate(self) -> np.ndarray:
+        '''Vertices that cannot reach the runoff in the current residual graph
+
+        A cut at any point of the solve, its capacity bounds the maximum flow
+        from above. Once `finished` it is the largest of the minimum cuts,
+        while `min_cut_labels` is the smallest.
+        '''
+
+        return ~self.graph.reachable(self.runoff, backward=True)
+
+    def save_checkpoint(self, path) -> None:
+        '''Store the graph and the preflow in an .npz file
+
+        `load_checkpoint` continues the solve from it, in this or another
+        process.
+        '''
+
+        graph = self.graph
+        arrays = {}
+        if graph.edge_arcs is not None:
+            arrays['edge_arcs'] = graph.edge_arcs
+        if self.__terminal_shift is not None:
+            arrays['terminal_shift'] = self.__terminal_shift
+
+        np.savez(path,
+                 offsets=graph.offsets,
+                 heads=graph.heads,
+                 capacity=graph.capacity,
+                 reverse=graph.reverse,
+                 residual=graph.residual,
+                 height=self.height,
+                 excess=self.excess,
+                 active=np.flatnonzero(np.frombuffer(self.in_queue,
+                                                     dtype=np.uint8)),
+                 counters=np.array([self.relabeling_counter]),
+                 flow_offset=np.array(self.flow_offset),
+                 min_cut_only=np.array(self.min_cut_only),
+                 scheduler=np.array(self.scheduler),
+                 **arrays)
+
+    @classmethod
+    def load_checkpoint(cls, path, **kwargs) -> 'PPA':
+        '''Solver in the state `save_checkpoint` stored, `kwargs` as `PPA`'''
+
+        with np.load(path) as checkpoint:
+            graph = ResidualGraph(
+                len(checkpoint['offsets']) - 1,
+                checkpoint['offsets'],
+                checkpoint['heads'],
+                checkpoint['capacity'],
+                checkpoint['reverse'],
+                checkpoint['residual'],
+                checkpoint['edge_arcs'] if 'edge_arcs' in checkpoint
+                else None)
+
+            kwargs.setdefault('scheduler', str(checkpoint['scheduler']))
+            ppa = cls(graph.vertex_num, graph,
+                      min_cut_only=bool(checkpoint['min_cut_only']),
+                      _init_preflow=False, **kwargs)
+            ppa.__restore(checkpoint)
+
+        return ppa
+
+    def __restore(self, checkpoint) -> None:
+        '''Put back the preflow of a checkpoint over the fresh solver'''
+
+        # the graph was built over the residual capacities of the checkpoint
+        self.height[:] = checkpoint['height']
+        self.excess[:] = checkpoint['excess']
+        self.relabeling_counter = int(checkpoint['counters'][0])
+        self.flow_offset = checkpoint['flow_offset'].item()
+
+        low = self.height[self.height < self.vertex_num]
+        self.height_count[:] = np.bincount(low, minlength=self.vertex_num + 1)
+
+        for vertex in checkpoint['active'].tolist():
+            self.__push_vertex(vertex)
+
+        if 'terminal_shift' in checkpoint:
+            self.__terminal_arcs = self.graph.terminal_arcs(self.source,
+                                                            self.runoff)
+            self.__terminal_shift = checkpoint['terminal_shift'].copy()
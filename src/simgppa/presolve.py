@@ -0,0 +1,167 @@
+'''Labels decided before solving: seeds and pixels dominated by a t-link
+
+A pixel whose source t-link exceeds its runoff t-link plus all its
+outgoing n-links lies on the source side of every minimum cut, one whose
+runoff t-link is at least its source t-link plus all its incoming n-links
+lies on the runoff side of the smallest minimum cut, the one the solvers
+find. Such pixels are fixed and their arcs folded into the t-links of their
+neighbours as `fix_outside` does for the pixels outside a band, which may
+make the neighbours dominated in turn. The solver only gets the pixels left
+free, and the cut it finds plus the capacity cut among the fixed pixels is
+the minimum cut of the whole graph.
+'''
+
+from typing import Tuple
+
+import numpy as np
+
+from .graph import capacity_dtype
+from .grid import OPPOSITE
+from .img_processing import NEIGHBOURS, neighbour_slices
+from .pyramid import BandSolver, GridCapacities
+
+
+def arc_sums(nlinks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''Capacity of the n-links leaving and entering every pixel'''
+
+    height, width = nlinks.shape[:2]
+    outgoing = np.zeros(nlinks.shape[:2], dtype=capacity_dtype(nlinks))
+    incoming = np.zeros_like(outgoing)
+
+    # arcs leaving the image are ignored by the solvers, here as well
+    for d, (dy, dx) in enumerate(NEIGHBOURS):
+        src, dst = neighbour_slices(dy, dx, height, width)
+        outgoing[src] += nlinks[src + (d,)]
+        incoming[dst] += nlinks[src + (d,)]
+
+    return outgoing, incoming
+
+
+def fixed_cut(nlinks: np.ndarray,
+              source_caps: np.ndarray,
+              runoff_caps: np.ndarray,
+              labels: np.ndarray,
+              free: np.ndarray) -> float:
+    '''Capacity of the arcs the fixed pixels alone decide to cut'''
+
+    height, width = labels.shape
+    fixed = ~free
+
+    total = runoff_caps[fixed & labels].sum() + \
+        source_caps[fixed & ~labels].sum()
+
+    for d, (dy, dx) in enumerate(NEIGHBOURS):
+        src, dst = neighbour_slices(dy, dx, height, width)
+        cut = fixed[src] & labels[src] & fixed[dst] & ~labels[dst]
+        total += nlinks[src + (d,)][cut].sum()
+
+    return float(total)
+
+
+def presolve(nlinks: np.ndarray,
+             source_caps: np.ndarray,
+             runoff_caps: np.ndarray) -> Tuple[np.ndarray, np.ndarray,
+                                               GridCapacities, float]:
+    '''Fix the dominated pixels of a grid graph
+
+    Returns the labels of the fixed pixels, the mask of the free ones, the
+    grid graph of the free pixels and the capacity the fixed pixels cut on
+    their own, which the maximum flow of the free graph adds up to the
+    maximum flow of the whole one.
+    '''
+
+    height, width = source_caps.shape
+    dtype = np.result_type(nlinks, source_caps, runoff_caps)
+
+    labels = np.zeros(height * width, dtype=bool)
+    free = np.ones(height * width, dtype=bool)
+
+    free_nlinks = nlinks.reshape(-1, len(NEIGHBOURS)).copy()
+    free_source = source_caps.astype(dtype).ravel()
+    free_runoff = runoff_caps.astype(dtype).ravel()
+    outgoing, incoming = (sums.ravel() for sums in arc_sums(nlinks))
+
+    ys, xs = np.divmod(np.arange(height * width), width)
+    # pixels with a neighbour in every direction and the step to it
+    inside = [(0 <= ys + dy) & (ys + dy < height) &
+              (0 <= xs + dx) & (xs + dx < width) for dy, dx in NEIGHBOURS]
+    shifts = [dy * width + dx for dy, dx in NEIGHBOURS]
+
+    for d, arcs in enumerate(inside):
+        free_nlinks[~arcs, d] = 0
+
+    # only pixels next to newly fixed ones may become dominated
+    candidates = np.arange(height * width)
+
+    while len(candidates):
+        source_side = free_source[candidates] > \
+            free_runoff[candidates] + outgoing[candidates]
+        runoff_side = ~source_side & (free_runoff[candidates] >=
+                                      free_source[candidates] +
+                                      incoming[candidates])
+
+        to_source = candidates[source_side]
+        to_runoff = candidates[runoff_side]
+        fixed = np.concatenate((to_source, to_runoff))
+
+        labels[to_source] = True
+        free[fixed] = False
+
+        neighbours = []
+
+        # fold the arcs of the pixels just fixed into the free neighbours
+        for d, shift in enumerate(shifts):
+            back = OPPOSITE[d]
+
+            for pixels, side in [(to_source, True), (to_runoff, False)]:
+                pixels = pixels[inside[d][pixels]]
+                others = pixels + shift
+                open_ = free[others]
+
+                leaving = free_nlinks[pixels, d]
+                entering = free_nlinks[others, back]
+
+                if side:
+                    free_source[others[open_]] += leaving[open_]
+                else:
+                    free_runoff[others[open_]] += entering[open_]
+
+                incoming[others] -= leaving
+                outgoing[others] -= entering
+                free_nlinks[pixels, d] = 0
+                free_nlinks[others, back] = 0
+
+                neighbours.append(others[open_])
+
+        free_source[fixed] = free_runoff[fixed] = 0
+        outgoing[fixed] = incoming[fixed] = 0
+
+        candidates = np.unique(np.concatenate(neighbours))
+
+    labels, free = labels.reshape(height, width), free.reshape(height, width)
+    reduced = (free_nlinks.reshape(nlinks.shape),
+               free_source.reshape(height, width),
+               free_runoff.reshape(height, width))
+
+    return labels, free, reduced, \
+        fixed_cut(nlinks, source_caps, runoff_caps, labels, free)
+
+
+def presolved(solve: BandSolver) -> BandSolver:
+    '''Band solver that only hands the free pixels of the band to `solve`'''
+
+    def solve_free(nlinks: np.ndarray,
+                   source_caps: np.ndarray,
+                   runoff_caps: np.ndarray,
+                   band: np.ndarray) -> np.ndarray:
+
+        # pixels outside the band have neither arcs nor t-links, so they
+        # are fixed at once and left out by the mask below
+        labels, free, reduced, _ = presolve(nlinks, source_caps, runoff_caps)
+
+        if free.any():
+            labels = np.where(free, solve(*reduced, free), labels)
+
+        return labels & band
+
+    return solve_free
@@ -0,0 +1,139 @@
+'''Wall time and peak memory of the stages of a segmentation
+
+Profiles are turned on per run or for every run with the environment
+variable `SIMGPPA_PROFILE`: `1` records stages, `cprofile` also collects
+cProfile statistics of them.
+'''
+
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Union
+
+PROFILE_ENV = 'SIMGPPA_PROFILE'
+
+
+class Profile:
+    '''Stages of a run in order, each with its wall time and traced peak
+
+    Memory is traced only while a stage runs, which slows it down; with
+    `memory=False` only times are taken. A stage started while another
+    tracer is running reports the peak above the memory in use at its start,
+    which may include an earlier peak of that tracer. Besides the sizes of
+    the run, `graphs` keeps the size of every graph cut, with its stage.
+    '''
+
+    def __init__(self, memory: bool = True, cprofile: bool = False) -> None:
+        self.memory = memory
+        self.stages: List[Dict] = []
+        self.sizes: Dict[str, int] = {}
+        self.graphs: List[Dict] = []
+
+        self.__stage: Optional[str] = None
+
+        self.__profiler = cProfile.Profile() if cprofile else None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        owned = self.memory and not tracemalloc.is_tracing()
+        if owned:
+            tracemalloc.start()
+
+        baseline = tracemalloc.get_traced_memory()[0] if self.memory else 0
+
+        if self.__profiler is not None:
+            self.__profiler.enable()
+        outer, self.__stage = self.__stage, name
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.__stage = outer
+            if self.__profiler is not None:
+                self.__profiler.disable()
+
+            peak = None
+            if self.memory:
+                peak = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+                if owned:
+                    tracemalloc.stop()
+
+            self.stages.append({'name': name, 'seconds': seconds,
+                                'peak_memory': peak})
+
+    def record(self, **sizes: int) -> None:
+        '''Sizes of the run, such as pixels or graph vertices'''
+
+        self.sizes.update(sizes)
+
+    def record_graph(self, **sizes: int) -> None:
+        '''Size of a graph cut in the running stage'''
+
+        self.graphs.append(dict(sizes, stage=self.__stage))
+
+    @property
+    def seconds(self) -> float:
+        return sum(stage['seconds'] for stage in self.stages)
+
+    def slowest(self) -> Optional[str]:
+        '''Name of the stage that took longest'''
+
+        if not self.stages:
+            return None
+
+        return max(self.stages, key=lambda stage: stage['seconds'])['name']
+
+    def as_dict(self) -> Dict:
+        return {'stages': self.stages,
+                'sizes': self.sizes,
+                'graphs': self.graphs,
+                'seconds': self.seconds,
+                'slowest': self.slowest()}
+
+    def save_json(self, path) -> None:
+        with open(path, 'w') as file:
+            json.dump(self.as_dict(), file, indent=2)
+
+    def save_stats(self, path) -> None:
+        '''Write the cProfile statistics, readable with `pstats`'''
+
+        if self.__profiler is None:
+            raise ValueError('Profile was made without cprofile=True')
+
+        self.__profiler.dump_stats(path)
+
+
+def make_profile(
+        profile: Union[bool, Profile, None] = None) -> Optional[Profile]:
+    '''Profile of a run: the given one, a new one for True and for None
+    one as `SIMGPPA_PROFILE` asks for, if it does
+    '''
+
+    if isinstance(profile, Profile):
+        return profile
+
+    if profile is None:
+        setting = os.environ.get(PROFILE_ENV, '').strip().lower()
+
+        if setting == 'cprofile':
+            return Profile(cprofile=True)
+
+        profile = setting not in ('', '0', 'false', 'no')
+
+    return Profile() if profile else None
+
+
+@contextmanager
+def stage(profile: Optional[Profile], name: str) -> Iterator[None]:
+    '''`Profile.stage` of the profile, nothing without one'''
+
+    if profile is None:
+        yield
+    else:
+        with profile.stage(name):
+            yield
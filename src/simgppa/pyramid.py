@@ -0,0 +1,307 @@
+'''Coarse-to-fine segmentation over a pyramid of grid graphs
+
+Every level halves the grid by merging 2x2 pixel blocks. The coarsest level
+is cut whole; each finer level starts from the upsampled labels and only
+re-cuts a band around their boundary, the pixels outside of it keep their
+labels.
+'''
+
+from typing import Callable, Tuple
+
+import numpy as np
+
+from .grid import GridPPA
+from .img_processing import NEIGHBOURS, neighbour_slices
+
+GridCapacities = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+# times a band is widened and cut again when labels flip on its rim
+RECUTS = 1
+
+# object labels of the band pixels of a grid graph, the others are ignored
+BandSolver = Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+                      np.ndarray]
+
+
+def coarsen(nlinks: np.ndarray,
+            source_caps: np.ndarray,
+            runoff_caps: np.ndarray) -> GridCapacities:
+    '''Grid of 2x2 pixel blocks
+
+    Blocks sum the t-links of their pixels and average the two n-links that
+    cross each of their sides. Summing those too would price cuts of whole
+    blocks exactly, but blocks cannot follow a boundary that runs through
+    them, so their cuts cost more than the fine ones and coarse levels swallow
+    regions that the fine cut keeps apart; the band restores the fine boundary.
+    '''
+
+    height, width = source_caps.shape
+    pad = ((0, height % 2), (0, width % 2))
+    # padding pixels have no arcs at all
+    nlinks = np.pad(nlinks, pad + ((0, 0),))
+    source_caps = np.pad(source_caps, pad)
+    runoff_caps = np.pad(runoff_caps, pad)
+
+    h, w = (height + 1) // 2, (width + 1) // 2
+
+    def blocks(caps: np.ndarray) -> np.ndarray:
+        return caps.reshape(h, 2, w, 2).sum(axis=(1, 3))
+
+    coarse = np.empty((h, w, len(NEIGHBOURS)), dtype=np.float64)
+    # arcs leaving a block through its right, left, bottom and top side
+    coarse[..., 0] = nlinks[:, 1::2, 0].reshape(h, 2, w).mean(axis=1)
+    coarse[..., 1] = nlinks[:, 0::2, 1].reshape(h, 2, w).mean(axis=1)
+    coarse[..., 2] = nlinks[1::2, :, 2].reshape(h, w, 2).mean(axis=2)
+    coarse[..., 3] = nlinks[0::2, :, 3].reshape(h, w, 2).mean(axis=2)
+
+    # arcs leaving the image are ignored by the solvers, here as well
+    coarse[:, -1, 0] = coarse[:, 0, 1] = 0
+    coarse[-1, :, 2] = coarse[0, :, 3] = 0
+
+    return coarse, blocks(source_caps), blocks(runoff_caps)
+
+
+def upsample(labels: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    '''Labels of 2x2 blocks spread over their pixels'''
+
+    fine = labels.repeat(2, axis=0).repeat(2, axis=1)
+
+    return fine[:shape[0], :shape[1]]
+
+
+def dilate(mask: np.ndarray, width: int) -> np.ndarray:
+    '''Pixels within `width` 4-neighbour steps of the mask'''
+
+    height, grid_width = mask.shape
+
+    for _ in range(width):
+        grown = mask.copy()
+
+        for dy, dx in NEIGHBOURS:
+            src, dst = neighbour_slices(dy, dx, height, grid_width)
+            grown[dst] |= mask[src]
+
+        mask = grown
+
+    return mask
+
+
+def band_mask(nlinks: np.ndarray,
+              source_caps: np.ndarray,
+              runoff_caps: np.ndarray,
+              labels: np.ndarray,
+              width: int) -> np.ndarray:
+    '''Pixels within `width` of the label boundary
+
+    Pixels whose t-links outweigh all their n-links, as hard seeds do, cannot
+    take the other label in the smallest minimum cut, so those labeled
+    against them are re-cut as well.
+    '''
+
+    height, grid_width = labels.shape
+    seeds = np.zeros_like(labels)
+    outgoing = np.zeros_like(source_caps)
+    incoming = np.zeros_like(source_caps)
+
+    for d, (dy, dx) in enumerate(NEIGHBOURS):
+        src, dst = neighbour_slices(dy, dx, height, grid_width)
+        seeds[src] |= labels[src] != labels[dst]
+        outgoing[src] += nlinks[src + (d,)]
+        incoming[dst] += nlinks[src + (d,)]
+
+    seeds |= ~labels & (source_caps - runoff_caps > outgoing)
+    seeds |= labels & (runoff_caps - source_caps >= incoming)
+
+    return dilate(seeds, width)
+
+
+def fix_outside(nlinks: np.ndarray,
+                source_caps: np.ndarray,
+                runoff_caps: np.ndarray,
+                labels: np.ndarray,
+                band: np.ndarray) -> GridCapacities:
+    '''Grid graph of the band with the pixels outside of it fixed to `labels`
+
+    An arc from a fixed object pixel into the band is cut when its head
+    goes to the background, so it becomes a source t-link of the head, an
+    arc from the band to a fixed background pixel becomes a runoff t-link.
+    Pixels outside the band are left without arcs.
+    '''
+
+    height, width = labels.shape
+    dtype = np.result_type(nlinks, source_caps, runoff_caps)
+
+    band_nlinks = np.zeros(nlinks.shape, dtype=nlinks.dtype)
+    source_caps = np.where(band, source_caps, 0).astype(dtype)
+    runoff_caps = np.where(band, runoff_caps, 0).astype(dtype)
+
+    for d, (dy, dx) in enumerate(NEIGHBOURS):
+        src, dst = neighbour_slices(dy, dx, height, width)
+        caps = nlinks[src + (d,)]
+        tail_in, head_in = band[src], band[dst]
+
+        band_nlinks[src + (d,)] = np.where(tail_in & head_in, caps, 0)
+        source_caps[dst] += np.where(~tail_in & labels[src] & head_in,
+                                     caps, 0)
+        runoff_caps[src] += np.where(tail_in & ~head_in & ~labels[dst],
+                                     caps, 0)
+
+    return band_nlinks, source_caps, runoff_caps
+
+
+def band_graph(nlinks: np.ndarray,
+               source_caps: np.ndarray,
+               runoff_caps: np.ndarray,
+               band: np.ndarray) -> Tuple[int, np.ndarray, np.ndarray,
+                                          np.ndarray, np.ndarray]:
+    '''Flat edge arrays of the band pixels only
+
+    Returns the vertex count, arc starts, ends and capacities ordered as
+    `ImageProcessor.get_graph_arrays` and the flat index of the pixel of
+    every vertex between the source and the runoff.
+    '''
+
+    height, width = band.shape
+    pixels = np.flatnonzero(band)
+    runoff = len(pixels) + 1
+
+    vertex = np.zeros(height * width, dtype=np.int64)
+    vertex[pixels] = np.arange(1, runoff)
+    vertex = vertex.reshape(height, width)
+
+    starts, ends, capacities = [], [], []
+
+    for d, (dy, dx) in enumerate(NEIGHBOURS):
+        src, dst = neighbour_slices(dy, dx, height, width)
+        inside = band[src] & band[dst]
+
+        starts.append(vertex[src][inside])
+        ends.append(vertex[dst][inside])
+        capacities.append(nlinks[src + (d,)][inside].astype(np.float64))
+
+    vertices = np.arange(1, runoff)
+
+    starts += [np.zeros_like(vertices), vertices]
+    ends += [vertices, np.full_like(vertices, runoff)]
+    capacities += [source_caps.ravel()[pixels], runoff_caps.ravel()[pixels]]
+
+    return runoff + 1, np.concatenate(starts), np.concatenate(ends), \
+        np.concatenate(capacities), pixels
+
+
+def band_size(band: np.ndarray) -> Tuple[int, int]:
+    '''Vertices and edges of the graph `band_graph` builds for the band'''
+
+    height, width = band.shape
+    pixels = int(band.sum())
+    edges = 2 * pixels
+
+    for dy, dx in NEIGHBOURS:
+        src, dst = neighbour_slices(dy, dx, height, width)
+        edges += int((band[src] & band[dst]).sum())
+
+    return pixels + 2, edges
+
+
+def graph_band_solver(factory) -> BandSolver:
+    '''Band solver over the edge arrays of `band_graph`'''
+
+    def solve(nlinks: np.ndarray,
+              source_caps: np.ndarray,
+              runoff_caps: np.ndarray,
+              band: np.ndarray) -> np.ndarray:
+
+        vertex_num, starts, ends, capacities, pixels = band_graph(
+            nlinks, source_caps, runoff_caps, band)
+
+        cut = factory(vertex_num, starts, ends, capacities).min_cut_labels()
+
+        labels = np.zeros(band.shape, dtype=bool)
+        labels.flat[pixels] = cut[1:-1]
+
+        return labels
+
+    return solve
+
+
+def grid_band_solver(nlinks: np.ndarray,
+                     source_caps: np.ndarray,
+                     runoff_caps: np.ndarray,
+                     band: np.ndarray,
+                     factory=GridPPA) -> np.ndarray:
+    '''Band solver over the grid cropped to the bounding box of the band
+
+    Pixels of the box outside the band have no arcs and never become
+    active, arcs leaving the box already lead out of the band.
+    '''
+
+    labels = np.zeros(band.shape, dtype=bool)
+    rows, cols = np.flatnonzero(band.any(axis=1)), \
+        np.flatnonzero(band.any(axis=0))
+    if not len(rows):
+        return labels
+
+    box = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+    cut = factory(nlinks[box], source_caps[box],
+                  runoff_caps[box]).min_cut_labels()
+
+    labels[box] = cut[1:-1].reshape(band[box].shape) & band[box]
+
+    return labels
+
+
+def pyramid_labels(nlinks: np.ndarray,
+                   source_caps: np.ndarray,
+                   runoff_caps: np.ndarray,
+                   solve: BandSolver,
+                   levels: int,
+                   width: int = 3) -> np.ndarray:
+    '''Object labels of a grid graph cut coarse-to-fine over `levels` levels
+
+    `width` is the half-width of the band re-cut at every finer level.
+    '''
+
+    if levels < 1:
+        raise ValueError('At least one pyramid level is needed')
+
+    if levels == 1 or min(source_caps.shape) < 2:
+        return solve(nlinks, source_caps, runoff_caps,
+                     np.ones(source_caps.shape, dtype=bool))
+
+    coarse = pyramid_labels(*coarsen(nlinks, source_caps, runoff_caps),
+                            solve, levels - 1, width)
+
+    return refine_labels(nlinks, source_caps, runoff_caps,
+                         upsample(coarse, source_caps.shape), solve, width)
+
+
+def refine_labels(nlinks: np.ndarray,
+                  source_caps: np.ndarray,
+                  runoff_caps: np.ndarray,
+                  labels: np.ndarray,
+                  solve: BandSolver,
+                  width: int = 3,
+                  recuts: int = RECUTS) -> np.ndarray:
+    '''Labels of a coarser cut re-cut in a band of `width` around their
+    boundary, the pixels outside of it keep their labels
+
+    The band is widened and cut again at most `recuts` times.
+    '''
+
+    band = band_mask(nlinks, source_caps, runoff_caps, labels, width)
+
+    for _ in range(recuts + 1):
+        refined = np.where(band, solve(*fix_outside(
+            nlinks, source_caps, runoff_caps, labels, band), band), labels)
+
+        # a label that flips on the rim of the band may flip the fixed
+        # pixels behind it too, those are added and the band is cut again
+        flipped = band & dilate(~band, 1) & (refined != labels)
+        if not flipped.any():
+            break
+
+        labels = refined
+        width *= 2
+        band |= dilate(flipped, width)
+
+    return refined
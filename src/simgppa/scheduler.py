@@ -0,0 +1,64 @@
+from collections import deque
+from typing import Deque, Dict, List
+
+
+class HighestLabelScheduler:
+    '''Active vertices kept in buckets by height, the highest bucket first'''
+
+    def __init__(self) -> None:
+        self.buckets: Dict[int, List[int]] = dict()
+        self.top = -1
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def push(self, vertex: int, height: int) -> None:
+        bucket = self.buckets.get(height)
+
+        if bucket is None:
+            self.buckets[height] = [vertex]
+        else:
+            bucket.append(vertex)
+
+        if height > self.top:
+            self.top = height
+
+        self.size += 1
+
+    def pop(self) -> int:
+        if self.size == 0:
+            raise IndexError('pop from empty scheduler')
+
+        buckets = self.buckets
+        bucket = buckets.get(self.top)
+
+        while not bucket:
+            self.top -= 1
+            bucket = buckets.get(self.top)
+
+        self.size -= 1
+
+        return bucket.pop()
+
+
+class FIFOScheduler:
+    '''Active vertices served in the order they became active'''
+
+    def __init__(self) -> None:
+        self.queue: Deque[int] = deque()
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def push(self, vertex: int, height: int) -> None:
+        self.queue.append(vertex)
+
+    def pop(self) -> int:
+        return self.queue.popleft()
+
+
+SCHEDULERS = {
+    'highest': HighestLabelScheduler,
+    'fifo': FIFOScheduler,
+}
@@ -1,44 +1,235 @@
-from typing import List
+from functools import partial
+from typing import Optional, Union
 
+import numpy as np
 from PIL import Image
 
+from .bk import BK
+from .cache import ArrayCache
+from .grid import GridPPA
 from .ppa import PPA
-from .img_processing import ImageProcessor, Pixel
+from .img_processing import ImageProcessor, ImageSource, Seeds
+from .masks import cut_labels, save_mask
+from .presolve import presolved
+from .profiling import Profile, make_profile, stage
+from .pyramid import BandSolver, band_size, graph_band_solver, \
+    grid_band_solver, pyramid_labels
+from .superpixels import grow_regions, superpixel_labels
+from .tiled import TiledGridPPA
+
+
+def graph_solver(factory):
+    '''Solver over the flat edge arrays of an `ImageProcessor` graph'''
+
+    def build(img_processor: ImageProcessor):
+        return factory(img_processor.get_pixel_count() + 2,
+                       *img_processor.get_graph_arrays())
+
+    return build
+
+
+def grid_solver(img_processor: ImageProcessor) -> GridPPA:
+    '''Solver over the pixel lattice, the edge list is never built'''
+
+    return GridPPA(*img_processor.get_grid_capacities())
+
+
+def tiled_solver(img_processor: ImageProcessor,
+                 tiles: int = 1) -> TiledGridPPA:
+    '''Grid solver over strips of rows, a single one by default, see `tiled`'''
+
+    return TiledGridPPA(*img_processor.get_grid_capacities(), tiles=tiles)
+
+
+min_cut_ppa = partial(PPA.from_arrays, min_cut_only=True)
+
+# max-flow engines by name, all of them take the source side reachable in the
+# residual graph, the smallest of the minimum cuts, so they produce the same
+# mask
+SOLVERS = {
+    'ppa': graph_solver(min_cut_ppa),
+    'bk': graph_solver(BK.from_arrays),
+    'grid': grid_solver,
+    'tiled': tiled_solver,
+}
+
+# engines of the superpixel graph, which is no grid, so the grid ones use PPA
+REGION_SOLVERS = {
+    'ppa': min_cut_ppa,
+    'bk': BK.from_arrays,
+    'grid': min_cut_ppa,
+    'tiled': min_cut_ppa,
+}
+
+# the same engines cutting a band of the pixel grid, see `pyramid`
+BAND_SOLVERS = {
+    'ppa': graph_band_solver(min_cut_ppa),
+    'bk': graph_band_solver(BK.from_arrays),
+    'grid': grid_band_solver,
+    'tiled': partial(grid_band_solver, factory=TiledGridPPA),
+}
+
+
+def profiled_band_solver(solve: BandSolver, profile: Profile) -> BandSolver:
+    '''Band solver recording the size of every band graph it cuts'''
+
+    def solve_band(nlinks: np.ndarray,
+                   source_caps: np.ndarray,
+                   runoff_caps: np.ndarray,
+                   band: np.ndarray) -> np.ndarray:
+
+        vertices, edges = band_size(band)
+        profile.record_graph(vertices=vertices, edges=edges)
+
+        return solve(nlinks, source_caps, runoff_caps, band)
+
+    return solve_band
+
+
+def profiled_factory(factory, profile: Profile):
+    '''Solver factory over flat edge arrays recording the graph size'''
+
+    def build(vertex_num: int, starts, ends, capacities):
+        profile.record_graph(vertices=vertex_num, edges=len(starts))
+
+        return factory(vertex_num, starts, ends, capacities)
+
+    return build
 
 
 class Segmentation:
+    '''Object mask of an image, `levels > 1` cuts it coarse-to-fine
+
+    With a pyramid of `levels` levels only the coarsest one is cut whole and
+    every finer one re-cuts the pixels within `band` of the boundary found
+    below it. With `superpixels` the graph of superpixels at most that many
+    pixels across is cut first and refined within `band` of its boundary.
+    An `nlink_cache` spares recomputing the n-links of an image segmented
+    before with the same `sgm` and `bw`. `presolve` fixes seeds and other
+    dominated pixels before any cut, see `presolve`. The `tiled` solver
+    splits the grid into `tiles` strips solved by as many processes, see
+    `tiled`. With `profile` the stages of the run are timed into
+    `self.profile`. `input_path` may as well be decoded pixels, see
+    `ImageSource`.
+    '''
 
     def __init__(self,
-                 input_path: str,
-                 bg_pixels: List[Pixel],
-                 obj_pixels: List[Pixel],
+                 input_path: ImageSource,
+                 bg_pixels: Seeds,
+                 obj_pixels: Seeds,
                  lmbd: int,
                  sgm: float,
-                 bw: bool) -> None:
+                 bw: bool,
+                 solver: str = 'ppa',
+                 levels: int = 1,
+                 band: int = 3,
+                 nlink_cache: Optional[ArrayCache] = None,
+                 superpixels: int = 0,
+                 presolve: bool = False,
+                 tiles: int = 1,
+                 profile: Union[bool, Profile, None] = None) -> None:
 
-        print('Initalizing Segmentation...')
+        if solver not in SOLVERS:
+            raise ValueError(f'Unknown solver {solver!r}, expected '
+                             f'one of {", ".join(SOLVERS)}')
 
-        self.__img_processor = ImageProcessor(
-            input_path, obj_pixels, bg_pixels, lmbd, sgm, bw)
+        if superpixels and levels != 1:
+            raise ValueError('Superpixels and pyramid levels do not combine')
 
-        self.__edges = self.__img_processor.get_graph_edges()
-        # self.__max_out_flow = self.__img_processor.get_max_out_flow()
-        self.__pixels_count = self.__img_processor.get_pixel_count()
+        if tiles < 1:
+            raise ValueError('At least one tile is needed')
+
+        if tiles != 1 and solver != 'tiled':
+            raise ValueError('Tiles only split the tiled solver')
+
+        # stages of the run, when profiling is asked for here or by the
+        # environment, see `profiling`
+        self.profile = make_profile(profile)
 
-        self.__ppa = PPA(self.__pixels_count + 2, self.__edges)
+        with stage(self.profile, 'load'):
+            self.__img_processor = ImageProcessor(
+                input_path, obj_pixels, bg_pixels, lmbd, sgm, bw, nlink_cache)
 
-        # self.__maxflow = self.__ppa.maxflow()
-        self.__mincut = self.__ppa.min_cut()
-        # self.__flow = self.__ppa.flow()
+        with stage(self.profile, 'nlinks'):
+            self.__img_processor.get_max_out_flow()
+
+        self.__pixels_count = self.__img_processor.get_pixel_count()
 
         h = self.__img_processor.img_height
         w = self.__img_processor.img_width
 
-        self.__image = Image.new("1", (w, h))
+        build = SOLVERS[solver]
+        band_solver = BAND_SOLVERS[solver]
+        region_solver = REGION_SOLVERS[solver]
+
+        if tiles != 1:
+            build = partial(tiled_solver, tiles=tiles)
+            band_solver = partial(grid_band_solver,
+                                  factory=partial(TiledGridPPA, tiles=tiles))
+
+        if self.profile is not None:
+            # edges of the image graph, the reduced graphs actually cut are
+            # recorded by the solvers as they get them
+            vertices, edges = band_size(np.ones((h, w), dtype=bool))
+            self.profile.record(pixels=h * w, vertices=vertices, edges=edges)
+
+            band_solver = profiled_band_solver(band_solver, self.profile)
+            region_solver = profiled_factory(region_solver, self.profile)
+
+        if presolve:
+            band_solver = presolved(band_solver)
+
+        if superpixels or levels != 1 or presolve:
+            with stage(self.profile, 'graph'):
+                capacities = self.__img_processor.get_grid_capacities()
+
+            if superpixels:
+                with stage(self.profile, 'superpixels'):
+                    regions = grow_regions(self.__img_processor.get_pixels(),
+                                           superpixels)
+
+                if self.profile is not None:
+                    self.profile.record(superpixels=int(regions.max()) + 1)
+
+                with stage(self.profile, 'solve'):
+                    labels = superpixel_labels(
+                        *capacities, regions, region_solver, band_solver,
+                        band)
+            else:
+                with stage(self.profile, 'solve'):
+                    labels = pyramid_labels(*capacities, band_solver,
+                                            levels, band)
+        else:
+            with stage(self.profile, 'graph'):
+                self.__solver = build(self.__img_processor)
+
+            with stage(self.profile, 'solve'):
+                if self.profile is not None:
+                    # the whole image graph is cut
+                    self.profile.record_graph(vertices=vertices, edges=edges)
+                cut = self.__solver.min_cut_labels()
+
+            with stage(self.profile, 'mask'):
+                labels = cut_labels(cut, h, w)
+
+        self.__labels = labels
+        self.__labels.setflags(write=False)
+
+    def get_mask(self) -> np.ndarray:
+        '''Object pixels as a read-only boolean (height, width) array'''
+
+        return self.__labels
+
+    def get_min_cut(self) -> np.ndarray:
+        '''Graph vertices of the object pixels, the source excluded'''
+
+        return np.flatnonzero(self.__labels) + 1
+
+    def save_mask(self, output, fmt: str = 'png') -> None:
+        '''Write the mask in one of the formats of `masks`'''
 
-        for i in self.__mincut:
-            self.__image.putpixel(((i - 1) % w, (i - 1) // w), 1)
+        save_mask(self.__labels, output, fmt)
 
     def save_img(self, output: str) -> None:
 
-        self.__image.save(output)
+        Image.fromarray(self.__labels).save(output)
@@ -0,0 +1,584 @@
+'''Interactive segmentation over HTTP and WebSocket
+
+    python -m simgppa.server --port 8000
+
+A session keeps its image, graph and last flow alive in a worker process,
+so a seed update only repairs the flow. Seeds are lists of [x, y] pairs.
+
+    POST   /sessions             {"image": path} or {"image_data": base64},
+                                 "obj", "bg", "lmbd", "sgm", "bw", "refit"
+                                 -> {"id", "width", "height"}
+    PUT    /sessions/<id>/seeds  {"obj", "bg"} -> PNG mask
+    GET    /sessions/<id>/mask   -> PNG mask
+    DELETE /sessions/<id>
+    GET    /sessions/<id>/ws     WebSocket, seed JSON in, PNG masks out
+
+Image paths are read only below `image_root`, relative to it; without one
+only `image_data` is accepted. Sessions idle for `idle_timeout` seconds are
+closed, and so are the least recently used ones when the sessions would take
+more than `memory_limit`.
+'''
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from http import HTTPStatus
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+from PIL import Image
+
+from .img_processing import Pixel
+from .masks import save_mask
+from .session import SegmentationSession
+
+MAX_BODY = 64 * 2 ** 20
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+TEXT, BINARY, CLOSE, PING, PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+
+# sessions of a worker process by id
+SESSIONS: Dict[str, SegmentationSession] = {}
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def seed_pixels(seeds) -> List[Pixel]:
+    '''Seeds of a request, a list of [x, y] pairs'''
+
+    try:
+        return [Pixel(int(x), int(y)) for x, y in seeds or []]
+    except (TypeError, ValueError):
+        raise ValueError('Seeds must be a list of [x, y] pairs')
+
+
+def mask_png(session: SegmentationSession) -> bytes:
+    buffer = io.BytesIO()
+    save_mask(session.get_mask(), buffer, 'png')
+
+    return buffer.getvalue()
+
+
+def open_session(session_id: str, params: Dict) -> Tuple[int, int, int]:
+    '''Build and solve a session in this worker
+
+    Returns the image size and the bytes of the session arrays.
+    '''
+
+    image = params.get('image')
+    if 'image_data' in params:
+        image = Image.open(io.BytesIO(base64.b64decode(params['image_data'])))
+
+    session = SegmentationSession(image,
+                                  seed_pixels(params.get('bg')),
+                                  seed_pixels(params.get('obj')),
+                                  lmbd=params.get('lmbd', 100),
+                                  sgm=params.get('sgm', 1.0),
+                                  bw=params.get('bw', True),
+                                  refit=params.get('refit', False))
+    height, width = session.get_mask().shape
+    SESSIONS[session_id] = session
+
+    return height, width, session.nbytes
+
+
+def update_session(session_id: str, obj, bg) -> bytes:
+    session = SESSIONS[session_id]
+    session.update_seeds(seed_pixels(bg), seed_pixels(obj))
+
+    return mask_png(session)
+
+
+def session_mask(session_id: str) -> bytes:
+    return mask_png(SESSIONS[session_id])
+
+
+def close_session(session_id: str) -> None:
+    SESSIONS.pop(session_id, None)
+
+
+class SessionEntry:
+    '''Server side record of a session living in a worker'''
+
+    def __init__(self, session_id: str, worker: int, nbytes: int) -> None:
+        self.id = session_id
+        self.worker = worker
+        self.nbytes = nbytes
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+
+
+async def read_request(reader: asyncio.StreamReader):
+    '''Method, target, lower-cased headers and body of an HTTP request'''
+
+    line = await reader.readline()
+    if not line:
+        return None
+
+    try:
+        method, target, _ = line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, 'Malformed request line')
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HTTPError(400, 'Invalid Content-Length')
+
+    if length < 0:
+        raise HTTPError(400, 'Invalid Content-Length')
+
+    if length > MAX_BODY:
+        raise HTTPError(413, 'Request body too large')
+
+    body = await reader.readexactly(length) if length else b''
+
+    return method, target, headers, body
+
+
+def http_response(status: int, body: bytes = b'',
+                  content_type: str = 'application/json',
+                  headers: Optional[Dict[str, str]] = None) -> bytes:
+    lines = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}']
+
+    if status != 101:
+        lines += [f'Content-Type: {content_type}',
+                  f'Content-Length: {len(body)}',
+                  'Connection: close']
+
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+def json_body(data) -> bytes:
+    return json.dumps(data).encode()
+
+
+def websocket_frame(opcode: int, payload: bytes = b'') -> bytes:
+    '''Unmasked single frame message, as a server sends them'''
+
+    length = len(payload)
+
+    if length < 126:
+        header = bytes([0x80 | opcode, length])
+    elif length < 2 ** 16:
+        header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, 'big')
+    else:
+        header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, 'big')
+
+    return header + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[bool, int, bytes]:
+    '''Final flag, opcode and unmasked payload of a WebSocket frame'''
+
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+
+    if length == 126:
+        length = int.from_bytes(await reader.readexactly(2), 'big')
+    elif length == 127:
+        length = int.from_bytes(await reader.readexactly(8), 'big')
+
+    if length > MAX_BODY:
+        raise HTTPError(413, 'WebSocket message too large')
+
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+
+    if mask is not None:
+        key = np.resize(np.frombuffer(mask, dtype=np.uint8), length)
+        payload = (np.frombuffer(payload, dtype=np.uint8) ^ key).tobytes()
+
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+class SegmentationServer:
+    '''Sessions spread over `workers` single process pools
+
+    A session stays in the process that built it, the solves of different
+    sessions run in parallel up to the number of workers, all CPUs by
+    default.
+    '''
+
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 workers: Optional[int] = None,
+                 memory_limit: int = 2 ** 30,
+                 idle_timeout: float = 600.0,
+                 image_root: Optional[str] = None) -> None:
+
+        self.host = host
+        self.port = port
+        self.image_root = None if image_root is None \
+            else Path(image_root).resolve()
+        self.memory_limit = memory_limit
+        self.idle_timeout = idle_timeout
+
+        workers = workers or os.cpu_count() or 1
+        self.__workers = [ProcessPoolExecutor(max_workers=1)
+                          for _ in range(max(1, workers))]
+        self.__sessions: Dict[str, SessionEntry] = {}
+        self.__server = None
+        self.__reaper = None
+        self.__connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self) -> Tuple[str, int]:
+        '''Listen for connections, returns the bound host and port'''
+
+        self.__server = await asyncio.start_server(
+            self.__handle, self.host, self.port)
+        self.host, self.port = \
+            self.__server.sockets[0].getsockname()[:2]
+        self.__reaper = asyncio.ensure_future(self.__reap())
+
+        return self.host, self.port
+
+    async def close(self) -> None:
+        if self.__reaper is not None:
+            self.__reaper.cancel()
+
+        if self.__server is not None:
+            self.__server.close()
+
+            # open WebSockets would keep the server waiting
+            for writer in self.__connections.values():
+                writer.close()
+            await asyncio.gather(*self.__connections, return_exceptions=True)
+            await self.__server.wait_closed()
+
+        for worker in self.__workers:
+            worker.shutdown(cancel_futures=True)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+
+        try:
+            await self.__server.serve_forever()
+        finally:
+            await self.close()
+
+    def sessions(self) -> List[str]:
+        return list(self.__sessions)
+
+    async def __run(self, entry: SessionEntry, function, *args):
+        '''Call a session function in the worker of the session'''
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            return await loop.run_in_executor(
+                self.__workers[entry.worker], partial(function, *args))
+        except BrokenProcessPool:
+            # the sessions of a crashed worker are gone with it
+            self.__workers[entry.worker] = ProcessPoolExecutor(max_workers=1)
+            for session in list(self.__sessions.values()):
+                if session.worker == entry.worker:
+                    del self.__sessions[session.id]
+
+            raise HTTPError(500, 'Session worker crashed')
+
+    async def __evict(self, entry: SessionEntry) -> None:
+        self.__sessions.pop(entry.id, None)
+
+        try:
+            await self.__run(entry, close_session, entry.id)
+        except HTTPError:
+            pass
+
+    async def __reap(self) -> None:
+        '''Close idle sessions from time to time'''
+
+        while True:
+            await asyncio.sleep(min(self.idle_timeout / 2, 30.0))
+            await self.__evict_idle()
+
+    async def __evict_idle(self) -> None:
+        now = time.monotonic()
+
+        for entry in list(self.__sessions.values()):
+            if now - entry.last_used > self.idle_timeout and \
+                    not entry.lock.locked():
+                await self.__evict(entry)
+
+    async def __make_room(self, nbytes: int) -> None:
+        '''Close least recently used sessions until `nbytes` more fit'''
+
+        entries = sorted(self.__sessions.values(),
+                         key=lambda entry: entry.last_used)
+        total = sum(entry.nbytes for entry in entries)
+
+        for entry in entries:
+            if total + nbytes <= self.memory_limit:
+                break
+
+            if not entry.lock.locked():
+                total -= entry.nbytes
+                await self.__evict(entry)
+
+    def __image_path(self, image) -> str:
+        '''Path of a requested image, which must lie below `image_root`'''
+
+        if self.image_root is None:
+            raise HTTPError(403, 'Image paths are not served, '
+                                 'send "image_data"')
+
+        if not isinstance(image, str):
+            raise HTTPError(400, 'Image path must be a string')
+
+        path = self.image_root.joinpath(image).resolve()
+
+        try:
+            path.relative_to(self.image_root)
+        except ValueError:
+            raise HTTPError(403, 'Image is outside the image root')
+
+        return str(path)
+
+    def __session(self, session_id: str) -> SessionEntry:
+        if session_id not in self.__sessions:
+            raise HTTPError(404, f'No session {session_id}')
+
+        entry = self.__sessions[session_id]
+        entry.last_used = time.monotonic()
+
+        return entry
+
+    async def __create(self, body: bytes) -> bytes:
+        params = self.__json(body)
+
+        if not isinstance(params, dict) or \
+                ('image' in params) == ('image_data' in params):
+            raise HTTPError(400, 'Expected either "image" or "image_data"')
+
+        if 'image' in params:
+            params = dict(params, image=self.__image_path(params['image']))
+
+        loads = [0] * len(self.__workers)
+        for entry in self.__sessions.values():
+            loads[entry.worker] += entry.nbytes
+
+        entry = SessionEntry(secrets.token_hex(8),
+                             loads.index(min(loads)), 0)
+
+        async with entry.lock:
+            try:
+                height, width, nbytes = await self.__run(
+                    entry, open_session, entry.id, params)
+            except HTTPError:
+                raise
+            except Exception as error:
+                raise HTTPError(400, f'{type(error).__name__}: {error}')
+
+            # measured once solved, a seed update keeps the arrays
+            entry.nbytes = nbytes
+            await self.__make_room(entry.nbytes)
+            self.__sessions[entry.id] = entry
+
+        return json_body({'id': entry.id, 'width': width, 'height': height})
+
+    async def __update(self, entry: SessionEntry, seeds) -> bytes:
+        if not isinstance(seeds, dict):
+            raise HTTPError(400, 'Expected an object with "obj" and "bg"')
+
+        async with entry.lock:
+            try:
+                return await self.__run(entry, update_session, entry.id,
+                                        seeds.get('obj'), seeds.get('bg'))
+            except HTTPError:
+                raise
+            except Exception as error:
+                raise HTTPError(400, f'{type(error).__name__}: {error}')
+
+    @staticmethod
+    def __json(body: bytes):
+        try:
+            return json.loads(body)
+        except ValueError:
+            raise HTTPError(400, 'Body is not valid JSON')
+
+    async def __route(self, method: str, parts: List[str],
+                      body: bytes) -> Tuple[int, bytes, str]:
+
+        if parts == ['sessions'] and method == 'POST':
+            return 201, await self.__create(body), 'application/json'
+
+        if len(parts) < 2 or parts[0] != 'sessions':
+            raise HTTPError(404, 'Not found')
+
+        entry = self.__session(parts[1])
+        action = parts[2:]
+
+        if action == [] and method == 'DELETE':
+            await self.__evict(entry)
+            return 200, json_body({'id': entry.id}), 'application/json'
+
+        if action == ['seeds'] and method in ('PUT', 'POST'):
+            mask = await self.__update(entry, self.__json(body))
+            return 200, mask, 'image/png'
+
+        if action == ['mask'] and method == 'GET':
+            async with entry.lock:
+                mask = await self.__run(entry, session_mask, entry.id)
+            return 200, mask, 'image/png'
+
+        raise HTTPError(405 if action in ([], ['seeds'], ['mask']) else 404,
+                        'Not allowed' if action else 'Not found')
+
+    async def __websocket(self, entry: SessionEntry, headers: Dict[str, str],
+                          reader: asyncio.StreamReader,
+                          writer: asyncio.StreamWriter) -> None:
+
+        key = headers.get('sec-websocket-key')
+        if key is None:
+            raise HTTPError(400, 'Missing Sec-WebSocket-Key')
+
+        accept = base64.b64encode(hashlib.sha1(
+            (key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+        writer.write(http_response(101, headers={
+            'Upgrade': 'websocket',
+            'Connection': 'Upgrade',
+            'Sec-WebSocket-Accept': accept}))
+        await writer.drain()
+
+        # fragments of the message being received
+        message, parts = None, []
+
+        while True:
+            try:
+                final, opcode, payload = await read_frame(reader)
+            except (asyncio.IncompleteReadError, HTTPError):
+                return
+
+            # control frames may come between the fragments of a message
+            if opcode < CLOSE:
+                message = opcode if message is None else message
+                parts.append(payload)
+                if not final:
+                    continue
+
+                opcode, payload = message, b''.join(parts)
+                message, parts = None, []
+
+            if opcode == CLOSE:
+                writer.write(websocket_frame(CLOSE, payload[:2]))
+                await writer.drain()
+                return
+
+            if opcode == PING:
+                writer.write(websocket_frame(PONG, payload))
+            elif opcode == TEXT:
+                try:
+                    if entry.id not in self.__sessions:
+                        raise HTTPError(404, f'No session {entry.id}')
+
+                    entry.last_used = time.monotonic()
+                    mask = await self.__update(entry, self.__json(payload))
+                    writer.write(websocket_frame(BINARY, mask))
+                except HTTPError as error:
+                    writer.write(websocket_frame(
+                        TEXT, json_body({'error': str(error)})))
+
+            await writer.drain()
+
+    async def __handle(self, reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self.__connections[task] = writer
+
+        try:
+            try:
+                request = await read_request(reader)
+                if request is None:
+                    return
+
+                method, target, headers, body = request
+                parts = [part for part in urlsplit(target).path.split('/')
+                         if part]
+
+                if headers.get('upgrade', '').lower() == 'websocket':
+                    if len(parts) != 3 or parts[::2] != ['sessions', 'ws']:
+                        raise HTTPError(404, 'Not found')
+
+                    await self.__websocket(self.__session(parts[1]), headers,
+                                           reader, writer)
+                    return
+
+                status, response, content_type = \
+                    await self.__route(method, parts, body)
+            except HTTPError as error:
+                status, content_type = error.status, 'application/json'
+                response = json_body({'error': str(error)})
+
+            writer.write(http_response(status, response, content_type))
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.__connections.pop(task, None)
+            writer.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m simgppa.server',
+        description='Serve interactive segmentation sessions.')
+
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('-j', '--workers', type=int,
+                        help='worker processes solving the sessions, '
+                             'all CPUs by default')
+    parser.add_argument('--memory-limit', type=int, default=1024,
+                        help='MiB the sessions may take together')
+    parser.add_argument('--idle-timeout', type=float, default=600.0,
+                        help='seconds after which an idle session is closed')
+    parser.add_argument('--image-root',
+                        help='directory the sessions may open images from, '
+                             'without it images are only uploaded')
+
+    args = parser.parse_args(argv)
+
+    server = SegmentationServer(args.host, args.port, args.workers,
+                                args.memory_limit * 2 ** 20,
+                                args.idle_timeout, args.image_root)
+
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from .cache import ArrayCache
+from .img_processing import ImageProcessor, ImageSource, Seeds
+from .masks import cut_labels
+from .ppa import PPA
+
+
+class SegmentationSession:
+    '''Segmentation that is re-solved from the previous preflow on seed edits
+
+    The residual graph stays alive between solves, so new seeds only change
+    the t-links of the pixels they touch and the solver repairs the flow
+    around them. With `refit=False` the intensity histograms of the first
+    seeds are kept, otherwise every edit refits them and may touch all t-links.
+    '''
+
+    def __init__(self,
+                 input_path: ImageSource,
+                 bg_pixels: Seeds,
+                 obj_pixels: Seeds,
+                 lmbd: int,
+                 sgm: float,
+                 bw: bool,
+                 refit: bool = False,
+                 nlink_cache: Optional[ArrayCache] = None) -> None:
+
+        self.__img_processor = ImageProcessor(
+            input_path, obj_pixels, bg_pixels, lmbd, sgm, bw, nlink_cache)
+        self.__refit = refit
+
+        self.__source_caps, self.__runoff_caps = \
+            self.__img_processor.get_terminal_capacities()
+
+        self.__solver = PPA.from_arrays(
+            self.__img_processor.get_pixel_count() + 2,
+            *self.__img_processor.get_graph_arrays(),
+            min_cut_only=True)
+
+        self.__mask = None
+
+    def update_seeds(self,
+                     bg_pixels: Seeds,
+                     obj_pixels: Seeds) -> int:
+        '''Replace the seeds and count the pixels whose t-links changed'''
+
+        self.__img_processor.set_seeds(obj_pixels, bg_pixels, self.__refit)
+        source_caps, runoff_caps = \
+            self.__img_processor.get_terminal_capacities()
+
+        changed = np.flatnonzero((source_caps != self.__source_caps) |
+                                 (runoff_caps != self.__runoff_caps))
+
+        if len(changed):
+            self.__solver.update_terminal_capacities(
+                changed + 1, source_caps[changed], runoff_caps[changed])
+            self.__mask = None
+
+        self.__source_caps, self.__runoff_caps = source_caps, runoff_caps
+
+        return len(changed)
+
+    @property
+    def nbytes(self) -> int:
+        '''Memory held by the image arrays, the t-links and the solver'''
+
+        arrays = (self.__source_caps, self.__runoff_caps, self.__mask)
+
+        return self.__img_processor.nbytes + self.__solver.nbytes + \
+            sum(array.nbytes for array in arrays if array is not None)
+
+    def max_flow(self):
+        return self.__solver.max_flow()
+
+    def get_mask(self) -> np.ndarray:
+        '''Object pixels as a boolean (height, width) array'''
+
+        if self.__mask is not None:
+            return self.__mask
+
+        h = self.__img_processor.img_height
+        w = self.__img_processor.img_width
+
+        self.__mask = cut_labels(self.__solver.min_cut_labels(), h, w)
+
+        return self.__mask
+
+    def save_img(self, output: str) -> None:
+
+        Image.fromarray(self.get_mask()).save(output)
@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from simgppa.__main__ import main
+from simgppa.batch import find_companion, segment_directory
+from simgppa.masks import load_mask
+
+path = Path(os.path.abspath(__file__)).parent
+images_path = path.joinpath('data/segmentation/images-320')
+reference_path = path.joinpath('data/segmentation/image-segments-320')
+
+
+class Test_Batch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.images = Path(self.tmp.name).joinpath('images')
+        self.images.mkdir()
+
+        for name in ['banana1-gr-320.jpg', 'banana2-gr-320.jpg']:
+            shutil.copy(images_path.joinpath(name), self.images)
+
+        self.output = Path(self.tmp.name).joinpath('output')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_find_companion(self):
+        image = images_path.joinpath('banana1-gr-320.jpg')
+
+        self.assertEqual(find_companion(reference_path, image),
+                         reference_path.joinpath('banana1-320.jpg'))
+        self.assertIsNone(find_companion(self.images, Path('missing.jpg')))
+
+    def test_segment_directory(self):
+        entries = list(segment_directory(
+            self.images, path.joinpath('obj_pixels.txt'),
+            path.joinpath('bg_pixels.txt'), self.output,
+            reference=reference_path, workers=2, lmbd=1, sgm=60.0,
+            solver='grid'))
+
+        with open(self.output.joinpath('manifest.json')) as file:
+            manifest = json.load(file)
+
+        self.assertEqual(len(entries), 2)
+        self.assertEqual([entry['image'] for entry in manifest],
+                         sorted(str(p) for p in self.images.iterdir()))
+
+        for entry in manifest:
+            self.assertIsNone(entry['error'])
+            self.assertTrue(Path(entry['mask']).exists())
+            self.assertGreater(entry['seconds'], 0)
+            self.assertGreater(entry['accuracy']['total'], 0.5)
+
+    def test_cache(self):
+        cache = Path(self.tmp.name).joinpath('cache')
+
+        for _ in range(2):
+            code = main([str(self.images),
+                         '--obj', str(path.joinpath('obj_pixels.txt')),
+                         '--bg', str(path.joinpath('bg_pixels.txt')),
+                         '-o', str(self.output), '-j', '1', '--lmbd', '1',
+                         '--sgm', '60', '--solver', 'grid',
+                         '--cache', str(cache)])
+            self.assertEqual(code, 0)
+
+        # one n-link array per image
+        self.assertEqual(len(list(cache.glob('*.npy'))), 2)
+
+    def test_mask_format(self):
+        entries = list(segment_directory(
+            self.images, path.joinpath('obj_pixels.txt'),
+            path.joinpath('bg_pixels.txt'), self.output,
+            reference=reference_path, workers=1, lmbd=1, sgm=60.0,
+            solver='grid', mask_format='rle'))
+
+        for entry in entries:
+            self.assertIsNone(entry['error'])
+            self.assertTrue(entry['mask'].endswith('.rle.npz'))
+            self.assertEqual(load_mask(entry['mask']).shape, (240, 320))
+            self.assertGreater(entry['accuracy']['total'], 0.5)
+
+    def test_profile(self):
+        code = main([str(self.images),
+                     '--obj', str(path.joinpath('obj_pixels.txt')),
+                     '--bg', str(path.joinpath('bg_pixels.txt')),
+                     '-o', str(self.output), '-j', '1', '--lmbd', '1',
+                     '--sgm', '60', '--solver', 'grid', '--profile'])
+        self.assertEqual(code, 0)
+
+        with open(self.output.joinpath('manifest.json')) as file:
+            manifest = json.load(file)
+
+        for entry in manifest:
+            self.assertEqual(entry['profile']['sizes']['pixels'], 240 * 320)
+            self.assertIn(entry['profile']['slowest'],
+                          [stage['name'] for stage in
+                           entry['profile']['stages']])
+
+    def test_missing_seeds(self):
+        seeds = Path(self.tmp.name).joinpath('seeds')
+        seeds.mkdir()
+
+        code = main([str(self.images), '--obj', str(seeds),
+                     '--bg', str(path.joinpath('bg_pixels.txt')),
+                     '-o', str(self.output), '-j', '1'])
+
+        with open(self.output.joinpath('manifest.json')) as file:
+            manifest = json.load(file)
+
+        self.assertEqual(code, 1)
+        self.assertTrue(all(entry['error'].startswith('ValueError')
+                            for entry in manifest))
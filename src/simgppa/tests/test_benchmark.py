@@ -0,0 +1,78 @@
+import copy
+import json
+import os
+import tempfile
+import unittest
+
+from simgppa.benchmark import compare, graph_files, level_timing, main, \
+    run, tile_scaling
+
+from .test_grid import grid_capacities
+
+
+class Test_Benchmark(unittest.TestCase):
+
+    def test_graph_files(self):
+        files = graph_files(['test_rd*', 'test_rl0?.txt'])
+        names = [file.stem for file in files]
+
+        self.assertEqual(len(names), 15)
+        self.assertEqual(names, sorted(names))
+
+    def test_run(self):
+        current = run(['test_1.txt', 'test_d2.txt'], repeat=1)
+        results = current['results']
+
+        self.assertEqual(len(results), 8)
+        flows = {(r['graph'], r['max_flow']) for r in results}
+
+        self.assertEqual(flows, {('test_1', 935), ('test_d2', 8023)})
+        self.assertTrue(all(r['peak_memory'] > 0 for r in results))
+        self.assertRaises(ValueError, run, ['test_1.txt'], ['dinic'])
+
+    def test_compare(self):
+        baseline = run(['test_rd05.txt'], ['ppa-fifo'], repeat=1)
+        self.assertEqual(compare(baseline, baseline), [])
+
+        current = copy.deepcopy(baseline)
+        result = current['results'][0]
+        result['max_flow'] += 1
+        result['solve'] = 2 * (result['build'] + result['solve'])
+        result['peak_memory'] *= 2
+
+        self.assertEqual(len(compare(baseline, current)), 3)
+
+    def test_tile_scaling(self):
+        scaling = tile_scaling(grid_capacities(12, 10, 5), [1, 2], repeat=1)
+
+        self.assertEqual(scaling['pixels'], 120)
+        self.assertEqual([r['tiles'] for r in scaling['results']], [1, 2])
+        self.assertTrue(all(r['speedup'] > 0 and r['span_speedup'] > 0
+                            for r in scaling['results']))
+
+    def test_level_timing(self):
+        timing = level_timing(grid_capacities(12, 10, 5), [1, 2], repeat=1)
+
+        self.assertEqual([r['levels'] for r in timing['results']], [1, 2])
+        self.assertEqual(timing['results'][0]['changed'], 0)
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'results.json')
+
+            code = main(['-g', 'test_1.txt', '-c', 'bk', '-r', '1',
+                         '--no-memory', '-o', output])
+
+            with open(output) as file:
+                results = json.load(file)['results']
+
+            self.assertEqual(code, 0)
+            self.assertEqual(results[0]['max_flow'], 935)
+            self.assertIsNone(results[0]['peak_memory'])
+
+            cache = os.path.join(tmp, 'cache')
+            self.assertEqual(main(['-g', 'test_1.txt', '-c', 'bk', '-r', '1',
+                                   '--no-memory', '--cache', cache,
+                                   '-o', output, '-b', output]), 0)
+            self.assertTrue(os.path.exists(
+                os.path.join(cache, 'test_1.txt.npz')))
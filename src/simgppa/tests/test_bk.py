@@ -0,0 +1,55 @@
+import unittest
+
+from simgppa.bk import BK
+from simgppa.ppa import PPA, Edge
+
+from .test_ppa import load
+
+
+class Test_BK(unittest.TestCase):
+    def test_max_flow(self):
+
+        for pref, expected in [(1, 935), (2, 2789), (3, 2000000), (4, 23),
+                               (5, 256), (6, 523), ('d1', 171),
+                               ('d4', 9072), ('d5', 3278)]:
+            vertex_num, edges = load(pref)
+
+            result = BK(vertex_num, edges).max_flow()
+
+            self.assertEqual(result, expected)
+
+    def test_min_cut(self):
+
+        for pref in ['rd03', 'rd05', 'rl04', 'rl06']:
+            vertex_num, edges = load(pref)
+
+            bk = BK(vertex_num, edges)
+            ppa = PPA(vertex_num, edges, min_cut_only=True)
+
+            self.assertEqual(bk.max_flow(), ppa.max_flow())
+            self.assertEqual(sorted(bk.min_cut()), sorted(ppa.min_cut()))
+            self.assertEqual(bk.min_cut_labels().tolist(),
+                             ppa.min_cut_labels().tolist())
+
+    def test_smallest_cut(self):
+        # source -> 1 -> runoff and 1 -> 2 -> runoff, cutting either side of
+        # vertex 1 costs the same
+        edges = [Edge(0, 1, 2), Edge(1, 3, 1), Edge(1, 2, 1), Edge(2, 3, 1)]
+        bk = BK(4, edges)
+
+        self.assertEqual(bk.max_flow(), 2)
+        self.assertEqual(bk.min_cut(), [0])
+
+    def test_flow(self):
+
+        vertex_num, edges = load(2)
+
+        bk = BK(vertex_num, edges)
+        balance = [0] * vertex_num
+
+        for start, end, f in bk.flow():
+            balance[start] -= f
+            balance[end] += f
+
+        self.assertEqual(balance[-1], bk.max_flow())
+        self.assertEqual(balance[1:-1], [0] * (vertex_num - 2))
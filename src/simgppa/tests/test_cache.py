@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from simgppa.cache import ArrayCache
+
+
+class Test_ArrayCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_memory(self):
+        cache = ArrayCache(memory_limit=3 * 800)
+
+        for key in 'abc':
+            cache.put(key, np.full(100, ord(key), dtype=np.int64))
+
+        self.assertEqual(cache.get('a')[0], ord('a'))
+
+        # 'b' is the least recently used one now
+        cache.put('d', np.zeros(100, dtype=np.int64))
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_read_only(self):
+        cache = ArrayCache()
+        array = np.arange(5)
+        cache.put('a', array)
+        array[0] = 7
+
+        cached = cache.get('a')
+        self.assertEqual(cached[0], 0)
+        self.assertRaises(ValueError, cached.__setitem__, 0, 1)
+
+    def test_too_large(self):
+        cache = ArrayCache(self.tmp.name, memory_limit=10, disk_limit=10)
+        cache.put('a', np.arange(5))
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_disk(self):
+        ArrayCache(self.tmp.name).put('a', np.arange(5))
+
+        cache = ArrayCache(self.tmp.name)
+        self.assertEqual(cache.get('a').tolist(), [0, 1, 2, 3, 4])
+
+        cache.clear()
+        self.assertEqual(cache.get('a').tolist(), [0, 1, 2, 3, 4])
+        self.assertIsNone(cache.get('b'))
+
+    def test_disk_limit(self):
+        array = np.zeros(1000, dtype=np.int64)
+        cache = ArrayCache(self.tmp.name, disk_limit=int(2.5 * array.nbytes))
+
+        for age, key in enumerate('ab'):
+            cache.put(key, array)
+            # 'a' written before 'b'
+            os.utime(os.path.join(self.tmp.name, f'{key}.npy'),
+                     (age, age))
+
+        cache.get('a')
+        cache.put('d', array)
+
+        self.assertEqual(sorted(os.listdir(self.tmp.name)),
+                         ['a.npy', 'd.npy'])
@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+from simgppa.graph import ResidualGraph
+from simgppa.ppa import Edge
+
+
+class Test_ResidualGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.edges = [Edge(0, 1, 5), Edge(1, 2, 3), Edge(2, 1, 4),
+                      Edge(0, 2, 1), Edge(0, 2, 7), Edge(2, 2, 9)]
+        self.graph = ResidualGraph.from_edges(3, self.edges)
+
+    def test_layout(self):
+        g = self.graph
+
+        self.assertEqual(g.arc_num, 6)
+        self.assertEqual(g.offsets.tolist(), [0, 2, 4, 6])
+        self.assertEqual(g.tails().tolist(), [0, 0, 1, 1, 2, 2])
+
+        for arc in range(g.arc_num):
+            self.assertEqual(g.reverse[g.reverse[arc]], arc)
+            self.assertEqual(g.tails()[g.reverse[arc]], g.heads[arc])
+
+    def test_capacities(self):
+        g = self.graph
+
+        self.assertEqual(g.capacity[g.find_arc(0, 1)], 5)
+        self.assertEqual(g.capacity[g.find_arc(1, 0)], 0)
+        # antiparallel edges share a pair of arcs
+        self.assertEqual(g.capacity[g.find_arc(1, 2)], 3)
+        self.assertEqual(g.capacity[g.find_arc(2, 1)], 4)
+        # the last of repeated edges wins
+        self.assertEqual(g.capacity[g.find_arc(0, 2)], 7)
+        self.assertEqual(g.find_arc(2, 2), -1)
+
+    def test_edge_arcs(self):
+        g = self.graph
+
+        self.assertEqual(len(g.edge_arcs), len(self.edges))
+        self.assertEqual(g.edge_arcs[-1], -1)
+
+        for edge, arc in zip(self.edges[:-1], g.edge_arcs[:-1]):
+            self.assertEqual(g.tails()[arc], edge.start)
+            self.assertEqual(g.heads[arc], edge.end)
+
+    def test_reachable(self):
+        g = ResidualGraph.from_edges(5, [Edge(0, 1, 2), Edge(1, 2, 0),
+                                         Edge(3, 1, 1), Edge(2, 4, 1)])
+
+        self.assertEqual(g.arcs_of(np.array([2, 0])).tolist(),
+                         list(range(g.offsets[2], g.offsets[3])) +
+                         list(range(g.offsets[0], g.offsets[1])))
+        self.assertEqual(g.arcs_of(np.array([], dtype=np.int64)).tolist(), [])
+
+        self.assertEqual(g.reachable(0).tolist(),
+                         [True, True, False, False, False])
+        self.assertEqual(g.reachable(1, backward=True).tolist(),
+                         [True, True, False, True, False])
+        self.assertEqual(g.reachable(2, backward=True).tolist(),
+                         [False, False, True, False, False])
+
+    def test_from_arrays(self):
+        starts, ends = np.array([0, 1]), np.array([1, 2])
+
+        g = ResidualGraph.from_arrays(3, starts, ends, np.array([1.5, 2.0]))
+
+        self.assertEqual(g.residual.dtype, np.float64)
+        self.assertEqual(g.residual[g.find_arc(0, 1)], 1.5)
+        self.assertRaises(ValueError, ResidualGraph.from_arrays,
+                          2, starts, ends, np.array([1, 2]))
@@ -0,0 +1,163 @@
+import os
+import tempfile
+import time
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+from simgppa.graph_io import load_npz, read_dimacs, read_graph, \
+    read_text, save_npz
+from simgppa.ppa import PPA
+
+from .test_ppa import load
+
+path = os.path.abspath(__file__)
+
+
+def graph_path(pref: str) -> Path:
+    return Path(path).parent.joinpath(f'data/ppa/test_{pref}.txt')
+
+
+def write(file: str, text: str) -> str:
+    with open(file, 'w') as out:
+        out.write(text)
+
+    return file
+
+
+class Test_Graph_IO(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.tmp.name, name)
+
+    def assertGraphEqual(self, first, second):
+        self.assertEqual(first[0], second[0])
+
+        for a, b in zip(first[1:], second[1:]):
+            self.assertEqual(np.asarray(a).tolist(), np.asarray(b).tolist())
+
+    def test_read_text(self):
+        vertex_num, edges = load('rd03')
+        graph = read_text(graph_path('rd03'))
+
+        self.assertGraphEqual(graph, (vertex_num,
+                                      [e.start for e in edges],
+                                      [e.end for e in edges],
+                                      [e.capacity for e in edges]))
+        self.assertEqual(graph[3].dtype, np.int64)
+
+    def test_read_text_float(self):
+        graph = read_text(write(self.file('g.txt'),
+                                '3 2\n1 2 0.5\n2 3 1.5\n'))
+
+        self.assertEqual(graph[3].dtype, np.float64)
+        self.assertEqual(graph[3].tolist(), [0.5, 1.5])
+        self.assertEqual(PPA.from_arrays(*graph).max_flow(), 0.5)
+
+    def test_read_text_empty(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            graph = read_text(write(self.file('g.txt'), '2 0\n\n'))
+
+        self.assertGraphEqual(graph, (2, [], [], []))
+        self.assertEqual(PPA.from_arrays(*graph).max_flow(), 0)
+
+    def test_read_text_invalid(self):
+        self.assertRaises(ValueError, read_text,
+                          write(self.file('a.txt'), '3\n1 2 1\n'))
+        self.assertRaises(ValueError, read_text,
+                          write(self.file('b.txt'), '3 2\n1 2 1\n'))
+        self.assertRaises(ValueError, read_text,
+                          write(self.file('c.txt'), '3 1\n1 4 1\n'))
+
+    def test_read_dimacs(self):
+        graph = read_dimacs(write(self.file('g.max'),
+                                  'c sink first, source last\n'
+                                  'p max 4 5\n'
+                                  'n 4 s\n'
+                                  'n 1 t\n'
+                                  'a 4 2 3\n'
+                                  'a 4 3 2\n'
+                                  'a 2 3 1\n'
+                                  'a 2 1 2\n'
+                                  'a 3 1 4\n'))
+
+        self.assertGraphEqual(graph, (4, [0, 0, 1, 1, 2],
+                                      [1, 2, 2, 3, 3], [3, 2, 1, 2, 4]))
+        self.assertEqual(PPA.from_arrays(*graph).max_flow(), 5)
+
+    def test_read_dimacs_test_graph(self):
+        vertex_num, starts, ends, capacities = read_text(graph_path('d2'))
+
+        lines = [f'p max {vertex_num} {len(starts)}\n',
+                 'n 1 s\n', f'n {vertex_num} t\n']
+        lines += [f'a {s + 1} {e + 1} {c}\n'
+                  for s, e, c in zip(starts, ends, capacities)]
+        file = write(self.file('d2.max'), ''.join(lines))
+
+        self.assertGraphEqual(read_dimacs(file),
+                              (vertex_num, starts, ends, capacities))
+        self.assertEqual(PPA.from_arrays(*read_graph(file)).max_flow(), 8023)
+
+    def test_read_dimacs_invalid(self):
+        self.assertRaises(ValueError, read_dimacs,
+                          write(self.file('a.max'), 'p min 2 1\na 1 2 1\n'))
+        self.assertRaises(ValueError, read_dimacs,
+                          write(self.file('b.max'),
+                                'p max 2 1\nn 1 s\na 1 2 1\n'))
+        self.assertRaises(ValueError, read_dimacs,
+                          write(self.file('c.max'),
+                                'p max 2 2\nn 1 s\nn 2 t\na 1 2 1\n'))
+
+    def test_npz(self):
+        graph = read_text(graph_path('rd03'))
+        save_npz(self.file('rd03.npz'), graph)
+
+        mapped = load_npz(self.file('rd03.npz'))
+        loaded = load_npz(self.file('rd03.npz'), mmap_mode=None)
+
+        self.assertIsInstance(mapped[0], int)
+        self.assertTrue(all(isinstance(a, np.memmap) for a in mapped[1:]))
+        self.assertGraphEqual(mapped, graph)
+        self.assertGraphEqual(loaded, graph)
+        self.assertEqual(PPA.from_arrays(*mapped).max_flow(),
+                         PPA.from_arrays(*graph).max_flow())
+
+    def test_npz_compressed(self):
+        vertex_num, starts, ends, capacities = read_text(graph_path('1'))
+        np.savez_compressed(self.file('g.npz'), vertex_num=vertex_num,
+                            starts=starts, ends=ends, capacities=capacities)
+
+        self.assertRaises(ValueError, load_npz, self.file('g.npz'))
+        self.assertEqual(load_npz(self.file('g.npz'), None)[0], vertex_num)
+
+    def test_read_graph_cache(self):
+        source = self.file('g.txt')
+        cache_dir = self.file('cache')
+        cache = os.path.join(cache_dir, 'g.txt.npz')
+
+        write(source, '3 2\n1 2 4\n2 3 5\n')
+        self.assertGraphEqual(read_graph(source, cache_dir),
+                              (3, [0, 1], [1, 2], [4, 5]))
+        self.assertTrue(os.path.exists(cache))
+
+        graph = read_graph(source, cache_dir)
+        self.assertIsInstance(graph[1], np.memmap)
+        self.assertGraphEqual(read_graph(cache), graph)
+
+        # an edited source is parsed again
+        write(source, '3 2\n1 2 4\n2 3 3\n')
+        later = time.time() + 10
+        os.utime(source, (later, later))
+
+        self.assertEqual(read_graph(source, cache_dir)[3].tolist(), [4, 3])
+        self.assertEqual(read_graph(cache)[3].tolist(), [4, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+
+import numpy as np
+from simgppa.grid import GridPPA, global_relabel, relabel_within
+from simgppa.img_processing import NEIGHBOURS, neighbour_slices
+from simgppa.ppa import PPA
+
+
+def grid_capacities(height: int, width: int, seed: int):
+    rng = np.random.default_rng(seed)
+
+    return rng.integers(0, 30, (height, width, len(NEIGHBOURS))), \
+        rng.integers(0, 40, (height, width)), \
+        rng.integers(0, 40, (height, width))
+
+
+def edge_arrays(nlinks, source_caps, runoff_caps):
+    '''The same graph as flat edge arrays in `ImageProcessor` numbering'''
+
+    height, width = source_caps.shape
+    idx = np.arange(1, height * width + 1).reshape(height, width)
+    cells = idx.ravel()
+
+    starts, ends, capacities = [], [], []
+
+    for d, (dy, dx) in enumerate(NEIGHBOURS):
+        src, dst = neighbour_slices(dy, dx, height, width)
+
+        starts.append(idx[src].ravel())
+        ends.append(idx[dst].ravel())
+        capacities.append(nlinks[src + (d,)].ravel())
+
+    starts += [np.zeros_like(cells), cells]
+    ends += [cells, np.full_like(cells, height * width + 1)]
+    capacities += [source_caps.ravel(), runoff_caps.ravel()]
+
+    return height * width + 2, np.concatenate(starts), \
+        np.concatenate(ends), np.concatenate(capacities)
+
+
+class Test_GridPPA(unittest.TestCase):
+
+    def test_same_as_ppa(self):
+        for seed, (height, width) in enumerate([(1, 1), (1, 9), (7, 1),
+                                                (6, 7), (20, 15)]):
+            capacities = grid_capacities(height, width, seed)
+
+            grid = GridPPA(*capacities)
+            ppa = PPA.from_arrays(*edge_arrays(*capacities),
+                                  min_cut_only=True)
+
+            self.assertEqual(grid.max_flow(), ppa.max_flow())
+            self.assertEqual(grid.min_cut(), ppa.min_cut())
+            self.assertEqual(grid.min_cut_labels().tolist(),
+                             ppa.min_cut_labels().tolist())
+
+    def test_smallest_cut(self):
+        # equal t-links and no n-links tie every pixel, the smallest cut
+        # leaves all of them out
+        shape = (4, 5)
+        grid = GridPPA(np.zeros(shape + (len(NEIGHBOURS),)),
+                       np.full(shape, 3), np.full(shape, 3))
+        self.assertEqual(grid.min_cut(), [0])
+
+        # small capacities make many cuts tie, the full solve of `PPA`
+        # returns the smallest one
+        rng = np.random.default_rng(5)
+        capacities = rng.integers(0, 3, (9, 8, len(NEIGHBOURS))), \
+            rng.integers(0, 3, (9, 8)), rng.integers(0, 3, (9, 8))
+
+        self.assertEqual(GridPPA(*capacities).min_cut(),
+                         PPA.from_arrays(*edge_arrays(*capacities)).min_cut())
+
+    def test_relabel_interval(self):
+        capacities = grid_capacities(12, 10, 7)
+        expected = GridPPA(*capacities).min_cut()
+
+        for interval in [1, 5, 1000]:
+            grid = GridPPA(*capacities, relabel_interval=interval)
+
+            self.assertEqual(grid.min_cut(), expected)
+
+    def test_relabel(self):
+        grid = GridPPA(*grid_capacities(9, 6, 4))
+        size, top = len(grid.height), grid.vertex_num
+
+        # distances to the runoff, one arc at a time until none shortens
+        expected = np.where(grid.runoff_residual > 0, 1, top)
+        while True:
+            shorter = expected.copy()
+            for d, shift in enumerate(grid.shifts):
+                pixels = np.flatnonzero(grid.residual[:, d] > 0)
+                shorter[pixels] = np.minimum(
+                    shorter[pixels], expected[pixels + shift] + 1)
+
+            if np.array_equal(shorter, expected):
+                break
+            expected = shorter
+
+        height = np.zeros(size, dtype=np.int64)
+        global_relabel(height, grid.residual, grid.runoff_residual,
+                       grid.shifts)
+        self.assertEqual(height.tolist(), expected.tolist())
+
+        # pixels outside of the slice keep their heights and paths end there
+        height[12:42] = 0
+        relabel_within(height, grid.residual, grid.runoff_residual,
+                       grid.shifts, slice(12, 42), top)
+        self.assertEqual(height.tolist(), expected.tolist())
+
+    def test_border_arcs_ignored(self):
+        nlinks, source_caps, runoff_caps = grid_capacities(5, 4, 3)
+        expected = GridPPA(nlinks, source_caps, runoff_caps).max_flow()
+
+        nlinks[:, -1, 0] = nlinks[:, 0, 1] = 1000
+        nlinks[-1, :, 2] = nlinks[0, :, 3] = 1000
+
+        self.assertEqual(
+            GridPPA(nlinks, source_caps, runoff_caps).max_flow(), expected)
+
+    def test_shape_mismatch(self):
+        nlinks, source_caps, runoff_caps = grid_capacities(5, 4, 3)
+
+        self.assertRaises(ValueError, GridPPA,
+                          nlinks[:, :3], source_caps, runoff_caps)
@@ -0,0 +1,280 @@
+import math
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+from simgppa.cache import ArrayCache
+from simgppa.img_processing import ImageProcessor, Pixel, image_pixels, \
+    intensity_bins, load_pixels, nlink_table
+
+path = Path(os.path.abspath(__file__)).parent
+image_path = path.joinpath('data/segmentation/images-320/banana1-gr-320.jpg')
+
+
+class Test_ImageProcessor(unittest.TestCase):
+
+    def setUp(self):
+        self.obj = [Pixel(158, 166), Pixel(190, 161)]
+        self.bg = [Pixel(121, 66), Pixel(17, 216)]
+        self.imgp = ImageProcessor(image_path, self.obj, self.bg, 100, 5.0)
+
+        with Image.open(image_path) as file:
+            self.img = file.load()
+
+    def test_graph_size(self):
+        w, h = self.imgp.img_width, self.imgp.img_height
+        starts, ends, capacities = self.imgp.get_graph_arrays()
+
+        edges_num = 2 * (w - 1) * h + 2 * w * (h - 1) + 2 * w * h
+
+        self.assertEqual(len(starts), edges_num)
+        self.assertEqual(len(ends), edges_num)
+        self.assertEqual(len(capacities), edges_num)
+
+    def test_nlink_weights(self):
+        w = self.imgp.img_width
+        starts, ends, capacities = self.imgp.get_graph_arrays()
+        arcs = dict(zip(zip(starts.tolist(), ends.tolist()),
+                        capacities.tolist()))
+
+        for x, y in [(0, 0), (10, 20), (200, 100), (318, 238)]:
+            for nx, ny in [(x + 1, y), (x, y + 1)]:
+                dt = (self.img[x, y] - self.img[nx, ny]) ** 2
+                weight = int(100 * math.exp(-dt / (2 * 5.0 ** 2)))
+
+                u, v = y * w + x + 1, ny * w + nx + 1
+
+                self.assertEqual(arcs[u, v], weight)
+                self.assertEqual(arcs[v, u], weight)
+
+    def test_seed_tlinks(self):
+        w = self.imgp.img_width
+        runoff = self.imgp.get_pixel_count() + 1
+        max_out_flow = self.imgp.get_max_out_flow()
+        starts, ends, capacities = self.imgp.get_graph_arrays()
+        arcs = dict(zip(zip(starts.tolist(), ends.tolist()),
+                        capacities.tolist()))
+
+        for pixel in self.obj:
+            idx = pixel.y * w + pixel.x + 1
+            self.assertEqual(arcs[0, idx], max_out_flow)
+            self.assertEqual(arcs[idx, runoff], 0)
+
+        for pixel in self.bg:
+            idx = pixel.y * w + pixel.x + 1
+            self.assertEqual(arcs[0, idx], 0)
+            self.assertEqual(arcs[idx, runoff], max_out_flow)
+
+    def test_edges_view(self):
+        starts, ends, capacities = self.imgp.get_graph_arrays()
+        edges = self.imgp.get_graph_edges()
+
+        self.assertEqual([e.start for e in edges], starts.tolist())
+        self.assertEqual([e.end for e in edges], ends.tolist())
+        self.assertTrue(np.array_equal(
+            [e.capacity for e in edges], capacities))
+
+    def test_grid_capacities(self):
+        w, h = self.imgp.img_width, self.imgp.img_height
+        nlinks, source_caps, runoff_caps = self.imgp.get_grid_capacities()
+        starts, ends, capacities = self.imgp.get_graph_arrays()
+
+        self.assertEqual(nlinks.shape, (h, w, 4))
+        self.assertTrue(np.array_equal(
+            capacities[-2 * w * h:], np.concatenate(
+                (source_caps.ravel(), runoff_caps.ravel()))))
+        self.assertEqual(nlinks[:, :-1, 0].sum() + nlinks[:, 1:, 1].sum() +
+                         nlinks[:-1, :, 2].sum() + nlinks[1:, :, 3].sum(),
+                         capacities[:-2 * w * h].sum())
+
+    def test_mask_seeds(self):
+        w, h = self.imgp.img_width, self.imgp.img_height
+        obj = np.zeros((h, w), dtype=bool)
+        bg = np.zeros((h, w), dtype=bool)
+
+        for pixel in self.obj:
+            obj[pixel.y, pixel.x] = True
+
+        for pixel in self.bg:
+            bg[pixel.y, pixel.x] = True
+
+        imgp = ImageProcessor(image_path, obj, bg, 100, 5.0)
+
+        for got, expected in zip(imgp.get_graph_arrays(),
+                                 self.imgp.get_graph_arrays()):
+            self.assertTrue(np.array_equal(got, expected))
+
+    def test_scribble_seeds(self):
+        w, h = self.imgp.img_width, self.imgp.img_height
+        obj = Image.new('RGBA', (w, h))
+        bg = Image.new('L', (w, h))
+
+        for pixel in self.obj:
+            obj.putpixel(pixel, (255, 0, 0, 255))
+
+        for pixel in self.bg:
+            bg.putpixel(pixel, 255)
+
+        imgp = ImageProcessor(image_path, obj, bg, 100, 5.0)
+
+        for got, expected in zip(imgp.get_graph_arrays(),
+                                 self.imgp.get_graph_arrays()):
+            self.assertTrue(np.array_equal(got, expected))
+
+    def test_invalid_seeds(self):
+        self.assertRaises(ValueError, ImageProcessor, image_path,
+                          [Pixel(320, 0)], self.bg)
+        self.assertRaises(ValueError, ImageProcessor, image_path,
+                          np.ones((10, 10), dtype=bool), self.bg)
+
+    def test_load_pixels(self):
+        pixels = load_pixels(path.joinpath('obj_pixels.txt'))
+
+        self.assertEqual(pixels[0], Pixel(28, 124))
+        self.assertEqual(len(pixels), 96)
+
+    def test_nlink_table(self):
+        table = nlink_table(5.0)
+
+        self.assertEqual(len(table), 255 ** 2 + 1)
+        self.assertEqual(len(nlink_table(5.0, bw=False)), 3 * 255 ** 2 + 1)
+
+        for dt in [0, 1, 49, 200, 65025]:
+            self.assertEqual(table[dt], int(100 * math.exp(-dt / 50.0)))
+
+    def test_intensity_bins(self):
+        gray = np.array([[0, 5, 6], [250, 255, 128]], dtype=np.uint8)
+        bins, count = intensity_bins(gray)
+
+        self.assertEqual(count, 51)
+        self.assertEqual(bins.tolist(), [[0, 0, 1], [49, 50, 25]])
+
+        colour = np.array([[[0, 0, 0], [255, 255, 255], [16, 32, 255]]],
+                          dtype=np.uint8)
+        bins, count = intensity_bins(colour, bw=False)
+
+        self.assertEqual(count, 16 ** 3)
+        self.assertEqual(bins.tolist(), [[0, 16 ** 3 - 1,
+                                          (1 * 16 + 2) * 16 + 15]])
+
+    def test_colour_histograms(self):
+        # left half red, right half blue with a green stripe
+        colour = np.zeros((20, 30, 3), dtype=np.uint8)
+        colour[:, :15, 0] = 200
+        colour[:, 15:, 2] = 200
+        colour[8:12, 20:, 1] = 200
+
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, 'colour.png')
+            Image.fromarray(colour).save(file)
+
+            imgp = ImageProcessor(file, [Pixel(2, 2), Pixel(3, 2)],
+                                  [Pixel(25, 2), Pixel(25, 10)],
+                                  lmbd=10, sgm=5.0, bw=False)
+            source_caps, runoff_caps = imgp.get_terminal_capacities()
+
+        max_out_flow = imgp.get_max_out_flow()
+        source_caps = source_caps.reshape(20, 30)
+        runoff_caps = runoff_caps.reshape(20, 30)
+
+        # red pixels match the object seeds only, blue and green each half
+        # of the background seeds
+        self.assertEqual(runoff_caps[5, 5], 0)
+        self.assertEqual(source_caps[5, 5], max_out_flow)
+        self.assertAlmostEqual(source_caps[0, 25], -10 * math.log(0.5))
+        self.assertAlmostEqual(source_caps[9, 29], -10 * math.log(0.5))
+        self.assertEqual(runoff_caps[9, 29], max_out_flow)
+
+        # strong n-links inside a colour, none across the red-blue border
+        nlinks, _, _ = imgp.get_grid_capacities()
+        self.assertEqual(nlinks[0, 0, 0], 100)
+        self.assertEqual(nlinks[0, 14, 0], 0)
+
+    def test_colour_of_gray_image(self):
+        imgp = ImageProcessor(image_path, self.obj, self.bg, 100, 5.0,
+                              bw=False)
+        nlinks, _, _ = imgp.get_grid_capacities()
+
+        with Image.open(image_path) as file:
+            gray = np.asarray(file).astype(np.int64)
+
+        # a gray level difference counts once per channel
+        dt = 3 * (gray[:, :-1] - gray[:, 1:]) ** 2
+        self.assertTrue(np.array_equal(nlinks[:, :-1, 0],
+                                       nlink_table(5.0, bw=False)[dt]))
+
+    def test_nlink_cache(self):
+        cache = ArrayCache()
+        expected = self.imgp.get_grid_capacities()
+
+        for obj in [self.obj, self.obj[:1]]:
+            imgp = ImageProcessor(image_path, obj, self.bg, 100, 5.0,
+                                  nlink_cache=cache)
+            self.assertTrue(np.array_equal(imgp.get_grid_capacities()[0],
+                                           expected[0]))
+
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # another sigma has other n-links
+        ImageProcessor(image_path, self.obj, self.bg, 100, 6.0,
+                       nlink_cache=cache).get_grid_capacities()
+        self.assertEqual(cache.misses, 2)
+
+    def test_image_sources(self):
+        expected = self.imgp.get_graph_arrays()
+
+        with Image.open(image_path) as file:
+            file.load()
+            pixels = np.asarray(file)
+
+            sources = [pixels, file, np.dstack([pixels] * 3)]
+
+            with tempfile.TemporaryDirectory() as tmp:
+                npy = os.path.join(tmp, 'image.npy')
+                np.save(npy, pixels)
+                sources.append(npy)
+
+                for source in sources:
+                    imgp = ImageProcessor(source, self.obj, self.bg, 100, 5.0)
+
+                    for got, arrays in zip(imgp.get_graph_arrays(), expected):
+                        self.assertTrue(np.array_equal(got, arrays))
+
+    def test_image_pixels(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            npy = os.path.join(tmp, 'image.npy')
+            np.save(npy, np.zeros((4, 5, 4), dtype=np.uint8))
+
+            self.assertIsInstance(image_pixels(npy, bw=False), np.memmap)
+
+        gray = np.arange(12, dtype=np.uint8).reshape(3, 4)
+        colour = image_pixels(gray, bw=False)
+
+        self.assertIs(image_pixels(gray), gray)
+        self.assertEqual(colour.shape, (3, 4, 3))
+        self.assertTrue(np.shares_memory(colour, gray))
+        self.assertEqual(colour[2, 3].tolist(), [11, 11, 11])
+
+        self.assertRaises(ValueError, image_pixels, gray.astype(np.int64))
+        self.assertRaises(ValueError, image_pixels, gray[..., np.newaxis])
+        self.assertRaises(Exception, image_pixels, 'missing.png')
+
+    def test_row_chunks(self):
+        expected = self.imgp.get_grid_capacities()
+        colour = ImageProcessor(image_path, self.obj, self.bg, 100, 5.0,
+                                bw=False).get_grid_capacities()
+
+        # chunks that do not divide the 240 rows of the image
+        with mock.patch('simgppa.img_processing.CHUNK_ROWS', 7):
+            for bw, capacities in [(True, expected), (False, colour)]:
+                imgp = ImageProcessor(image_path, self.obj, self.bg, 100,
+                                      5.0, bw=bw)
+                for got, arrays in zip(imgp.get_grid_capacities(),
+                                       capacities):
+                    self.assertTrue(np.array_equal(got, arrays))
+
+        self.assertEqual(expected[0].dtype, np.uint8)
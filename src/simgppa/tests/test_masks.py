@@ -0,0 +1,56 @@
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from simgppa.masks import cut_labels, decode_rle, encode_rle, load_mask, \
+    pack_mask, save_mask, unpack_mask
+
+
+class Test_Masks(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.mask = rng.random((7, 9)) < 0.4
+
+    def test_cut_labels(self):
+        vertices = np.zeros(14, dtype=bool)
+        vertices[[0, 1, 5, 12]] = True
+
+        self.assertEqual(cut_labels(vertices, 3, 4).tolist(),
+                         [[True, False, False, False],
+                          [True, False, False, False],
+                          [False, False, False, True]])
+
+    def test_pack_mask(self):
+        bits = pack_mask(self.mask)
+
+        self.assertEqual(len(bits), (7 * 9 + 7) // 8)
+        self.assertTrue(np.array_equal(unpack_mask(bits, (7, 9)), self.mask))
+
+    def test_rle(self):
+        runs = encode_rle(np.array([[True, True, False], [False, True, True]]))
+        self.assertEqual(runs.tolist(), [0, 2, 2, 2])
+
+        runs = encode_rle(np.zeros((2, 3), dtype=bool))
+        self.assertEqual(runs.tolist(), [6])
+
+        runs = encode_rle(self.mask)
+        self.assertEqual(runs.sum(), self.mask.size)
+        self.assertTrue(np.array_equal(decode_rle(runs, (7, 9)), self.mask))
+
+    def test_save_mask(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for fmt, name in [('png', 'mask.png'), ('packed', 'mask.npz'),
+                              ('rle', 'mask.rle.npz')]:
+                output = os.path.join(tmp, name)
+                save_mask(self.mask, output, fmt)
+
+                self.assertTrue(np.array_equal(load_mask(output), self.mask))
+
+        buffer = io.BytesIO()
+        save_mask(self.mask, buffer)
+        self.assertTrue(buffer.getvalue().startswith(b'\x89PNG'))
+
+        self.assertRaises(ValueError, save_mask, self.mask, buffer, 'gif')
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+from simgppa.metrics import compare, evaluate
+
+
+class Test_Metrics(unittest.TestCase):
+
+    def setUp(self):
+        reference = np.zeros((4, 5), dtype=np.uint8)
+        reference[1:3, 1:4] = 255
+        output = np.zeros((4, 5), dtype=np.uint8)
+        output[1:4, 2:4] = 200
+
+        self.reference = Image.fromarray(reference)
+        self.output = Image.fromarray(output)
+
+    def test_compare(self):
+        correct_obj, correct_bg, correct_total, correct_relative = compare(
+            self.reference, self.output)
+
+        self.assertEqual(correct_obj, 4 / 20)
+        self.assertEqual(correct_bg, 12 / 20)
+        self.assertEqual(correct_total, 16 / 20)
+        self.assertEqual(correct_relative, 4 / 8)
+
+    def test_evaluate(self):
+        result = evaluate(self.reference, self.output)
+
+        self.assertTrue(np.array_equal(result.confusion, [[12, 2], [2, 4]]))
+        self.assertEqual(result.iou, 4 / 8)
+        self.assertEqual(result.dice, 8 / 12)
+        self.assertEqual(result[:4], compare(self.reference, self.output))
+
+    def test_color_and_bilevel(self):
+        color = self.reference.convert('RGB')
+        bilevel = Image.fromarray(np.asarray(self.output) > 0)
+
+        self.assertEqual(bilevel.mode, '1')
+
+        self.assertEqual(compare(color, bilevel),
+                         compare(self.reference, self.output))
+
+    def test_dump(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = os.getcwd()
+            os.chdir(tmp)
+
+            try:
+                compare(self.reference, self.output)
+                self.assertEqual(os.listdir(tmp), [])
+
+                compare(self.reference, self.output, 'pixels.txt')
+
+                with open('pixels.txt') as file:
+                    lines = file.read().splitlines()
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(len(lines), 20)
+        self.assertEqual(lines[0], '0 0 : 0 : 0')
+        self.assertEqual(lines[7], '1 3 : 0 : 0')
+        self.assertEqual(lines[11], '2 3 : 0 : 200')
+        self.assertEqual(lines[6], '1 2 : 255 : 0')
+
+    def test_size_mismatch(self):
+        self.assertRaises(Exception, compare, self.reference,
+                          self.output.crop((0, 0, 4, 4)))
@@ -4,8 +4,11 @@ import unittest
 from pathlib import Path
 from typing import List
 
+import numpy as np
 from simgppa.ppa import PPA, Edge
 
+from .test_grid import edge_arrays, grid_capacities
+
 path = os.path.abspath(__file__)
 
 
@@ -117,3 +120,290 @@ class Test_PPA_D(unittest.TestCase):
         result = PPA(vertex_num, edges).max_flow()
 
         self.assertEqual(result, 3278)
+
+
+class Test_PPA_Arrays(unittest.TestCase):
+    def test_from_arrays(self):
+
+        vertex_num, edges = load('rd02')
+
+        starts = np.array([e.start for e in edges])
+        ends = np.array([e.end for e in edges])
+        capacities = np.array([e.capacity for e in edges])
+
+        result = PPA.from_arrays(vertex_num, starts, ends, capacities)
+
+        self.assertEqual(result.max_flow(), 37897)
+        self.assertEqual(result.max_flow(), PPA(vertex_num, edges).max_flow())
+
+    def test_min_cut(self):
+
+        vertex_num, edges = load('rl03')
+
+        ppa = PPA(vertex_num, edges)
+        cut = set(ppa.min_cut())
+
+        capacity = sum(e.capacity for e in edges
+                       if e.start in cut and e.end not in cut)
+
+        self.assertIn(0, cut)
+        self.assertNotIn(vertex_num - 1, cut)
+        self.assertEqual(capacity, ppa.max_flow())
+        self.assertIs(ppa.min_cut(), ppa.min_cut())
+
+        labels = ppa.min_cut_labels()
+        self.assertIs(ppa.min_cut_labels(), labels)
+        self.assertFalse(labels.flags.writeable)
+        self.assertEqual(set(np.flatnonzero(labels).tolist()), cut)
+
+    def test_flow(self):
+
+        vertex_num, edges = load(1)
+
+        ppa = PPA(vertex_num, edges)
+        balance = [0] * vertex_num
+
+        for (start, end, f), edge in zip(ppa.flow(), edges):
+            self.assertLessEqual(0, f)
+            self.assertLessEqual(f, edge.capacity)
+            balance[start] -= f
+            balance[end] += f
+
+        self.assertEqual(balance[-1], ppa.max_flow())
+        self.assertEqual(balance[1:-1], [0] * (vertex_num - 2))
+
+
+class Test_PPA_Schedulers(unittest.TestCase):
+    def test_schedulers(self):
+
+        for pref, expected in [(2, 2789), ('d3', 9078), ('rd05', 153728),
+                               ('rl06', 141131)]:
+            vertex_num, edges = load(pref)
+
+            for scheduler in ['highest', 'fifo']:
+                result = PPA(vertex_num, edges,
+                             scheduler=scheduler).max_flow()
+
+                self.assertEqual(result, expected)
+
+    def test_unknown_scheduler(self):
+
+        vertex_num, edges = load(1)
+
+        self.assertRaises(ValueError, PPA, vertex_num,
+                          edges, scheduler='lowest')
+
+
+class Test_PPA_Min_Cut_Only(unittest.TestCase):
+    def test_max_flow(self):
+
+        for pref, expected in [(1, 935), (3, 2000000), ('d2', 8023),
+                               ('d4', 9072), ('rd06', 224507),
+                               ('rl07', 204082)]:
+            vertex_num, edges = load(pref)
+
+            result = PPA(vertex_num, edges, min_cut_only=True).max_flow()
+
+            self.assertEqual(result, expected)
+
+    def test_min_cut(self):
+
+        for pref in ['rd04', 'rl05']:
+            vertex_num, edges = load(pref)
+
+            ppa = PPA(vertex_num, edges, min_cut_only=True)
+            cut = set(ppa.min_cut())
+
+            capacity = sum(e.capacity for e in edges
+                           if e.start in cut and e.end not in cut)
+
+            self.assertIn(0, cut)
+            self.assertNotIn(vertex_num - 1, cut)
+            self.assertEqual(capacity, ppa.max_flow())
+            # both phases give the smallest of the minimum cuts
+            self.assertEqual(set(PPA(vertex_num, edges).min_cut()), cut)
+            self.assertEqual(len(cut), ppa.min_cut_labels().sum())
+
+    def test_tied_cuts(self):
+        # source -> 1 -> runoff and 1 -> 2 -> runoff, cutting either side of
+        # vertex 1 costs the same
+        edges = [Edge(0, 1, 2), Edge(1, 3, 1), Edge(1, 2, 1), Edge(2, 3, 1)]
+
+        for min_cut_only in [False, True]:
+            ppa = PPA(4, edges, min_cut_only=min_cut_only)
+
+            self.assertEqual(ppa.max_flow(), 2)
+            self.assertEqual(ppa.min_cut(), [0])
+
+    def test_flow(self):
+
+        vertex_num, edges = load(1)
+
+        ppa = PPA(vertex_num, edges, min_cut_only=True)
+
+        self.assertRaises(ValueError, ppa.flow)
+
+
+class Test_PPA_Warm_Start(unittest.TestCase):
+    def test_flow_argument(self):
+
+        vertex_num, edges = load(2)
+
+        ppa = PPA(vertex_num, edges)
+        flow = [Edge(*e) for e in ppa.flow()]
+
+        self.assertEqual(PPA(vertex_num, edges, flow=flow).max_flow(),
+                         ppa.max_flow())
+
+    def test_update_terminal_capacities(self):
+
+        rng = np.random.default_rng(0)
+
+        for seed in range(10):
+            for min_cut_only in [False, True]:
+                vertex_num, starts, ends, capacities = edge_arrays(
+                    *grid_capacities(6, 7, seed))
+                cells = vertex_num - 2
+                tlinks = len(starts) - 2 * cells
+
+                ppa = PPA.from_arrays(vertex_num, starts, ends, capacities,
+                                      min_cut_only=min_cut_only)
+                ppa.max_flow()
+
+                for _ in range(3):
+                    vertices = rng.choice(np.arange(1, cells + 1), 8,
+                                          replace=False)
+                    source_caps = rng.integers(0, 30, len(vertices))
+                    runoff_caps = rng.integers(0, 30, len(vertices))
+
+                    capacities = capacities.copy()
+                    capacities[tlinks + vertices - 1] = source_caps
+                    capacities[tlinks + cells + vertices - 1] = runoff_caps
+
+                    ppa.update_terminal_capacities(
+                        vertices, source_caps, runoff_caps)
+                    fresh = PPA.from_arrays(vertex_num, starts, ends,
+                                            capacities,
+                                            min_cut_only=min_cut_only)
+
+                    self.assertEqual(ppa.max_flow(), fresh.max_flow())
+                    self.assertEqual(sorted(ppa.min_cut()),
+                                     sorted(fresh.min_cut()))
+
+    def test_update_missing_arc(self):
+
+        edges = [Edge(0, 1, 3), Edge(1, 2, 2), Edge(2, 3, 4)]
+        ppa = PPA(4, edges)
+
+        self.assertRaises(ValueError, ppa.update_terminal_capacities,
+                          [1], [1], [1])
+
+
+class Test_PPA_Stats(unittest.TestCase):
+    def test_disabled(self):
+
+        vertex_num, edges = load(1)
+
+        self.assertIsNone(PPA(vertex_num, edges).stats)
+
+    def test_counters(self):
+
+        vertex_num, edges = load('rd05')
+
+        for min_cut_only in [False, True]:
+            ppa = PPA(vertex_num, edges, min_cut_only=min_cut_only,
+                      stats=True)
+
+            self.assertEqual(ppa.max_flow(), 153728)
+
+            stats = ppa.stats.as_dict()
+            self.assertGreater(stats['saturating_pushes'], 0)
+            self.assertGreater(stats['nonsaturating_pushes'], 0)
+            self.assertGreater(stats['relabels'], 0)
+            # the initial global relabel is counted
+            self.assertGreaterEqual(stats['global_relabels'], 1)
+            self.assertGreaterEqual(stats['arcs_scanned'],
+                                    stats['operations'])
+            self.assertGreater(stats['max_active'], 0)
+            self.assertGreater(stats['global_relabel_time'], 0)
+
+    def test_callback(self):
+
+        vertex_num, edges = load('rd05')
+        calls = []
+
+        ppa = PPA(vertex_num, edges, callback=calls.append,
+                  callback_interval=500)
+        ppa.max_flow()
+
+        self.assertGreater(len(calls), 1)
+        self.assertIs(calls[-1], ppa.stats)
+
+
+class Test_PPA_Anytime(unittest.TestCase):
+    def test_time_budget(self):
+
+        vertex_num, edges = load('rl07')
+        expected = PPA(vertex_num, edges, min_cut_only=True).max_flow()
+
+        ppa = PPA(vertex_num, edges, min_cut_only=True)
+        self.assertEqual(ppa.max_flow(time_budget=0), 0)
+        self.assertFalse(ppa.finished)
+
+        flows = []
+        while not ppa.finished:
+            flows.append(ppa.max_flow(time_budget=0.002))
+
+            cut = ppa.cut_estimate()
+            capacity = sum(e.capacity for e in edges
+                           if cut[e.start] and not cut[e.end])
+            self.assertGreaterEqual(capacity, expected)
+
+        self.assertEqual(flows, sorted(flows))
+        self.assertEqual(flows[-1], expected)
+        # the estimate ends on the largest minimum cut
+        self.assertFalse((ppa.min_cut_labels() & ~ppa.cut_estimate()).any())
+
+    def test_checkpoint(self):
+
+        for min_cut_only in [True, False]:
+            vertex_num, edges = load('rd06')
+            fresh = PPA(vertex_num, edges, min_cut_only=min_cut_only)
+
+            ppa = PPA(vertex_num, edges, min_cut_only=min_cut_only)
+            ppa.max_flow(time_budget=0.002)
+            self.assertFalse(ppa.finished)
+
+            buffer = io.BytesIO()
+            ppa.save_checkpoint(buffer)
+            buffer.seek(0)
+            resumed = PPA.load_checkpoint(buffer, stats=True)
+
+            # loading neither pushes from the source nor relabels
+            self.assertEqual(resumed.stats.global_relabels, 0)
+            self.assertEqual(resumed.graph.residual.tolist(),
+                             ppa.graph.residual.tolist())
+            self.assertEqual(resumed.excess.tolist(), ppa.excess.tolist())
+            self.assertEqual(resumed.scheduler, ppa.scheduler)
+            self.assertEqual(resumed.max_flow(), fresh.max_flow())
+            self.assertEqual(resumed.min_cut(), fresh.min_cut())
+
+    def test_checkpoint_after_update(self):
+
+        starts, ends = [0, 0, 1, 2, 1, 2], [1, 2, 3, 3, 2, 1]
+        ppa = PPA.from_arrays(4, starts, ends, [5, 1, 2, 6, 3, 3],
+                              min_cut_only=True)
+        ppa.max_flow()
+        ppa.update_terminal_capacities([1, 2], [1, 7], [1, 0])
+
+        buffer = io.BytesIO()
+        ppa.save_checkpoint(buffer)
+        buffer.seek(0)
+        resumed = PPA.load_checkpoint(buffer)
+
+        # a later update goes on from the shift the checkpoint kept
+        for solver in [ppa, resumed]:
+            solver.update_terminal_capacities([1], [4], [4])
+
+        self.assertEqual(resumed.max_flow(), ppa.max_flow())
+        self.assertEqual(resumed.min_cut(), ppa.min_cut())
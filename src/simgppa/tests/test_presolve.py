@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+from simgppa.bk import BK
+from simgppa.presolve import arc_sums, fixed_cut, presolve, presolved
+from simgppa.pyramid import fix_outside, graph_band_solver, grid_band_solver
+
+from .test_grid import edge_arrays, grid_capacities
+
+
+class Test_Presolve(unittest.TestCase):
+
+    def test_arc_sums(self):
+        nlinks, _, _ = grid_capacities(4, 5, 0)
+        outgoing, incoming = arc_sums(nlinks)
+
+        self.assertEqual(outgoing.sum(), incoming.sum())
+        self.assertEqual(outgoing[1, 1], nlinks[1, 1].sum())
+        self.assertEqual(outgoing[0, 0], nlinks[0, 0, [0, 2]].sum())
+        self.assertEqual(incoming[1, 1], nlinks[1, 2, 1] + nlinks[1, 0, 0] +
+                         nlinks[2, 1, 3] + nlinks[0, 1, 2])
+
+    def test_seeds(self):
+        nlinks = np.full((3, 4, 4), 5, dtype=np.int64)
+        source_caps = np.ones((3, 4))
+        runoff_caps = np.ones((3, 4))
+        source_caps[0, 0] = runoff_caps[2, 3] = 21
+
+        labels, free, reduced, offset = presolve(
+            nlinks, source_caps, runoff_caps)
+
+        self.assertTrue(labels[0, 0])
+        self.assertFalse(free[0, 0] or free[2, 3] or labels[2, 3])
+        self.assertEqual(free.sum(), 10)
+        # t-links routed straight through the fixed pixels
+        self.assertEqual(offset, 2)
+
+        # the graph of the free pixels is the band graph of `fix_outside`
+        for array, expected in zip(reduced, fix_outside(
+                nlinks, source_caps, runoff_caps, labels, free)):
+            self.assertEqual(array.tolist(), expected.tolist())
+
+        self.assertEqual(fixed_cut(nlinks, source_caps, runoff_caps,
+                                   labels, free), offset)
+
+    def test_exact(self):
+        for seed, (height, width) in enumerate([(6, 7), (12, 9), (20, 15)]):
+            nlinks, source_caps, runoff_caps = grid_capacities(
+                height, width, seed)
+            rng = np.random.default_rng(seed)
+            # strong t-links on a fifth of the pixels, as seeds have
+            strong = rng.random((height, width)) < 0.2
+            side = rng.random((height, width)) < 0.5
+            source_caps = np.where(strong & side, 100, source_caps)
+            runoff_caps = np.where(strong & ~side, 100, runoff_caps)
+
+            whole = BK.from_arrays(*edge_arrays(
+                nlinks, source_caps, runoff_caps))
+            expected = whole.min_cut_labels()[1:-1].reshape(height, width)
+
+            labels, free, reduced, offset = presolve(
+                nlinks, source_caps, runoff_caps)
+            self.assertLess(free.sum(), height * width)
+
+            vertex_num, starts, ends, caps = edge_arrays(*reduced)
+            self.assertEqual(offset + BK.from_arrays(
+                vertex_num, starts, ends, caps).max_flow(), whole.max_flow())
+
+            band = np.ones((height, width), dtype=bool)
+            for solve in [grid_band_solver, graph_band_solver(BK.from_arrays)]:
+                self.assertEqual(
+                    presolved(solve)(nlinks, source_caps, runoff_caps,
+                                     band).tolist(),
+                    expected.tolist())
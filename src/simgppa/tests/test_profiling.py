@@ -0,0 +1,95 @@
+import json
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from simgppa.profiling import PROFILE_ENV, Profile, make_profile, stage
+
+
+class Test_Profile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_stages(self):
+        profile = Profile()
+
+        with profile.stage('allocate'):
+            data = bytearray(4 * 1024 * 1024)
+            del data
+
+        with profile.stage('sleep'):
+            time.sleep(0.05)
+
+        profile.record(pixels=12)
+        profile.record_graph(vertices=3)
+
+        with profile.stage('solve'):
+            profile.record_graph(vertices=14, edges=40)
+
+        self.assertEqual([s['name'] for s in profile.stages],
+                         ['allocate', 'sleep', 'solve'])
+        self.assertGreaterEqual(profile.stages[0]['peak_memory'],
+                                4 * 1024 * 1024)
+        self.assertGreaterEqual(profile.stages[1]['seconds'], 0.05)
+        self.assertEqual(profile.slowest(), 'sleep')
+        self.assertEqual(profile.sizes, {'pixels': 12})
+        self.assertEqual(profile.graphs,
+                         [{'vertices': 3, 'stage': None},
+                          {'vertices': 14, 'edges': 40, 'stage': 'solve'}])
+
+    def test_no_memory(self):
+        profile = Profile(memory=False)
+
+        with stage(profile, 'run'):
+            pass
+
+        self.assertIsNone(profile.stages[0]['peak_memory'])
+
+        # nothing is recorded without a profile
+        with stage(None, 'run'):
+            pass
+
+    def test_make_profile(self):
+        profile = Profile()
+        self.assertIs(make_profile(profile), profile)
+        self.assertIsNone(make_profile(False))
+        self.assertIsInstance(make_profile(True), Profile)
+
+        with mock.patch.dict(os.environ, {PROFILE_ENV: ''}):
+            self.assertIsNone(make_profile())
+
+        with mock.patch.dict(os.environ, {PROFILE_ENV: '1'}):
+            self.assertIsInstance(make_profile(), Profile)
+            self.assertIsNone(make_profile(False))
+
+        with mock.patch.dict(os.environ, {PROFILE_ENV: 'cprofile'}):
+            output = os.path.join(self.tmp.name, 'run.prof')
+            make_profile().save_stats(output)
+            self.assertTrue(os.path.exists(output))
+
+    def test_save(self):
+        profile = Profile(cprofile=True)
+
+        with profile.stage('sum'):
+            sum(range(1000))
+
+        output = os.path.join(self.tmp.name, 'profile.json')
+        profile.save_json(output)
+
+        with open(output) as file:
+            saved = json.load(file)
+
+        self.assertEqual(saved['stages'][0]['name'], 'sum')
+        self.assertEqual(saved['slowest'], 'sum')
+
+        output = os.path.join(self.tmp.name, 'profile.prof')
+        profile.save_stats(output)
+        self.assertGreater(pstats.Stats(output).total_calls, 0)
+
+        with self.assertRaises(ValueError):
+            Profile().save_stats(output)
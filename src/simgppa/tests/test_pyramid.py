@@ -0,0 +1,177 @@
+import unittest
+
+import numpy as np
+from simgppa.bk import BK
+from simgppa.grid import GridPPA
+from simgppa.img_processing import NEIGHBOURS, neighbour_slices
+from simgppa.pyramid import band_graph, band_mask, band_size, coarsen, \
+    dilate, fix_outside, graph_band_solver, grid_band_solver, \
+    pyramid_labels, refine_labels, upsample
+
+from .test_grid import grid_capacities
+
+
+def cut_capacity(nlinks, source_caps, runoff_caps, labels) -> float:
+    '''Capacity of the cut with the `labels` pixels on the source side'''
+
+    height, width = labels.shape
+    total = source_caps[~labels].sum() + runoff_caps[labels].sum()
+
+    for d, (dy, dx) in enumerate(NEIGHBOURS):
+        src, dst = neighbour_slices(dy, dx, height, width)
+        total += nlinks[src + (d,)][labels[src] & ~labels[dst]].sum()
+
+    return total
+
+
+class Test_Pyramid(unittest.TestCase):
+
+    def test_coarsen(self):
+        nlinks, source_caps, runoff_caps = grid_capacities(5, 7, 0)
+        coarse, coarse_source, coarse_runoff = coarsen(
+            nlinks, source_caps, runoff_caps)
+
+        self.assertEqual(coarse.shape, (3, 4, 4))
+        self.assertEqual(coarse_source.sum(), source_caps.sum())
+        self.assertEqual(coarse_runoff[2, 3], runoff_caps[4, 6])
+        self.assertEqual(coarse_source[1, 1], source_caps[2:4, 2:4].sum())
+
+        # right and bottom arcs leaving the block of pixels (2..3, 2..3)
+        self.assertEqual(coarse[1, 1, 0], nlinks[2:4, 3, 0].mean())
+        self.assertEqual(coarse[1, 1, 2], nlinks[3, 2:4, 2].mean())
+        # arcs leaving the image stay empty
+        self.assertEqual(coarse[:, 3, 0].tolist(), [0, 0, 0])
+        self.assertEqual(coarse[0, :, 3].tolist(), [0, 0, 0, 0])
+
+    def test_upsample(self):
+        labels = np.array([[True, False], [False, True]])
+
+        self.assertEqual(upsample(labels, (3, 4)).tolist(),
+                         [[True, True, False, False],
+                          [True, True, False, False],
+                          [False, False, True, True]])
+
+    def test_band_mask(self):
+        nlinks = np.ones((6, 6, 4), dtype=np.int64)
+        source_caps = np.zeros((6, 6))
+        runoff_caps = np.zeros((6, 6))
+
+        labels = np.zeros((6, 6), dtype=bool)
+        labels[:, :3] = True
+
+        band = band_mask(nlinks, source_caps, runoff_caps, labels, 1)
+        self.assertEqual(band[0].tolist(),
+                         [False, True, True, True, True, False])
+
+        # a background seed deep inside the object
+        runoff_caps[3, 0] = 10
+        band = band_mask(nlinks, source_caps, runoff_caps, labels, 0)
+        self.assertTrue(band[3, 0])
+        self.assertFalse(band[2, 0])
+
+        self.assertEqual(dilate(band, 1).sum(), 24 + 3)
+
+    def test_fix_outside(self):
+        nlinks, source_caps, runoff_caps = grid_capacities(6, 5, 1)
+        rng = np.random.default_rng(1)
+        labels = rng.random((6, 5)) < 0.5
+        band = rng.random((6, 5)) < 0.5
+
+        fixed = fix_outside(nlinks, source_caps, runoff_caps, labels, band)
+
+        # both graphs order band labelings the same way
+        gaps = []
+        for _ in range(5):
+            inside = np.where(band, rng.random((6, 5)) < 0.5, labels)
+            gaps.append(
+                cut_capacity(nlinks, source_caps, runoff_caps, inside) -
+                cut_capacity(*fixed, inside & band))
+
+        self.assertEqual(len(set(gaps)), 1)
+
+    def test_band_solvers_agree(self):
+        capacities = grid_capacities(9, 8, 2)
+        band = np.zeros((9, 8), dtype=bool)
+        band[2:7, 1:6] = True
+        labels = np.zeros((9, 8), dtype=bool)
+        labels[:4] = True
+
+        fixed = fix_outside(*capacities, labels, band)
+        by_graph = graph_band_solver(BK.from_arrays)(*fixed, band)
+        by_grid = grid_band_solver(*fixed, band)
+
+        self.assertFalse((by_graph & ~band).any())
+        self.assertEqual(by_graph.tolist(), by_grid.tolist())
+
+    def test_grid_band_solver_crops(self):
+        capacities = grid_capacities(9, 8, 2)
+        band = np.zeros((9, 8), dtype=bool)
+        band[2:7, 1:6] = True
+        band[3:5, 2:5] = False
+        fixed = fix_outside(*capacities, np.zeros((9, 8), dtype=bool), band)
+
+        shapes = []
+
+        def factory(*grid):
+            shapes.append(grid[1].shape)
+            return GridPPA(*grid)
+
+        labels = grid_band_solver(*fixed, band, factory=factory)
+
+        self.assertEqual(shapes, [(5, 5)])
+        self.assertEqual(labels.tolist(),
+                         graph_band_solver(BK.from_arrays)(
+                             *fixed, band).tolist())
+        self.assertFalse(grid_band_solver(
+            *fixed, np.zeros((9, 8), dtype=bool)).any())
+
+    def test_refine_recuts(self):
+        capacities = grid_capacities(12, 12, 5)
+        labels = np.zeros((12, 12), dtype=bool)
+        labels[:6] = True
+        calls = []
+
+        def solve(*grid):
+            calls.append(grid[3].sum())
+            return grid_band_solver(*grid)
+
+        for recuts in [0, 1]:
+            calls.clear()
+            refine_labels(*capacities, labels, solve, 1, recuts)
+            self.assertLessEqual(len(calls), recuts + 1)
+
+    def test_band_size(self):
+        capacities = grid_capacities(6, 7, 4)
+        band = np.zeros((6, 7), dtype=bool)
+        band[1:5, 2:] = True
+        band[0, 0] = True
+
+        vertex_num, starts, _, _, _ = band_graph(*capacities, band)
+
+        self.assertEqual(band_size(band), (vertex_num, len(starts)))
+
+    def test_pyramid_labels(self):
+        height, width = 40, 36
+        ys, xs = np.mgrid[:height, :width]
+        disk = (ys - 20) ** 2 + (xs - 17) ** 2 < 12 ** 2
+
+        nlinks = np.full((height, width, 4), 20, dtype=np.int64)
+        for d, (dy, dx) in enumerate(NEIGHBOURS):
+            src, dst = neighbour_slices(dy, dx, height, width)
+            nlinks[src + (d,)][disk[src] != disk[dst]] = 1
+
+        rng = np.random.default_rng(3)
+        source_caps = np.where(disk, 6.0, 2.0) + rng.random((height, width))
+        runoff_caps = np.where(disk, 2.0, 6.0) + rng.random((height, width))
+
+        whole = pyramid_labels(nlinks, source_caps, runoff_caps,
+                               grid_band_solver, 1)
+        self.assertEqual(whole.tolist(), disk.tolist())
+
+        for solve in [grid_band_solver, graph_band_solver(BK.from_arrays)]:
+            labels = pyramid_labels(nlinks, source_caps, runoff_caps,
+                                    solve, 3, width=2)
+            self.assertEqual(labels.tolist(), whole.tolist())
+
+        self.assertRaises(ValueError, pyramid_labels, nlinks, source_caps,
+                          runoff_caps, grid_band_solver, 0)
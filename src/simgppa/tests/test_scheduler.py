@@ -0,0 +1,30 @@
+import unittest
+
+from simgppa.scheduler import FIFOScheduler, HighestLabelScheduler
+
+
+class Test_Scheduler(unittest.TestCase):
+
+    def test_highest_label(self):
+        scheduler = HighestLabelScheduler()
+
+        for vertex, height in [(1, 3), (2, 7), (3, 0), (4, 7), (5, 5)]:
+            scheduler.push(vertex, height)
+
+        self.assertEqual(len(scheduler), 5)
+        self.assertEqual([scheduler.pop() for _ in range(3)], [4, 2, 5])
+
+        scheduler.push(6, 4)
+
+        self.assertEqual([scheduler.pop() for _ in range(3)], [6, 1, 3])
+        self.assertEqual(len(scheduler), 0)
+        self.assertRaises(IndexError, scheduler.pop)
+
+    def test_fifo(self):
+        scheduler = FIFOScheduler()
+
+        for vertex, height in [(1, 3), (2, 7), (3, 0)]:
+            scheduler.push(vertex, height)
+
+        self.assertEqual([scheduler.pop() for _ in range(3)], [1, 2, 3])
+        self.assertFalse(scheduler)
@@ -1,15 +1,106 @@
 import os
 import sys
+import tempfile
 import unittest
 from pathlib import Path
 
+import numpy as np
 from PIL import Image
-from simgppa.img_processing import Pixel
+from simgppa.img_processing import Pixel, load_pixels
+from simgppa.masks import load_mask
 from simgppa.metrics import compare
 from simgppa.segmentation import Segmentation
 
 path = Path(os.path.abspath(__file__)).parent
 
+# background scribble of the banana1 user data test
+BANANA_1_BG = [
+    # Pixel(157, 66), Pixel(211, 55), Pixel(
+    # 12, 77), Pixel(277, 221), Pixel(20, 222)
+    Pixel(209, 96),
+    Pixel(207, 95),
+    Pixel(165, 80),
+    Pixel(161, 77),
+    Pixel(150, 68),
+    Pixel(145, 65),
+    Pixel(140, 65),
+    Pixel(128, 59),
+    Pixel(127, 58),
+    Pixel(121, 56),
+    Pixel(117, 54),
+    Pixel(117, 54),
+    Pixel(112, 52),
+    Pixel(109, 50),
+    Pixel(104, 49),
+    Pixel(100, 47),
+    Pixel(93, 45),
+    Pixel(77, 38),
+    Pixel(62, 40),
+    Pixel(62, 40),
+    Pixel(55, 46),
+    Pixel(45, 58),
+    Pixel(41, 61),
+    Pixel(33, 63),
+    Pixel(26, 54),
+    Pixel(24, 49),
+    Pixel(24, 45),
+    Pixel(22, 32),
+    Pixel(21, 26),
+    Pixel(23, 20),
+    Pixel(65, 22),
+    Pixel(71, 19),
+    Pixel(70, 19),
+    Pixel(153, 5),
+    Pixel(152, 5),
+    Pixel(163, 9),
+    Pixel(191, 15),
+    Pixel(211, 8),
+    Pixel(223, 27),
+    Pixel(222, 37),
+    Pixel(201, 61),
+    Pixel(161, 82),
+    Pixel(131, 99),
+    Pixel(121, 102),
+    Pixel(102, 99),
+    Pixel(74, 96),
+    Pixel(67, 93),
+    Pixel(62, 92),
+    Pixel(50, 86),
+    Pixel(27, 88),
+    Pixel(13, 94),
+    Pixel(14, 95),
+    Pixel(2, 117),
+    Pixel(8, 137),
+    Pixel(15, 149),
+    Pixel(22, 171),
+    Pixel(26, 183),
+    Pixel(31, 193),
+    Pixel(47, 209),
+    Pixel(64, 210),
+    Pixel(80, 218),
+    Pixel(94, 222),
+    Pixel(125, 227),
+    Pixel(137, 227),
+    Pixel(152, 228),
+    Pixel(160, 228),
+    Pixel(183, 225),
+    Pixel(197, 223),
+    Pixel(210, 224),
+    Pixel(224, 223),
+    Pixel(242, 219),
+    Pixel(253, 217),
+    Pixel(260, 210),
+    Pixel(271, 198),
+    Pixel(289, 176),
+    Pixel(300, 169),
+    Pixel(314, 163),
+    Pixel(307, 195),
+    Pixel(305, 207),
+    Pixel(290, 224),
+    Pixel(284, 222),
+    Pixel(284, 222),
+]
+
 
 class Test_Segmentation(unittest.TestCase):
 
@@ -117,92 +208,7 @@ class Test_Segmentation(unittest.TestCase):
     def test_banana_1_with_user_data(self):
         s = Segmentation(path.joinpath(
             'data/segmentation/images-320/banana1-gr-320.jpg'),
-            bg_pixels=[
-                # Pixel(157, 66), Pixel(211, 55), Pixel(
-                # 12, 77), Pixel(277, 221), Pixel(20, 222)
-                Pixel(209, 96),
-            Pixel(207, 95),
-            Pixel(165, 80),
-            Pixel(161, 77),
-            Pixel(150, 68),
-            Pixel(145, 65),
-            Pixel(140, 65),
-            Pixel(128, 59),
-            Pixel(127, 58),
-            Pixel(121, 56),
-            Pixel(117, 54),
-            Pixel(117, 54),
-            Pixel(112, 52),
-            Pixel(109, 50),
-            Pixel(104, 49),
-            Pixel(100, 47),
-            Pixel(93, 45),
-            Pixel(77, 38),
-            Pixel(62, 40),
-            Pixel(62, 40),
-            Pixel(55, 46),
-            Pixel(45, 58),
-            Pixel(41, 61),
-            Pixel(33, 63),
-            Pixel(26, 54),
-            Pixel(24, 49),
-            Pixel(24, 45),
-            Pixel(22, 32),
-            Pixel(21, 26),
-            Pixel(23, 20),
-            Pixel(65, 22),
-            Pixel(71, 19),
-            Pixel(70, 19),
-            Pixel(153, 5),
-            Pixel(152, 5),
-            Pixel(163, 9),
-            Pixel(191, 15),
-            Pixel(211, 8),
-            Pixel(223, 27),
-            Pixel(222, 37),
-            Pixel(201, 61),
-            Pixel(161, 82),
-            Pixel(131, 99),
-            Pixel(121, 102),
-            Pixel(102, 99),
-            Pixel(74, 96),
-            Pixel(67, 93),
-            Pixel(62, 92),
-            Pixel(50, 86),
-            Pixel(27, 88),
-            Pixel(13, 94),
-            Pixel(14, 95),
-            Pixel(2, 117),
-            Pixel(8, 137),
-            Pixel(15, 149),
-            Pixel(22, 171),
-            Pixel(26, 183),
-            Pixel(31, 193),
-            Pixel(47, 209),
-            Pixel(64, 210),
-            Pixel(80, 218),
-            Pixel(94, 222),
-            Pixel(125, 227),
-            Pixel(137, 227),
-            Pixel(152, 228),
-            Pixel(160, 228),
-            Pixel(183, 225),
-            Pixel(197, 223),
-            Pixel(210, 224),
-            Pixel(224, 223),
-            Pixel(242, 219),
-            Pixel(253, 217),
-            Pixel(260, 210),
-            Pixel(271, 198),
-            Pixel(289, 176),
-            Pixel(300, 169),
-            Pixel(314, 163),
-            Pixel(307, 195),
-            Pixel(305, 207),
-            Pixel(290, 224),
-            Pixel(284, 222),
-            Pixel(284, 222),
-        ],
+            bg_pixels=BANANA_1_BG,
             obj_pixels=[Pixel(158, 166), Pixel(190, 161), Pixel(
                 90, 162), Pixel(36, 126), Pixel(263, 51)],
             lmbd=100,
@@ -284,3 +290,254 @@ class Test_Segmentation(unittest.TestCase):
         self.assertGreater(correct_obj, 0.5)
         self.assertGreater(correct_total, 0.5)
         self.assertGreater(correct_relative, 0.5)
+
+    def test_baseline_masks(self):
+        # masks of the original list-based PPA, which took the source side
+        # reachable in the residual graph
+        cases = [
+            ('banana_1', 'banana1', load_pixels(path.joinpath(
+                'bg_pixels.txt')), load_pixels(path.joinpath(
+                    'obj_pixels.txt')), 1, 60.0),
+            ('banana_2', 'banana2', [], [], 100, 1.0),
+            ('banana_3', 'banana3', [], [], 100, 1.0),
+            ('banana_1_with_user_data', 'banana1', BANANA_1_BG,
+             [Pixel(158, 166), Pixel(190, 161), Pixel(90, 162),
+              Pixel(36, 126), Pixel(263, 51)], 100, 1.0),
+            ('banana_2_with_user_data', 'banana2',
+             [Pixel(121, 66), Pixel(229, 87), Pixel(17, 216),
+              Pixel(19, 36), Pixel(293, 19)],
+             [Pixel(68, 148), Pixel(122, 159), Pixel(39, 149),
+              Pixel(253, 162), Pixel(270, 72)], 100, 1.0),
+            ('banana_3_with_user_data', 'banana3',
+             [Pixel(178, 71), Pixel(237, 68), Pixel(288, 42),
+              Pixel(47, 211), Pixel(280, 218)],
+             [Pixel(65, 109), Pixel(204, 175), Pixel(205, 177),
+              Pixel(51, 121), Pixel(39, 89)], 100, 1.0),
+        ]
+
+        for name, image, bg, obj, lmbd, sgm in cases:
+            expected = load_mask(path.joinpath(
+                f'data/segmentation/baseline/{name}.npz'))
+
+            for solver in ['ppa', 'grid']:
+                with self.subTest(name=name, solver=solver):
+                    s = Segmentation(path.joinpath(
+                        f'data/segmentation/images-320/{image}-gr-320.jpg'),
+                        bg, obj, lmbd, sgm, True, solver=solver)
+
+                    self.assertTrue(np.array_equal(s.get_mask(), expected))
+
+    def test_solvers_agree(self):
+        masks = []
+
+        for solver in ['ppa', 'bk', 'grid', 'tiled']:
+            s = Segmentation(path.joinpath(
+                'data/segmentation/images-320/banana2-gr-320.jpg'),
+                bg_pixels=[Pixel(121, 66), Pixel(229, 87), Pixel(
+                    17, 216), Pixel(19, 36), Pixel(293, 19)],
+                obj_pixels=[Pixel(68, 148), Pixel(122, 159), Pixel(
+                    39, 149), Pixel(253, 162), Pixel(270, 72)],
+                lmbd=100,
+                sgm=20.0,
+                bw=True,
+                solver=solver)
+
+            with tempfile.TemporaryDirectory() as tmp:
+                output = os.path.join(tmp, 'mask.png')
+                s.save_img(output)
+
+                with Image.open(output) as img:
+                    masks.append(img.tobytes())
+
+        self.assertEqual(masks[0], masks[1])
+        self.assertEqual(masks[0], masks[2])
+        self.assertEqual(masks[0], masks[3])
+
+    def test_tiles(self):
+        masks = []
+
+        for solver, tiles, levels in [('grid', 1, 1), ('tiled', 3, 1),
+                                      ('grid', 1, 2), ('tiled', 2, 2)]:
+            s = Segmentation(path.joinpath(
+                'data/segmentation/images-320/banana2-gr-320.jpg'),
+                bg_pixels=[Pixel(121, 66), Pixel(17, 216)],
+                obj_pixels=[Pixel(68, 148), Pixel(122, 159)],
+                lmbd=100,
+                sgm=20.0,
+                bw=True,
+                solver=solver,
+                levels=levels,
+                tiles=tiles)
+
+            masks.append(s.get_mask())
+
+        self.assertEqual(masks[0].tolist(), masks[1].tolist())
+        self.assertEqual(masks[2].tolist(), masks[3].tolist())
+
+        for solver, tiles in [('grid', 2), ('tiled', 0)]:
+            self.assertRaises(ValueError, Segmentation, path.joinpath(
+                'data/segmentation/images-320/banana2-gr-320.jpg'),
+                [], [], 1, 60.0, True, solver=solver, tiles=tiles)
+
+    def test_pyramid(self):
+        masks = []
+
+        for solver, levels in [('grid', 1), ('grid', 3), ('bk', 3)]:
+            s = Segmentation(path.joinpath(
+                'data/segmentation/images-320/banana1-gr-320.jpg'),
+                bg_pixels=load_pixels(path.joinpath('bg_pixels.txt')),
+                obj_pixels=load_pixels(path.joinpath('obj_pixels.txt')),
+                lmbd=1,
+                sgm=60.0,
+                bw=True,
+                solver=solver,
+                levels=levels)
+
+            with tempfile.TemporaryDirectory() as tmp:
+                output = os.path.join(tmp, 'mask.png')
+                s.save_img(output)
+
+                with Image.open(output) as img:
+                    masks.append(np.asarray(img))
+
+        self.assertGreater((masks[0] == masks[1]).mean(), 0.99)
+        self.assertEqual(masks[1].tolist(), masks[2].tolist())
+
+    def test_superpixels(self):
+        masks = []
+
+        for superpixels in [0, 8]:
+            s = Segmentation(path.joinpath(
+                'data/segmentation/images-320/banana1-gr-320.jpg'),
+                bg_pixels=load_pixels(path.joinpath('bg_pixels.txt')),
+                obj_pixels=load_pixels(path.joinpath('obj_pixels.txt')),
+                lmbd=1,
+                sgm=60.0,
+                bw=True,
+                solver='bk',
+                superpixels=superpixels)
+
+            masks.append(s.get_mask())
+
+        self.assertGreater((masks[0] == masks[1]).mean(), 0.99)
+
+        self.assertRaises(ValueError, Segmentation, path.joinpath(
+            'data/segmentation/images-320/banana1-gr-320.jpg'),
+            [], [], 1, 60.0, True, levels=2, superpixels=8)
+
+    def test_presolve(self):
+        masks = []
+
+        for presolve in [False, True]:
+            s = Segmentation(path.joinpath(
+                'data/segmentation/images-320/banana2-gr-320.jpg'),
+                bg_pixels=[Pixel(121, 66), Pixel(17, 216)],
+                obj_pixels=[Pixel(68, 148), Pixel(122, 159)],
+                lmbd=100,
+                sgm=20.0,
+                bw=True,
+                solver='grid',
+                presolve=presolve)
+
+            masks.append(s.get_mask())
+
+        self.assertEqual(masks[0].tolist(), masks[1].tolist())
+
+    def test_array_input(self):
+        image_path = path.joinpath(
+            'data/segmentation/images-320/banana2-gr-320.jpg')
+        masks = []
+
+        with Image.open(image_path) as image:
+            image.load()
+
+            for source in [image_path, image, np.asarray(image)]:
+                s = Segmentation(source,
+                                 bg_pixels=[Pixel(121, 66), Pixel(17, 216)],
+                                 obj_pixels=[Pixel(68, 148), Pixel(122, 159)],
+                                 lmbd=100,
+                                 sgm=20.0,
+                                 bw=True,
+                                 solver='grid')
+
+                with tempfile.TemporaryDirectory() as tmp:
+                    output = os.path.join(tmp, 'mask.png')
+                    s.save_img(output)
+
+                    with Image.open(output) as img:
+                        masks.append(img.tobytes())
+
+        self.assertEqual(masks[0], masks[1])
+        self.assertEqual(masks[0], masks[2])
+
+    def test_mask_output(self):
+        s = Segmentation(path.joinpath(
+            'data/segmentation/images-320/banana2-gr-320.jpg'),
+            bg_pixels=[Pixel(121, 66), Pixel(17, 216)],
+            obj_pixels=[Pixel(68, 148), Pixel(122, 159)],
+            lmbd=100,
+            sgm=20.0,
+            bw=True,
+            solver='grid')
+
+        mask = s.get_mask()
+        self.assertEqual(mask.shape, (240, 320))
+        self.assertFalse(mask.flags.writeable)
+        self.assertEqual(s.get_min_cut().tolist(),
+                         (np.flatnonzero(mask) + 1).tolist())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for fmt, name in [('png', 'mask.png'), ('packed', 'mask.npz'),
+                              ('rle', 'rle.npz')]:
+                output = os.path.join(tmp, name)
+                s.save_mask(output, fmt)
+                self.assertTrue(np.array_equal(load_mask(output), mask))
+
+            output = os.path.join(tmp, 'mask.png')
+            s.save_img(output)
+
+            with Image.open(output) as img:
+                self.assertEqual(img.mode, '1')
+                self.assertTrue(np.array_equal(np.asarray(img), mask))
+
+    def test_profile(self):
+        s = Segmentation(path.joinpath(
+            'data/segmentation/images-320/banana2-gr-320.jpg'),
+            bg_pixels=[Pixel(121, 66), Pixel(17, 216)],
+            obj_pixels=[Pixel(68, 148), Pixel(122, 159)],
+            lmbd=100,
+            sgm=20.0,
+            bw=True,
+            solver='grid',
+            profile=True)
+
+        self.assertEqual([stage['name'] for stage in s.profile.stages],
+                         ['load', 'nlinks', 'graph', 'solve', 'mask'])
+        self.assertTrue(all(stage['seconds'] >= 0 and
+                            stage['peak_memory'] >= 0
+                            for stage in s.profile.stages))
+        self.assertEqual(s.profile.sizes['pixels'], 240 * 320)
+        self.assertEqual(s.profile.sizes['vertices'], 240 * 320 + 2)
+        # both ways between neighbours and two t-links for every pixel
+        edges = 2 * (240 * 319 + 239 * 320) + 2 * 240 * 320
+        self.assertEqual(s.profile.sizes['edges'], edges)
+        self.assertEqual(s.profile.graphs, [{'vertices': 240 * 320 + 2,
+                                             'edges': edges,
+                                             'stage': 'solve'}])
+
+        # the presolve leaves a smaller graph to cut
+        s = Segmentation(path.joinpath(
+            'data/segmentation/images-320/banana2-gr-320.jpg'),
+            bg_pixels=[Pixel(121, 66), Pixel(17, 216)],
+            obj_pixels=[Pixel(68, 148), Pixel(122, 159)],
+            lmbd=100,
+            sgm=20.0,
+            bw=True,
+            solver='grid',
+            presolve=True,
+            profile=True)
+
+        self.assertEqual(s.profile.sizes['edges'], edges)
+        self.assertTrue(all(graph['stage'] == 'solve' and
+                            graph['edges'] < edges
+                            for graph in s.profile.graphs))
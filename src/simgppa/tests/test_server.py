@@ -0,0 +1,271 @@
+import asyncio
+import base64
+import http.client
+import io
+import json
+import os
+import socket
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from simgppa.img_processing import Pixel
+from simgppa.server import BINARY, CLOSE, PING, PONG, TEXT, \
+    SegmentationServer, read_frame, websocket_frame
+from simgppa.session import SegmentationSession
+
+path = Path(os.path.abspath(__file__)).parent
+image_path = path.joinpath('data/segmentation/images-320/banana1-gr-320.jpg')
+
+OBJ = [[150, 120], [160, 130], [170, 125]]
+BG = [[5, 5], [300, 10], [10, 230]]
+
+
+def crop_data() -> str:
+    '''A small part of the image, base64 encoded PNG'''
+
+    buffer = io.BytesIO()
+    Image.open(image_path).crop((100, 80, 200, 160)).save(buffer, format='PNG')
+
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+CROP = {'image': None, 'image_data': crop_data(),
+        'obj': [[50, 40], [55, 42]], 'bg': [[2, 2], [97, 77]]}
+
+
+def png_mask(data: bytes) -> np.ndarray:
+    return np.array(Image.open(io.BytesIO(data))).astype(bool)
+
+
+def client_frame(opcode: int, payload: bytes, final: bool = True) -> bytes:
+    '''Masked frame as a client sends it'''
+
+    mask = b'\x01\x02\x03\x04'
+    masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    header = bytes([(0x80 if final else 0) | opcode])
+
+    if len(payload) < 126:
+        header += bytes([0x80 | len(payload)])
+    else:
+        header += bytes([0x80 | 126]) + len(payload).to_bytes(2, 'big')
+
+    return header + mask + masked
+
+
+class Test_Server(unittest.TestCase):
+
+    def setUp(self):
+        self.start_server()
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(
+            self.server.close(), self.loop).result(30)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def start_server(self, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+
+        kwargs.setdefault('image_root', str(image_path.parent))
+        self.server = SegmentationServer(workers=1, **kwargs)
+        _, self.port = asyncio.run_coroutine_threadsafe(
+            self.server.start(), self.loop).result(30)
+
+    def restart_server(self, **kwargs):
+        self.tearDown()
+        self.start_server(**kwargs)
+
+    def request(self, method, url, body=None):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port,
+                                                timeout=60)
+        connection.request(method, url,
+                           None if body is None else json.dumps(body))
+        response = connection.getresponse()
+        data = response.read()
+        connection.close()
+
+        return response.status, response.getheader('Content-Type'), data
+
+    def create(self, **params):
+        params = {'image': image_path.name, 'obj': OBJ, 'bg': BG,
+                  'lmbd': 1, 'sgm': 60.0, **params}
+        params = {key: value for key, value in params.items()
+                  if value is not None}
+        status, _, data = self.request('POST', '/sessions', params)
+        self.assertEqual(status, 201, data)
+
+        return json.loads(data)
+
+    def test_session(self):
+        created = self.create()
+        self.assertEqual((created['width'], created['height']), (320, 240))
+
+        session = SegmentationSession(
+            image_path, [Pixel(*p) for p in BG], [Pixel(*p) for p in OBJ],
+            1, 60.0, True)
+
+        status, content_type, data = self.request(
+            'GET', f'/sessions/{created["id"]}/mask')
+        self.assertEqual((status, content_type), (200, 'image/png'))
+        self.assertTrue(np.array_equal(png_mask(data), session.get_mask()))
+
+        bg = BG + [[200, 200], [250, 220]]
+        session.update_seeds([Pixel(*p) for p in bg],
+                             [Pixel(*p) for p in OBJ])
+
+        status, _, data = self.request(
+            'PUT', f'/sessions/{created["id"]}/seeds', {'obj': OBJ, 'bg': bg})
+        self.assertEqual(status, 200)
+        self.assertTrue(np.array_equal(png_mask(data), session.get_mask()))
+
+        status, _, _ = self.request('DELETE', f'/sessions/{created["id"]}')
+        self.assertEqual(status, 200)
+        self.assertEqual(self.server.sessions(), [])
+
+    def test_image_data(self):
+        created = self.create(**CROP)
+        self.assertEqual((created['width'], created['height']), (100, 80))
+
+    def test_no_image_root(self):
+        self.restart_server(image_root=None)
+
+        status, _, _ = self.request('POST', '/sessions',
+                                    {'image': str(image_path)})
+        self.assertEqual(status, 403)
+        self.create(**CROP)
+
+    def test_errors(self):
+        self.assertEqual(self.request('GET', '/sessions/missing/mask')[0], 404)
+        self.assertEqual(self.request('GET', '/unknown')[0], 404)
+        self.assertEqual(self.request('POST', '/sessions', {})[0], 400)
+        self.assertEqual(self.request(
+            'POST', '/sessions', {'image': 'missing.jpg'})[0], 400)
+
+        for image in [str(path.joinpath('test_server.py')),
+                      '../../../test_server.py', 7]:
+            self.assertIn(self.request(
+                'POST', '/sessions', {'image': image})[0], (400, 403))
+
+        created = self.create(**CROP)
+        url = f'/sessions/{created["id"]}/seeds'
+
+        self.assertEqual(self.request('GET', url)[0], 405)
+        self.assertEqual(self.request('PUT', url, {'obj': [[1]]})[0], 400)
+        status, _, data = self.request('PUT', url, [1, 2])
+        self.assertEqual(status, 400)
+        self.assertIn('error', json.loads(data))
+
+    def test_content_length(self):
+        for length in ['abc', '-5', str(2 ** 40)]:
+            sock = socket.create_connection(('127.0.0.1', self.port),
+                                            timeout=60)
+            sock.sendall((f'POST /sessions HTTP/1.1\r\n'
+                          f'Content-Length: {length}\r\n\r\n').encode())
+
+            status = sock.makefile('rb').readline().split()[1]
+            sock.close()
+
+            self.assertEqual(status, b'413' if length == str(2 ** 40)
+                             else b'400')
+
+    def test_memory_limit(self):
+        # room for a single 100x80 session
+        self.restart_server(memory_limit=100 * 80 * 600)
+
+        first = self.create(**CROP)['id']
+        second = self.create(**CROP)['id']
+
+        self.assertEqual(self.server.sessions(), [second])
+        self.assertEqual(
+            self.request('GET', f'/sessions/{first}/mask')[0], 404)
+
+    def test_idle_timeout(self):
+        self.restart_server(idle_timeout=0.2)
+        self.create(**CROP)
+
+        deadline = time.monotonic() + 10
+        while self.server.sessions() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        self.assertEqual(self.server.sessions(), [])
+
+    def test_websocket(self):
+        session_id = self.create(**CROP)['id']
+
+        sock = socket.create_connection(('127.0.0.1', self.port), timeout=60)
+        sock.sendall((f'GET /sessions/{session_id}/ws HTTP/1.1\r\n'
+                      'Host: localhost\r\n'
+                      'Upgrade: websocket\r\n'
+                      'Connection: Upgrade\r\n'
+                      'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n'
+                      'Sec-WebSocket-Version: 13\r\n\r\n').encode())
+
+        stream = sock.makefile('rb')
+        self.assertIn(b'101', stream.readline())
+
+        headers = {}
+        while True:
+            line = stream.readline().decode().strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.lower()] = value.strip()
+
+        # the example key and answer of RFC 6455
+        self.assertEqual(headers['sec-websocket-accept'],
+                         's3pPLMBiTxaQ9kYGzzhZRbK+xOo=')
+
+        def receive():
+            return asyncio.run(read_frame_from(stream))
+
+        seeds = json.dumps({'obj': CROP['obj'],
+                            'bg': CROP['bg'] + [[90, 10]]}).encode()
+        sock.sendall(client_frame(TEXT, seeds[:10], final=False) +
+                     client_frame(PING, b'hi') +
+                     client_frame(0x0, seeds[10:]))
+
+        self.assertEqual(receive(), (True, PONG, b'hi'))
+        final, opcode, payload = receive()
+        self.assertEqual(opcode, BINARY)
+        self.assertEqual(png_mask(payload).shape, (80, 100))
+
+        sock.sendall(client_frame(TEXT, b'not json'))
+        final, opcode, payload = receive()
+        self.assertEqual(opcode, TEXT)
+        self.assertIn('error', json.loads(payload))
+
+        sock.sendall(client_frame(CLOSE, b'\x03\xe8'))
+        self.assertEqual(receive(), (True, CLOSE, b'\x03\xe8'))
+        sock.close()
+
+    def test_websocket_frame(self):
+        for size in [5, 300, 70000]:
+            frame = websocket_frame(BINARY, bytes(size))
+            self.assertEqual(asyncio.run(read_frame_from(io.BytesIO(frame))),
+                             (True, BINARY, bytes(size)))
+
+
+async def read_frame_from(stream):
+    '''`read_frame` over a blocking file object'''
+
+    reader = asyncio.StreamReader()
+    header = stream.read(2)
+    reader.feed_data(header)
+
+    length = header[1] & 0x7F
+    extra = {126: 2, 127: 8}.get(length, 0)
+    data = stream.read(extra)
+    reader.feed_data(data)
+    if extra:
+        length = int.from_bytes(data, 'big')
+
+    reader.feed_data(stream.read(length))
+
+    return await read_frame(reader)
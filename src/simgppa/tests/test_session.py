@@ -0,0 +1,62 @@
+import os
+import unittest
+from pathlib import Path
+
+import numpy as np
+from simgppa.img_processing import ImageProcessor, load_pixels
+from simgppa.ppa import PPA
+from simgppa.session import SegmentationSession
+
+path = Path(os.path.abspath(__file__)).parent
+image_path = path.joinpath('data/segmentation/images-320/banana1-gr-320.jpg')
+
+
+class Test_SegmentationSession(unittest.TestCase):
+
+    def setUp(self):
+        self.obj = load_pixels(path.joinpath('obj_pixels.txt'))
+        self.bg = load_pixels(path.joinpath('bg_pixels.txt'))
+
+    def fresh_mask(self, bg, obj, new_bg, new_obj):
+        imgp = ImageProcessor(image_path, obj, bg, 1, 60.0, True)
+        imgp.set_seeds(new_obj, new_bg, refit=False)
+
+        ppa = PPA.from_arrays(imgp.get_pixel_count() + 2,
+                              *imgp.get_graph_arrays(), min_cut_only=True)
+
+        cut = np.zeros(imgp.get_pixel_count() + 2, dtype=bool)
+        cut[ppa.min_cut()] = True
+
+        return cut[1:-1].reshape(imgp.img_height, imgp.img_width), \
+            ppa.max_flow()
+
+    def test_update_seeds(self):
+        bg, obj = self.bg[:len(self.bg) // 2], self.obj[:len(self.obj) // 2]
+        session = SegmentationSession(image_path, bg, obj, 1, 60.0, True)
+        session.get_mask()
+
+        for new_bg, new_obj in [(self.bg, obj), (self.bg[:5], self.obj)]:
+            changed = session.update_seeds(new_bg, new_obj)
+            mask, max_flow = self.fresh_mask(bg, obj, new_bg, new_obj)
+
+            self.assertGreater(changed, 0)
+            self.assertTrue(np.array_equal(session.get_mask(), mask))
+            self.assertAlmostEqual(session.max_flow(), max_flow, places=3)
+
+    def test_unchanged_seeds(self):
+        session = SegmentationSession(
+            image_path, self.bg, self.obj, 1, 60.0, True)
+        mask = session.get_mask()
+
+        self.assertEqual(session.update_seeds(self.bg, self.obj), 0)
+        self.assertIs(session.get_mask(), mask)
+
+    def test_nbytes(self):
+        session = SegmentationSession(
+            image_path, self.bg, self.obj, 1, 60.0, True)
+        before = session.nbytes
+        session.get_mask()
+
+        # the graph arrays alone hold an arc pair per edge
+        self.assertGreater(before, 320 * 240 * 6 * 2 * 8)
+        self.assertGreater(session.nbytes, before)
@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+from simgppa.bk import BK
+from simgppa.pyramid import grid_band_solver
+from simgppa.superpixels import grow_regions, region_graph, superpixel_labels
+
+from .test_grid import grid_capacities
+from .test_pyramid import cut_capacity
+
+
+class Test_Superpixels(unittest.TestCase):
+
+    def test_grow_regions(self):
+        pixels = np.zeros((6, 8), dtype=np.uint8)
+        pixels[:, 4:] = 100
+        pixels[2, 1] = 5
+
+        regions = grow_regions(pixels, size=8, tolerance=8)
+        self.assertEqual(regions.max(), 1)
+        self.assertEqual(regions[:, :4].tolist(), np.zeros((6, 4)).tolist())
+
+        # blocks split flat areas
+        regions = grow_regions(pixels, size=3, tolerance=8)
+        self.assertEqual(regions.max() + 1, 2 * 3 + 2)
+        self.assertEqual(regions[0, 0], 0)
+
+        # a lone pixel off by more than the tolerance is its own region
+        regions = grow_regions(pixels, size=8, tolerance=2)
+        self.assertEqual(regions.max(), 2)
+        self.assertEqual((regions == regions[2, 1]).sum(), 1)
+
+    def test_grow_colour_regions(self):
+        pixels = np.zeros((4, 4, 3), dtype=np.uint8)
+        pixels[:, 2:, 1] = 50
+
+        regions = grow_regions(pixels)
+        self.assertEqual(regions[:, :2].tolist(), [[0, 0]] * 4)
+        self.assertEqual(regions[:, 2:].tolist(), [[1, 1]] * 4)
+
+    def test_region_graph(self):
+        capacities = grid_capacities(6, 5, 4)
+        rng = np.random.default_rng(4)
+        regions = rng.integers(0, 4, (6, 5))
+        regions[0, 0], regions[-1, -1] = 0, 3
+
+        vertex_num, starts, ends, caps = region_graph(regions, *capacities)
+        self.assertEqual(vertex_num, 6)
+
+        # cuts of whole regions cost as much as in the pixel graph
+        for chosen in [[0], [1, 3], [0, 2, 3]]:
+            labels = np.isin(regions, chosen)
+            side = np.zeros(vertex_num, dtype=bool)
+            side[0] = True
+            side[np.array(chosen) + 1] = True
+
+            self.assertAlmostEqual(
+                caps[side[starts] & ~side[ends]].sum(),
+                cut_capacity(*capacities, labels))
+
+    def test_superpixel_labels(self):
+        height, width = 30, 28
+        ys, xs = np.mgrid[:height, :width]
+        disk = (ys - 15) ** 2 + (xs - 13) ** 2 < 9 ** 2
+        pixels = np.where(disk, 180, 40).astype(np.uint8)
+
+        nlinks = np.full((height, width, 4), 20, dtype=np.int64)
+        source_caps = np.where(disk, 6.0, 2.0)
+        runoff_caps = np.where(disk, 2.0, 6.0)
+        # noise the superpixels cannot follow
+        source_caps[3, 3] = runoff_caps[20, 12] = 200
+
+        whole = grid_band_solver(nlinks, source_caps, runoff_caps,
+                                 np.ones(disk.shape, dtype=bool))
+
+        self.assertTrue(whole[3, 3])
+        self.assertFalse(whole[20, 12])
+
+        labels = superpixel_labels(nlinks, source_caps, runoff_caps,
+                                   grow_regions(pixels), BK.from_arrays,
+                                   grid_band_solver, 2)
+
+        self.assertEqual(labels.tolist(), whole.tolist())
@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+from simgppa.grid import GridPPA
+from simgppa.tiled import TiledGridPPA
+
+from .test_grid import grid_capacities
+
+
+class Test_TiledGridPPA(unittest.TestCase):
+
+    def test_same_as_grid(self):
+        for seed, (height, width) in enumerate([(1, 1), (1, 9), (7, 1),
+                                                (6, 7), (20, 15)]):
+            capacities = grid_capacities(height, width, seed)
+            grid = GridPPA(*capacities, relabel_interval=5)
+
+            for tiles, interval in [(1, 1), (2, 1), (2, 3), (3, 4)]:
+                tiled = TiledGridPPA(*capacities, tiles=tiles,
+                                     relabel_interval=5,
+                                     exchange_interval=interval)
+
+                self.assertEqual(tiled.max_flow(), grid.max_flow())
+                self.assertEqual(tiled.min_cut(), grid.min_cut())
+
+    def test_float_capacities(self):
+        nlinks, source_caps, runoff_caps = grid_capacities(9, 8, 11)
+        source_caps = source_caps + 0.25
+
+        grid = GridPPA(nlinks, source_caps, runoff_caps)
+        tiled = TiledGridPPA(nlinks, source_caps, runoff_caps, tiles=4)
+
+        self.assertEqual(tiled.max_flow(), grid.max_flow())
+        self.assertEqual(tiled.min_cut(), grid.min_cut())
+
+    def test_tiles(self):
+        capacities = grid_capacities(5, 4, 3)
+
+        self.assertEqual(TiledGridPPA(*capacities, tiles=8).tiles, 5)
+        self.assertEqual(TiledGridPPA(*capacities, tiles=2).bounds,
+                         [(0, 12), (12, 20)])
+        self.assertEqual(TiledGridPPA(*capacities).tiles, 1)
+
+    def test_timing(self):
+        tiled = TiledGridPPA(*grid_capacities(20, 15, 6), tiles=3)
+        tiled.max_flow()
+
+        self.assertEqual(len(tiled.busy), 3)
+        self.assertGreater(tiled.exchanges, 0)
+        self.assertGreater(tiled.span, 0)
+        self.assertLessEqual(tiled.span, sum(tiled.busy) + 1e-9)
+
+    def test_failed_worker(self):
+        nlinks, source_caps, runoff_caps = grid_capacities(6, 4, 5)
+        tiled = TiledGridPPA(nlinks, source_caps, runoff_caps, tiles=2)
+
+        # a strip of another shape breaks the workers
+        tiled.bounds = [(0, 12), (12, 30)]
+
+        self.assertRaises(RuntimeError, tiled.max_flow)
@@ -0,0 +1,407 @@
+'''`GridPPA` split into strips of rows swept by worker processes
+
+Every worker owns the pixels of one strip and keeps their arrays to itself,
+along with a halo: the row just above and the row just below the strip.
+Between two exchanges a strip runs `exchange_interval` sweeps of `GridPPA`
+over its own pixels on its own, the halo heights held as they were; flow
+pushed into the halo is collected there. An exchange, a single barrier,
+hands that flow and the heights of the border rows to the neighbouring
+strips.
+
+Relabels run in every strip as well: every `relabel_interval` sweeps each
+strip sets its heights to the distances to the runoff through its pixels
+and its halo. Heights seen across a border lag behind, so every
+`EXACT_EVERY`-th relabel, and the one before the strips stop, repeats the
+strip relabels with the border rows swapped until none of them changes:
+the heights are then the distances over the whole grid. The strips stop
+once no pixel of any of them is active under those heights, so the flow
+and the cut are those of `GridPPA`.
+
+Every barrier records the CPU seconds each strip spent since the last one.
+`span` sums the longest of them, the solve time with a core per strip,
+which `python -m simgppa.benchmark --tiles 1 2 4` compares with `GridPPA`.
+On the bundled 320x240 images the sweeps are too small for more strips to
+pay off. On the 640x480 banana1 two to eight strips bring the span down to
+0.6-0.75 of the `GridPPA` time, the cores permitting.
+'''
+
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .grid import GridPPA, relabel_within, sweep
+from .img_processing import NEIGHBOURS
+from .ppa import Vertex
+
+# sweeps a strip runs between two exchanges
+EXCHANGE_INTERVAL = 4
+
+# relabels of the strips between two over the whole grid
+EXACT_EVERY = 8
+
+# directions of the arcs into the row below and the row above
+DOWN, UP = NEIGHBOURS.index((1, 0)), NEIGHBOURS.index((-1, 0))
+
+
+def share(array: np.ndarray, context) -> tuple:
+    '''Copy of the array in shared memory, `shared_view` rebuilds it'''
+
+    raw = context.RawArray('b', max(array.nbytes, 1))
+    shared_view((raw, array.dtype.str, array.shape))[...] = array
+
+    return raw, array.dtype.str, array.shape
+
+
+def shared_view(shared: tuple) -> np.ndarray:
+    raw, dtype, shape = shared
+    size = int(np.prod(shape, dtype=np.int64))
+
+    return np.frombuffer(raw, dtype=dtype, count=size).reshape(shape)
+
+
+class Strip:
+    '''Pixels of one strip and the halo rows around it, solved by a worker
+
+    Exchange buffers have two rows: the one of `row` is written before a
+    barrier and read after it, the other one until the next barrier, so
+    a strip running ahead never overwrites what another still reads.
+    '''
+
+    def __init__(self, state: Dict, rank: int, barrier) -> None:
+
+        self.shared = {name: shared_view(shared)
+                       for name, shared in state['arrays'].items()}
+        self.rank, self.barrier = rank, barrier
+
+        self.lo, self.hi = lo, hi = state['bounds'][rank]
+        self.width = width = state['width']
+        self.shifts = state['shifts']
+        self.top = state['vertex_num']
+        self.exchange_interval = state['exchange_interval']
+        # exchanges between two relabels
+        self.period = max(1, state['relabel_interval'] //
+                          self.exchange_interval)
+
+        size = len(self.shared['height'])
+        self.first, self.last = first, last = \
+            max(lo - width, 0), min(hi + width, size)
+        self.own = slice(lo - first, hi - first)
+        self.halos = [slice(0, lo - first), slice(hi - first, last - first)]
+        self.borders = [slice(lo - first, lo - first + width),
+                        slice(hi - first - width, hi - first)]
+
+        self.residual = self.shared['residual'][first:last].copy()
+        self.runoff_residual = \
+            self.shared['runoff_residual'][first:last].copy()
+        self.excess = self.shared['excess'][first:last].copy()
+        self.height = self.shared['height'][first:last].copy()
+        # the halo collects the flow pushed out of the strip
+        self.excess[self.halos[0]] = self.excess[self.halos[1]] = 0
+        self.pixels = np.arange(self.own.start, self.own.stop)
+
+        self.barriers = 0
+        self.mark = time.process_time()
+
+    @property
+    def row(self) -> int:
+        return self.barriers % 2
+
+    def sync(self) -> None:
+        '''Barrier recording the CPU time of the strip since the last one'''
+
+        row, times = self.row, self.shared['times']
+        elapsed = time.process_time() - self.mark
+        times[row, self.rank] = elapsed
+        self.shared['busy'][self.rank] += elapsed
+        self.barrier.wait()
+
+        if self.rank == 0:
+            self.shared['span'][0] += times[row].max()
+
+        self.barriers += 1
+        self.mark = time.process_time()
+
+    def active(self) -> np.ndarray:
+        own = self.own
+
+        return self.pixels[(self.excess[own] > 0) &
+                           (self.height[own] < self.top)]
+
+    def send_borders(self, row: int) -> None:
+        edges, lo, hi, width = \
+            self.shared['edges'], self.lo, self.hi, self.width
+        edges[row, lo:lo + width] = self.height[self.borders[0]]
+        edges[row, hi - width:hi] = self.height[self.borders[1]]
+
+    def read_halos(self, row: int) -> None:
+        edges = self.shared['edges']
+        self.height[self.halos[0]] = edges[row, self.first:self.lo]
+        self.height[self.halos[1]] = edges[row, self.hi:self.last]
+
+    def relabel_strip(self) -> None:
+        relabel_within(self.height, self.residual, self.runoff_residual,
+                       self.shifts, self.own, self.top)
+
+    def relabel(self) -> None:
+        '''Heights of the whole grid as distances to the runoff
+
+        Every strip relabels against the halo heights of the last pass, the
+        passes stop once no border row changes.
+        '''
+
+        halos, borders, height = self.halos, self.borders, self.height
+        height[halos[0]] = height[halos[1]] = self.top
+        used = sent = None
+
+        while True:
+            seen = np.concatenate([height[rows] for rows in halos])
+            if used is None or not np.array_equal(seen, used):
+                self.relabel_strip()
+                used = seen
+
+            border = np.concatenate([height[rows] for rows in borders])
+            changed = sent is None or not np.array_equal(border, sent)
+            sent = border
+
+            row = self.row
+            self.shared['changed'][row, self.rank] = changed
+            self.send_borders(row)
+            self.sync()
+
+            self.read_halos(row)
+            if not self.shared['changed'][row].any():
+                return
+
+    def exchange(self,
+                 active: np.ndarray,
+                 dirty: bool) -> Tuple[np.ndarray, bool, bool]:
+        '''Hand the flow pushed into the halo to the strips that own it
+
+        Returns the active pixels along with those the flow reached, whether
+        any strip is left with active pixels or flow in flight and whether
+        any swept since the last exact relabel.
+        '''
+
+        pushed, halos, borders = self.shared['pushed'], self.halos, \
+            self.borders
+        excess, residual = self.excess, self.residual
+        first, lo, hi, last = self.first, self.lo, self.hi, self.last
+
+        row = self.row
+        # flow pushed down into the strip below and up into the one above
+        pushed[row, hi:last, 0] = excess[halos[1]]
+        pushed[row, first:lo, 1] = excess[halos[0]]
+        flowing = bool(excess[halos[0]].any() or excess[halos[1]].any())
+        excess[halos[0]] = excess[halos[1]] = 0
+
+        self.shared['counts'][row, self.rank] = len(active) + flowing
+        self.shared['dirty'][row, self.rank] = dirty
+        self.send_borders(row)
+        self.sync()
+
+        for column, rows, back in [(0, borders[0], UP),
+                                   (1, borders[1], DOWN)]:
+            incoming = pushed[row, first + rows.start:first + rows.stop,
+                              column]
+            # pixels with excess before are active already
+            reached = rows.start + np.flatnonzero((incoming > 0) &
+                                                  (excess[rows] == 0))
+            excess[rows] += incoming
+            residual[rows, back] += incoming
+
+            active = np.concatenate((active, reached[self.height[reached] <
+                                                     self.top]))
+
+        self.read_halos(row)
+
+        return active, bool(self.shared['counts'][row].any()), \
+            bool(self.shared['dirty'][row].any())
+
+    def solve(self) -> None:
+        '''Sweeps and exchanges until no pixel of any strip is active'''
+
+        self.relabel()
+        # swept since the last exact relabel
+        dirty = False
+        exchanges = relabels = 0
+        active = self.active()
+
+        while True:
+            for _ in range(self.exchange_interval):
+                if not len(active):
+                    break
+
+                sweep(active, self.height, self.excess, self.residual,
+                      self.runoff_residual, self.shifts, self.top)
+                dirty = True
+                active = self.active()
+
+            active, busy, dirty_anywhere = self.exchange(active, dirty)
+
+            if not busy:
+                # heights stale across a border may hide a path to the
+                # runoff, only exact ones prove there is none
+                if not dirty_anywhere:
+                    break
+
+                self.relabel()
+                dirty = False
+                active = self.active()
+                continue
+
+            exchanges += 1
+            if exchanges % self.period:
+                continue
+
+            relabels += 1
+            if relabels % EXACT_EVERY == 0:
+                self.relabel()
+                dirty = False
+            else:
+                self.relabel_strip()
+
+            active = self.active()
+
+        if self.rank == 0:
+            self.shared['exchanges'][0] = exchanges
+
+        own, lo, hi = self.own, self.lo, self.hi
+        self.shared['residual'][lo:hi] = self.residual[own]
+        self.shared['runoff_residual'][lo:hi] = self.runoff_residual[own]
+        self.shared['excess'][lo:hi] = self.excess[own]
+        self.shared['height'][lo:hi] = self.height[own]
+
+
+def solve_strip(state: Dict, rank: int, barrier) -> None:
+    '''Worker solving the strip of `rank`'''
+
+    Strip(state, rank, barrier).solve()
+
+
+class TiledGridPPA:
+    '''`GridPPA` solved by `tiles` processes over strips of rows
+
+    With a single tile, the default, the strip is solved in the calling
+    process. After a solve `exchanges` counts the exchanges, `busy` holds
+    the CPU seconds of every strip and `span` those of the slowest strip
+    between two barriers, summed.
+    '''
+
+    def __init__(self,
+                 nlinks: np.ndarray,
+                 source_caps: np.ndarray,
+                 runoff_caps: np.ndarray,
+                 tiles: int = 1,
+                 relabel_interval: int = 32,
+                 exchange_interval: int = EXCHANGE_INTERVAL) -> None:
+
+        self.__grid = GridPPA(nlinks, source_caps, runoff_caps,
+                              relabel_interval)
+
+        height, width = self.__grid.shape
+        self.tiles = max(1, min(tiles, height))
+
+        rows = np.array_split(np.arange(height), self.tiles)
+        self.bounds = [(int(strip[0]) * width, (int(strip[-1]) + 1) * width)
+                       for strip in rows]
+
+        self.exchange_interval = exchange_interval
+        self.exchanges = 0
+        self.busy: List[float] = []
+        self.span = 0.0
+
+        self.__solved = False
+
+    def __solve(self) -> None:
+        grid = self.__grid
+        context = multiprocessing.get_context()
+
+        size = len(grid.excess)
+        # the exchange buffers have a row for every other barrier
+        arrays = {
+            'residual': grid.residual,
+            'runoff_residual': grid.runoff_residual,
+            'excess': grid.excess,
+            'height': grid.height,
+            'pushed': np.zeros((2, size, 2), dtype=grid.excess.dtype),
+            'edges': np.zeros((2, size), dtype=grid.height.dtype),
+            'changed': np.zeros((2, self.tiles), dtype=bool),
+            'counts': np.zeros((2, self.tiles), dtype=np.int64),
+            'dirty': np.zeros((2, self.tiles), dtype=bool),
+            'times': np.zeros((2, self.tiles)),
+            'busy': np.zeros(self.tiles),
+            'span': np.zeros(1),
+            'exchanges': np.zeros(1, dtype=np.int64),
+        }
+        arrays = {name: share(array, context)
+                  for name, array in arrays.items()}
+
+        state = {'arrays': arrays,
+                 'bounds': self.bounds,
+                 'width': grid.shape[1],
+                 'shifts': grid.shifts,
+                 'vertex_num': grid.vertex_num,
+                 'relabel_interval': grid.relabel_interval,
+                 'exchange_interval': self.exchange_interval}
+
+        if self.tiles == 1:
+            solve_strip(state, 0, context.Barrier(1))
+        else:
+            barrier = context.Barrier(self.tiles)
+            workers = [context.Process(target=solve_strip,
+                                       args=(state, rank, barrier))
+                       for rank in range(self.tiles)]
+
+            for worker in workers:
+                worker.start()
+
+            running = list(workers)
+            while running:
+                for sentinel in wait([worker.sentinel for worker in running]):
+                    worker = next(worker for worker in running
+                                  if worker.sentinel == sentinel)
+                    worker.join()
+                    running.remove(worker)
+
+                    if worker.exitcode != 0:
+                        # the others would wait on the barrier forever
+                        barrier.abort()
+                        for other in workers:
+                            other.join()
+
+                        raise RuntimeError(f'Tile worker failed with exit '
+                                           f'code {worker.exitcode}')
+
+        grid.residual, grid.runoff_residual, grid.excess, grid.height = \
+            (shared_view(arrays[name]).copy() for name in
+             ('residual', 'runoff_residual', 'excess', 'height'))
+
+        self.busy = shared_view(arrays['busy']).tolist()
+        self.span = float(shared_view(arrays['span'])[0])
+        self.exchanges = int(shared_view(arrays['exchanges'])[0])
+
+        self.__solved = True
+
+    def max_flow(self):
+
+        if not self.__solved:
+            self.__solve()
+
+        # no pixel is left active, so this only sums up the flow
+        return self.__grid.max_flow()
+
+    def min_cut_labels(self) -> np.ndarray:
+
+        self.max_flow()
+
+        return self.__grid.min_cut_labels()
+
+    def min_cut(self) -> List[Vertex]:
+        '''Source and the pixels of its side, as `GridPPA`'''
+
+        self.max_flow()
+
+        return self.__grid.min_cut()